@@ -10,6 +10,8 @@ import logging
 from datetime import datetime
 from supabase import create_client, Client
 import os
+import random
+import time
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,6 +22,12 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Conexão direta ao Postgres para carregamento via COPY (ETL_LOAD_BACKEND=copy ou loadBackend na config)
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Chave natural da tabela (modo upsert: ETL_LOAD_MODE=upsert ou loadMode na config)
+NATURAL_KEY = ['data', 'hora_carregamento', 'carregamento', 'ingrediente']
+
 def load_config():
     """Carrega configuração do arquivo JSON"""
     with open('config/02_desvio_carregamento_config.json', 'r', encoding='utf-8') as f:
@@ -84,25 +92,161 @@ def transform_data(df, config):
     logger.info(f"Dados transformados: {len(result_df)} linhas")
     return result_df
 
-def load_to_staging(df):
-    """Carrega dados para tabela staging"""
+def connect_postgres():
+    """Conexão direta ao Postgres (psycopg 3 ou psycopg2), aberta uma vez por carga"""
     try:
-        # Converter DataFrame para lista de dicionários
-        records = df.to_dict('records')
+        import psycopg
+        return psycopg.connect(DATABASE_URL)
+    except ImportError:
+        import psycopg2
+        return psycopg2.connect(DATABASE_URL)
+
+def copy_to_staging(df, conn, table_name, upsert=False):
+    """Carrega dados via COPY FROM STDIN na conexão da carga (cada lote na sua transação)"""
+    columns = ', '.join(f'"{column}"' for column in df.columns)
+    target = f'_upsert_{table_name}' if upsert else table_name
+    statement = f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    payload = df.convert_dtypes().to_csv(index=False, header=False, na_rep='\\N')
+
+    # Upsert: COPY numa tabela temporária e INSERT ... ON CONFLICT na chave natural
+    create_temp = f"CREATE TEMP TABLE {target} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+    updates = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in df.columns if c not in NATURAL_KEY)
+    merge = (f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {target} "
+             f"ON CONFLICT ({', '.join(NATURAL_KEY)}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING"))
+
+    if hasattr(conn, 'transaction'):
+        # psycopg 3: erro desfaz só o lote; a conexão continua aberta para os próximos
+        with conn.transaction(), conn.cursor() as cur:
+            if upsert:
+                cur.execute(create_temp)
+            with cur.copy(statement) as copy:
+                copy.write(payload)
+            if upsert:
+                cur.execute(merge)
+    else:
+        # psycopg2: o bloco with confirma ou desfaz a transação sem fechar a conexão
+        import io
+        with conn, conn.cursor() as cur:
+            if upsert:
+                cur.execute(create_temp)
+            cur.copy_expert(statement, io.StringIO(payload))
+            if upsert:
+                cur.execute(merge)
+
+    logger.info(f"Dados carregados via COPY: {len(df)} registros")
+    return True
+
+# Falhas passageiras são repetidas com espera exponencial; só erros de dados dividem o lote
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# SQLSTATE: 08 conexão, 40 rollback (serialização/deadlock), 53 recursos, 57P desligamento, 57014 statement timeout
+TRANSIENT_SQLSTATE_PREFIXES = ('08', '40', '53', '57P', '57014')
+TRANSIENT_MESSAGES = (
+    'timeout', 'timed out', 'connection reset', 'connection aborted', 'connection refused',
+    'temporarily unavailable', 'too many requests', 'bad gateway', 'service unavailable',
+    'gateway timeout', 'server closed the connection', 'could not connect', 'connection is closed'
+)
+
+def is_transient_error(e):
+    """Rede, timeout, 429/5xx e SQLSTATE de conexão/concorrência são passageiros; erros de dados não"""
+    # psycopg: sqlstate / psycopg2: pgcode / postgrest APIError: code (SQLSTATE, não status HTTP)
+    sqlstate = getattr(e, 'sqlstate', None) or getattr(e, 'pgcode', None) or getattr(e, 'code', None)
+    if isinstance(sqlstate, str) and len(sqlstate) == 5 and sqlstate.isalnum():
+        return sqlstate.startswith(TRANSIENT_SQLSTATE_PREFIXES)
+    status_code = getattr(e, 'status_code', None) or getattr(getattr(e, 'response', None), 'status_code', None)
+    if isinstance(status_code, int):
+        return status_code in TRANSIENT_STATUS_CODES
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    name = type(e).__name__.lower()
+    if 'timeout' in name or 'connect' in name or name == 'operationalerror':
+        return True
+    message = str(e).lower()
+    return any(fragment in message for fragment in TRANSIENT_MESSAGES)
+
+def send_with_retry(send, df):
+    """Envia o lote repetindo erros passageiros (espera exponencial com jitter)"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return send(df)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_transient_error(e):
+                raise
+            delay = random.random() * min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            logger.warning(f"Erro passageiro ({e}); tentativa {attempt + 1}/{MAX_RETRIES} em {delay:.2f}s")
+            time.sleep(delay)
+
+def load_with_bisection(send, df, rejects):
+    """Envia o lote; se falhar por erro de dados, divide ao meio até isolar as linhas com erro (as boas são carregadas)"""
+    if len(df) == 0:
+        return 0
+    try:
+        send_with_retry(send, df)
+        return len(df)
+    except Exception as e:
+        # Falha passageira que persistiu (banco fora do ar): interrompe a carga sem rejeitar linhas
+        if is_transient_error(e):
+            raise
+        if len(df) == 1:
+            # Índice preservado desde a leitura: linha do CSV = índice + 2 (cabeçalho é a linha 1)
+            rejects.append({'linha': int(df.index[0]) + 2, 'erro': str(e)})
+            return 0
+        middle = len(df) // 2
+        return (load_with_bisection(send, df.iloc[:middle], rejects)
+                + load_with_bisection(send, df.iloc[middle:], rejects))
+
+def insert_to_staging(df, table_name, upsert=False):
+    """Insere via REST do Supabase (upsert pela chave natural)"""
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    table = supabase.table(table_name)
+    (table.upsert(records, on_conflict=','.join(NATURAL_KEY)) if upsert else table.insert(records)).execute()
+
+def load_to_staging(df, load_backend='rest', load_mode='insert', batch_size=1000):
+    """Carrega dados para tabela staging (REST do Supabase ou COPY direto no Postgres)"""
+    connection = {}
+    try:
+        backend = os.getenv('ETL_LOAD_BACKEND', load_backend or 'rest').lower()
+        upsert = os.getenv('ETL_LOAD_MODE', load_mode or 'insert').lower() == 'upsert'
+        table_name = 'etl_staging_02_desvio_carregamento'
         
-        # Inserir no Supabase
-        response = supabase.table('etl_staging_02_desvio_carregamento').insert(records).execute()
+        # Upsert é idempotente: duplicatas na chave natural saem antes do envio
+        if upsert:
+            df = df.drop_duplicates(subset=NATURAL_KEY, keep='last')
         
-        if response.data:
-            logger.info(f"Dados carregados com sucesso: {len(response.data)} registros")
-            return True
+        if backend == 'copy' and DATABASE_URL:
+            def send(part):
+                # Uma conexão para todos os lotes e divisões; reaberta só se cair
+                if connection.get('conn') is None or connection['conn'].closed:
+                    connection['conn'] = connect_postgres()
+                copy_to_staging(part, connection['conn'], table_name, upsert)
         else:
-            logger.error("Erro ao carregar dados")
-            return False
+            send = lambda part: insert_to_staging(part, table_name, upsert)
+        
+        # Lotes com erro são divididos até isolar as linhas rejeitadas; as demais são carregadas
+        rejects = []
+        loaded = 0
+        for start in range(0, len(df), batch_size):
+            loaded += load_with_bisection(send, df.iloc[start:start + batch_size], rejects)
+        logger.info(f"Dados carregados: {loaded} registros")
+        
+        if rejects:
+            for reject in rejects[:20]:
+                logger.error(f"Linha {reject['linha']} rejeitada: {reject['erro']}")
+            os.makedirs('C:/conectaboi_csv/rejected', exist_ok=True)
+            rejects_path = f'C:/conectaboi_csv/rejected/02_desvio_carregamento_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+            pd.DataFrame(rejects).to_csv(rejects_path, index=False)
+            logger.warning(f"{len(rejects)} linhas rejeitadas salvas em {rejects_path}")
+        
+        return loaded > 0 or len(df) == 0
             
     except Exception as e:
         logger.error(f"Erro no carregamento: {e}")
         return False
+    finally:
+        if connection.get('conn') is not None:
+            connection['conn'].close()
 
 def main():
     """Função principal do ETL"""
@@ -116,16 +260,16 @@ def main():
         df = pd.read_csv('C:/conectaboi_csv/02_desvio_carregamento.csv')
         logger.info(f"CSV carregado: {len(df)} linhas")
         
-        # Remover linhas excluídas
+        # Remover linhas excluídas (o índice original fica: linha do CSV nas rejeitadas = índice + 2)
         excluded_rows = config.get('excludedRows', [])
-        df = df.drop(excluded_rows).reset_index(drop=True)
+        df = df.drop(excluded_rows)
         logger.info(f"Linhas após exclusão: {len(df)}")
         
         # Transformar dados
         transformed_df = transform_data(df, config)
         
         # Carregar para staging
-        success = load_to_staging(transformed_df)
+        success = load_to_staging(transformed_df, config.get('loadBackend', 'rest'), config.get('loadMode', 'insert'))
         
         if success:
             logger.info("ETL concluído com sucesso!")
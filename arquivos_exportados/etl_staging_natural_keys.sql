@@ -0,0 +1,13 @@
+-- Chaves naturais das tabelas de staging (carregamento idempotente em modo upsert)
+-- O upsert (ON CONFLICT) exige um índice único nas mesmas colunas configuradas em
+-- backend/etl/loader.py (DEFAULT_NATURAL_KEYS) ou em settings.natural_keys.
+-- Antes de criar os índices, remova as duplicatas já carregadas por reexecuções.
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_etl_staging_01_historico_consumo_natural_key
+  ON etl_staging_01_historico_consumo (data, id_curral) NULLS NOT DISTINCT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_etl_staging_02_desvio_carregamento_natural_key
+  ON etl_staging_02_desvio_carregamento (data, hora_carregamento, carregamento, ingrediente) NULLS NOT DISTINCT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_etl_staging_03_desvio_distribuicao_natural_key
+  ON etl_staging_03_desvio_distribuicao (data, hora, trato, curral) NULLS NOT DISTINCT;
@@ -0,0 +1,195 @@
+"""
+Compressão das respostas (gzip e br) negociada pelo Accept-Encoding
+
+Middleware ASGI: comprime respostas JSON, NDJSON e CSV a partir de
+`minimum_size` bytes. br (Brotli) é usado quando o cliente aceita e o pacote
+brotli está instalado; senão gzip. Respostas em streaming (NDJSON) são
+comprimidas bloco a bloco, com flush a cada bloco para o cliente receber as
+linhas sem esperar o fim. Server-Sent Events e respostas que já têm
+Content-Encoding passam sem alteração.
+"""
+
+import logging
+import zlib
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - br só com o pacote brotli instalado
+    brotli = None
+
+# Tipos comprimidos (prefixo do Content-Type)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+
+def available_encodings() -> List[str]:
+    """Codificações suportadas, na ordem de preferência do servidor"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str] = None) -> Optional[str]:
+    """
+    Escolhe a codificação pelo Accept-Encoding (com pesos q); None = identidade
+
+    Entre as aceitas com o mesmo peso vale a ordem de `supported`.
+    """
+    supported = available_encodings() if supported is None else supported
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in supported:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def add_vary(headers) -> list:
+    """Acrescenta Accept-Encoding ao Vary, mantendo o Vary já existente e sem repetir"""
+    headers = list(headers)
+    vary_index = None
+    for index, (key, value) in enumerate(headers):
+        if key == b"vary":
+            tokens = {token.strip().lower() for token in value.decode("latin-1").split(",")}
+            if "accept-encoding" in tokens or "*" in tokens:
+                return headers
+            vary_index = index if vary_index is None else vary_index
+    if vary_index is None:
+        headers.append((b"vary", b"Accept-Encoding"))
+    else:
+        key, value = headers[vary_index]
+        headers[vary_index] = (key, value + b", Accept-Encoding")
+    return headers
+
+
+class _Compressor:
+    """Compressor incremental com a mesma interface para gzip e br"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + self._br.flush() if flush else out
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    Comprime as respostas HTTP conforme o Accept-Encoding do cliente
+
+    Corpo em uma única mensagem abaixo de `minimum_size` vai sem compressão.
+    Toda resposta de tipo comprimível leva Vary: Accept-Encoding (comprimida
+    ou não), para caches não servirem a versão gzip a quem não a aceita.
+    """
+
+    def __init__(self, app: Callable, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            async def send_identity(message):
+                if message["type"] == "http.response.start" and self._compressible(message.get("headers", [])):
+                    message = {**message, "headers": add_vary(message["headers"])}
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                # Adiado até o primeiro corpo: o tamanho decide se comprime
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+
+            if state["compressor"] is None:
+                headers = start.get("headers", [])
+                if not self._should_compress(headers, len(body), more_body):
+                    state["passthrough"] = True
+                    if self._compressible(headers):
+                        start = {**start, "headers": add_vary(headers)}
+                    await send(start)
+                    await send(message)
+                    return
+                state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [(key, value) for key, value in headers if key != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers = add_vary(headers)
+                if not more_body:
+                    compressed = state["compressor"].compress(body) + state["compressor"].finish()
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            compressor = state["compressor"]
+            if more_body:
+                chunk = compressor.compress(body, flush=True)
+            else:
+                chunk = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(headers) -> bool:
+        for key, value in headers:
+            if key == b"content-type":
+                return value.decode("latin-1").lower().startswith(COMPRESSIBLE_TYPES)
+        return False
+
+    def _should_compress(self, headers, body_size: int, more_body: bool) -> bool:
+        if any(key == b"content-encoding" for key, _ in headers) or not self._compressible(headers):
+            return False
+        # Streaming: comprime sempre (o tamanho total não é conhecido)
+        return more_body or body_size >= self.minimum_size
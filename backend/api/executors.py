@@ -0,0 +1,148 @@
+"""
+Executores fora do event loop: threads para I/O bloqueante e processos para CPU
+
+Os handlers da API são `async def`; leitura de CSV com pandas, detecção de
+encoding e chamadas síncronas ao Supabase rodam aqui para que um arquivo
+grande não congele /health e as demais requisições.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from etl.frame_handoff import open_outputs, run_and_publish
+
+logger = logging.getLogger(__name__)
+
+_io_executor = None
+_cpu_executor = None
+_cpu_workers = 0
+_executor_lock = threading.Lock()
+
+
+def default_cpu_workers() -> int:
+    """Um processo a menos que os núcleos disponíveis (mínimo 1)"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Pool de threads para I/O bloqueante (Supabase, disco, handlers síncronos)"""
+    global _io_executor
+    if _io_executor is None:
+        with _executor_lock:
+            if _io_executor is None:
+                from config.settings import get_settings
+                workers = max(1, get_settings().io_executor_workers)
+                _io_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl-io")
+                logger.info(f"🧵 Pool de I/O: {workers} threads")
+    return _io_executor
+
+
+def get_cpu_executor() -> Executor:
+    """
+    Pool de processos para trabalho de CPU (parse e limpeza de CSV)
+
+    cpu_executor_workers = 0 desliga os processos e usa o pool de I/O.
+    Processos são criados com "spawn": o servidor já tem threads e um fork
+    herdaria locks em estado inconsistente. Cada processo roda warm_worker
+    ao subir (imports, ETL offline, snapshot de schemas).
+    """
+    global _cpu_executor, _cpu_workers
+    if _cpu_executor is None:
+        from config.settings import get_settings
+        workers = get_settings().cpu_executor_workers
+        if workers is None:
+            workers = default_cpu_workers()
+        if workers <= 0:
+            return get_io_executor()
+        from etl.conectaboi_etl_smart import warm_worker
+        with _executor_lock:
+            if _cpu_executor is None:
+                _cpu_executor = ProcessPoolExecutor(max_workers=workers,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=warm_worker)
+                _cpu_workers = workers
+                logger.info(f"⚙️ Pool de CPU: {workers} processos")
+    return _cpu_executor
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def prewarm_cpu_executor() -> int:
+    """
+    Sobe todos os processos do pool de CPU antes da primeira requisição
+
+    O ProcessPoolExecutor só cria um processo quando não há nenhum ocioso;
+    tarefas simultâneas forçam a criação de todos. Retorna quantos responderam.
+    """
+    executor = get_cpu_executor()
+    if isinstance(executor, ThreadPoolExecutor):
+        return 0
+    try:
+        futures = [executor.submit(_worker_pid) for _ in range(_cpu_workers)]
+        pids = {future.result() for future in futures}
+    except BrokenProcessPool as e:
+        logger.warning(f"⚠️ Falha ao aquecer o pool de CPU: {e}")
+        _reset_cpu_executor(executor)
+        return 0
+    logger.info(f"🔥 Pool de CPU aquecido: {len(pids)} processos")
+    return len(pids)
+
+
+def _reset_cpu_executor(broken: Executor):
+    global _cpu_executor
+    with _executor_lock:
+        if _cpu_executor is broken:
+            _cpu_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def call_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Executa `fn` no pool de processos e espera o resultado (para código síncrono)
+
+    `fn` e os argumentos precisam ser serializáveis (funções de módulo). Os
+    DataFrames grandes do resultado voltam por Arrow IPC mapeado em memória
+    (etl.frame_handoff), sem pickle. Se um processo morrer, o pool é recriado
+    e a chamada roda uma vez na thread atual.
+    """
+    executor = get_cpu_executor()
+    if isinstance(executor, ThreadPoolExecutor):
+        # Sem processos: roda na thread atual (esperar outra thread do mesmo pool pode esgotá-lo)
+        return fn(*args, **kwargs)
+    try:
+        return open_outputs(executor.submit(run_and_publish, fn, *args, **kwargs).result())
+    except BrokenProcessPool:
+        logger.warning("⚠️ Pool de CPU quebrado; recriando e executando nesta thread")
+        _reset_cpu_executor(executor)
+        return fn(*args, **kwargs)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Executa `fn` bloqueante no pool de threads sem travar o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Executa `fn` (função de módulo) no pool de processos sem travar o event loop"""
+    return await run_io(call_cpu, fn, *args, **kwargs)
+
+
+def shutdown_executors(wait: bool = False):
+    """Encerra os pools (no shutdown da API)"""
+    global _io_executor, _cpu_executor
+    with _executor_lock:
+        io_executor, cpu_executor = _io_executor, _cpu_executor
+        _io_executor, _cpu_executor = None, None
+    for executor in (cpu_executor, io_executor):
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
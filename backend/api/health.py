@@ -0,0 +1,168 @@
+"""
+Verificação de saúde do Supabase em segundo plano
+
+Uma thread consulta o Supabase a cada `interval_seconds` e guarda o último
+estado e as latências recentes; /health e /health/supabase respondem com esse
+estado na hora, sem consultar o banco a cada chamada do frontend.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROBE_UNKNOWN = "unknown"
+PROBE_OPERATIONAL = "operational"
+PROBE_FAILED = "connection_failed"
+PROBE_NOT_CONFIGURED = "not_configured"
+
+# Tabela consultada pela sonda (limit 1)
+PROBE_TABLE = "etl_staging_01_historico_consumo"
+
+
+class ProbeNotConfigured(Exception):
+    """Sem cliente Supabase (credenciais ausentes): modo simulado"""
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil pelo posto mais próximo de uma lista já ordenada"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def probe_supabase():
+    """Consulta mínima ao Supabase pelo cliente compartilhado"""
+    from etl.supabase_client import get_supabase_client
+
+    client = get_supabase_client()
+    if client is None:
+        raise ProbeNotConfigured()
+    client.table(PROBE_TABLE).select('*').limit(1).execute()
+
+
+class HealthProber:
+    """
+    Sonda periódica com o último estado e as latências das últimas `window` sondas
+
+    A primeira sonda roda assim que a thread sobe; até lá o estado é "unknown".
+    """
+
+    def __init__(self, probe: Callable[[], None], interval_seconds: float = 15.0, window: int = 120,
+                 clock: Callable[[], float] = time.monotonic):
+        self.probe = probe
+        self.interval_seconds = interval_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._status = PROBE_UNKNOWN
+        self._error: Optional[str] = None
+        self._checked_at: Optional[str] = None
+        self._checked_monotonic: Optional[float] = None
+        self._last_latency_ms: Optional[float] = None
+        self._consecutive_failures = 0
+        self._probes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def probe_once(self) -> Dict[str, Any]:
+        """Executa uma sonda, registra o resultado e retorna o estado"""
+        started = self._clock()
+        try:
+            self.probe()
+            status, error = PROBE_OPERATIONAL, None
+        except ProbeNotConfigured:
+            status, error = PROBE_NOT_CONFIGURED, None
+        except Exception as e:
+            status, error = PROBE_FAILED, str(e)
+        finished = self._clock()
+        latency_ms = (finished - started) * 1000
+
+        with self._lock:
+            previous = self._status
+            self._status = status
+            self._error = error
+            self._checked_at = datetime.now().isoformat()
+            self._checked_monotonic = finished
+            self._probes += 1
+            if status == PROBE_OPERATIONAL:
+                self._latencies.append(latency_ms)
+                self._last_latency_ms = round(latency_ms, 1)
+                self._consecutive_failures = 0
+            elif status == PROBE_FAILED:
+                self._consecutive_failures += 1
+
+        if status != previous:
+            if status == PROBE_FAILED:
+                logger.warning(f"⚠️ Supabase indisponível: {error}")
+            else:
+                logger.info(f"💓 Supabase: {status}")
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Último estado e percentis de latência (ms) das sondas bem-sucedidas recentes"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            age = None if self._checked_monotonic is None else self._clock() - self._checked_monotonic
+            return {
+                "status": self._status,
+                "connected": self._status == PROBE_OPERATIONAL,
+                "error": self._error,
+                "checked_at": self._checked_at,
+                "age_seconds": None if age is None else round(age, 1),
+                "stale": age is not None and age > 3 * self.interval_seconds,
+                "interval_seconds": self.interval_seconds,
+                "consecutive_failures": self._consecutive_failures,
+                "probes": self._probes,
+                "latency_ms": {
+                    "last": self._last_latency_ms,
+                    "samples": len(latencies),
+                    "p50": round(percentile(latencies, 0.50), 1) if latencies else None,
+                    "p95": round(percentile(latencies, 0.95), 1) if latencies else None,
+                    "p99": round(percentile(latencies, 0.99), 1) if latencies else None,
+                    "max": round(latencies[-1], 1) if latencies else None
+                }
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as e:
+                logger.error(f"❌ Sonda de saúde falhou: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Sobe a thread da sonda (idempotente)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+_health_prober = None
+_health_prober_lock = threading.Lock()
+
+
+def get_health_prober() -> HealthProber:
+    """Retorna instância singleton da sonda de saúde do Supabase"""
+    global _health_prober
+    if _health_prober is None:
+        with _health_prober_lock:
+            if _health_prober is None:
+                from config.settings import get_settings
+                settings = get_settings()
+                _health_prober = HealthProber(probe_supabase, settings.health_probe_interval_seconds,
+                                              settings.health_probe_window)
+    return _health_prober
@@ -0,0 +1,245 @@
+"""
+Jobs em segundo plano para as etapas longas do ETL (carga, filtragem, Quick ETL)
+
+O endpoint devolve o job_id na hora; o trabalho roda num pool limitado de
+threads, o progresso vira eventos numerados (consumidos via SSE) e o resultado
+fica disponível até expirar. O cancelamento é cooperativo: o job confere
+`cancel_event` entre etapas e a carga para de enviar batches novos.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+# Eventos mantidos por job (clientes que ficam para trás perdem os mais antigos)
+MAX_EVENTS_PER_JOB = 1000
+
+
+class JobQueueFullError(RuntimeError):
+    """Limite de jobs ativos (na fila + em execução) atingido"""
+
+
+class JobCancelled(Exception):
+    """Levantada pelo próprio job ao perceber o pedido de cancelamento"""
+
+
+class Job:
+    """Estado, progresso e eventos de um job"""
+
+    def __init__(self, kind: str, params: Dict[str, Any] = None):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = JOB_QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.finished_monotonic: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._events: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def _emit(self, event_type: str, **fields):
+        with self._cond:
+            self._seq += 1
+            self._events.append({"seq": self._seq, "type": event_type, "job_id": self.job_id, **fields})
+            if len(self._events) > MAX_EVENTS_PER_JOB:
+                del self._events[:len(self._events) - MAX_EVENTS_PER_JOB]
+            self._cond.notify_all()
+
+    def report(self, **progress):
+        """Atualiza os contadores do job e publica um evento de progresso"""
+        self.progress.update(progress)
+        self._emit("progress", **progress)
+
+    def check_cancelled(self):
+        """Ponto de cancelamento entre etapas do job"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelado")
+
+    def set_status(self, status: str, error: str = None):
+        now = datetime.now().isoformat()
+        if status == JOB_RUNNING:
+            self.started_at = now
+        if status in FINISHED_STATES:
+            self.finished_at = now
+            self.finished_monotonic = time.monotonic()
+        self.error = error
+        self.status = status
+        self._emit("status", status=status, error=error)
+
+    def events_after(self, seq: int, timeout: float = None) -> List[Dict[str, Any]]:
+        """Eventos com número maior que `seq`, esperando até `timeout` se ainda não houver"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq or self.finished, timeout=timeout)
+            return [event for event in self._events if event["seq"] > seq]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_event.is_set(),
+            "has_result": self.result is not None
+        }
+
+
+class JobManager:
+    """
+    Pool limitado de jobs
+
+    Args:
+        max_workers: Jobs executando ao mesmo tempo
+        max_active: Jobs na fila + em execução (acima disso, JobQueueFullError)
+        retention_seconds: Tempo que um job terminado (e seu resultado) fica disponível
+    """
+
+    def __init__(self, max_workers: int = 2, max_active: int = 8, retention_seconds: float = 3600):
+        self.max_workers = max(1, int(max_workers))
+        self.max_active = max(1, int(max_active))
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="etl-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_monotonic > self.retention_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def submit(self, kind: str, fn: Callable[[Job], Any], params: Dict[str, Any] = None) -> Job:
+        """Enfileira `fn(job)`; o retorno vira o resultado do job"""
+        with self._lock:
+            self._purge()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_active:
+                raise JobQueueFullError(f"{active} jobs ativos (limite {self.max_active}); tente novamente mais tarde")
+            job = Job(kind, params)
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(self._run, job, fn)
+        logger.info(f"🧵 Job {job.job_id} ({kind}) enfileirado")
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        if job.cancel_event.is_set():
+            job.set_status(JOB_CANCELLED)
+            return
+        job.set_status(JOB_RUNNING)
+        try:
+            job.result = fn(job)
+        except JobCancelled:
+            job.set_status(JOB_CANCELLED)
+            logger.info(f"⏹️ Job {job.job_id} cancelado")
+            return
+        except Exception as e:
+            logger.error(f"❌ Job {job.job_id} ({job.kind}) falhou: {e}", exc_info=True)
+            job.set_status(JOB_FAILED, error=str(e))
+            return
+        # Cancelado no meio da carga: o que foi feito até ali fica no resultado
+        job.set_status(JOB_CANCELLED if job.cancel_event.is_set() else JOB_SUCCEEDED)
+        logger.info(f"✅ Job {job.job_id} ({job.kind}): {job.status}")
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Job {job_id} não encontrado")
+        return job
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Jobs conhecidos, mais recentes primeiro"""
+        with self._lock:
+            self._purge()
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
+
+    def cancel(self, job_id: str) -> Job:
+        """Pede o cancelamento; job ainda na fila é cancelado na hora"""
+        job = self.get(job_id)
+        if job.finished:
+            raise ValueError(f"Job {job_id} já terminou ({job.status})")
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.set_status(JOB_CANCELLED)
+        return job
+
+    def shutdown(self, wait: bool = False):
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                job.cancel_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def load_progress_reporter(job: Job) -> Callable[[Dict[str, Any]], None]:
+    """Callback de progresso da Etapa 3 → eventos do job (batches resumidos, rejeitadas acumuladas)"""
+    rejected_before_load = 0
+    rejected_on_load = 0
+
+    def report(progress: Dict[str, Any]):
+        nonlocal rejected_before_load, rejected_on_load
+        if progress.get("stage") == "load":
+            rejected_on_load += len(progress.get("rejects", []))
+            job.report(stage="load", batch=progress["batch"], rows_loaded=progress["rows_loaded"],
+                       total_rows=progress["total_rows"], rows_rejected=rejected_before_load + rejected_on_load,
+                       error=progress.get("error"))
+        else:
+            rejected_before_load = progress.get("rows_rejected", rejected_before_load)
+            job.report(**progress)
+
+    return report
+
+
+# Instância global do gerenciador de jobs
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Retorna instância singleton do gerenciador de jobs"""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                from config.settings import get_settings
+                settings = get_settings()
+                _job_manager = JobManager(settings.jobs_max_workers, settings.jobs_max_active,
+                                          settings.jobs_retention_seconds)
+    return _job_manager
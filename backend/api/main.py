@@ -3,14 +3,18 @@ ConectaBoi ETL - API Principal
 FastAPI application para interface com o sistema ETL inteligente
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 import sys
 import os
+import asyncio
 import logging
+import threading
+import io
 import json
 import pandas as pd
 import re
@@ -20,7 +24,28 @@ from datetime import datetime
 # Adiciona o diretório backend ao path para imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from etl.conectaboi_etl_smart import ConectaBoiETL
+from api.executors import (
+    call_cpu, get_io_executor, prewarm_cpu_executor, run_cpu, run_io, shutdown_executors
+)
+from api.compression import CompressionMiddleware
+from api.health import (
+    PROBE_FAILED, PROBE_NOT_CONFIGURED, PROBE_OPERATIONAL, PROBE_TABLE, PROBE_UNKNOWN, get_health_prober
+)
+from api.jobs import Job, JobQueueFullError, get_job_manager, load_progress_reporter
+from etl.checkpoint import list_journals, open_journal
+from etl.conectaboi_etl_smart import ConectaBoiETL, parse_csv_file
+from etl.file_type_index import get_file_type_index
+from etl.loader import (
+    LOAD_MODE_UPSERT, BatchLoader, create_load_backend, deduplicate_rows, natural_key_for, resolve_load_mode
+)
+from etl.reject_store import get_reject_store, read_corrections
+from etl.frame_handoff import sweep_handoff_dir
+from etl.result_cache import decode_cursor, get_result_cache, page_rows, select_rows
+from etl.schema_cache import get_schema_cache
+from etl.supabase_client import close_supabase_clients
+from etl.serializer import dumps, encode_envelope, frame_to_columnar, iter_frame_ndjson
+from etl.watermark_store import get_watermark_store
+from etl.schema_registry import bootstrap_schema_registry, get_schema_registry, resolve_snapshot_path
 from config.settings import get_settings
 
 def _convert_brazilian_numeric_format(df: pd.DataFrame) -> pd.DataFrame:
@@ -95,6 +120,9 @@ def _convert_brazilian_numeric_format(df: pd.DataFrame) -> pd.DataFrame:
     
     return df_copy
 
+# Formatos das linhas nas respostas JSON (ver etl.serializer.frame_to_columnar)
+DATA_FORMATS = ("records", "columnar")
+
 # Modelos Pydantic
 class ProcessStep1Request(BaseModel):
     """Modelo para requisição de processamento da Etapa 1"""
@@ -109,6 +137,7 @@ class ProcessStep2PreviewRequest(BaseModel):
     column_mapping: list
     skip_first_line: bool = False
     preview_rows: int = 20
+    data_format: str = "records"  # "records" (lista de objetos) ou "columnar" (ver frame_to_columnar)
 
 class ColumnMapping(BaseModel):
     """Modelo para mapeamento de coluna"""
@@ -123,8 +152,15 @@ class ProcessStep3LoadRequest(BaseModel):
     column_mapping: list
     target_table: str
     skip_first_line: bool = False
-    batch_size: int = 1000
+    batch_size: Optional[int] = None  # None = tamanho adaptativo por bytes de payload
     auto_remove_outliers: bool = True  # Novo parâmetro para filtragem automática
+    workers: Optional[int] = None  # Batches em paralelo (None = settings.loader_workers)
+    load_backend: Optional[str] = None  # "rest" ou "copy" (None = configuração por tabela)
+    load_mode: Optional[str] = None  # "insert" ou "upsert" pela chave natural (None = configuração)
+    incremental: Optional[bool] = None  # Carga incremental por marca d'água (None = configuração)
+    source: Optional[str] = None  # Origem do arquivo para a marca d'água (None = nome do arquivo)
+    checkpoint: Optional[bool] = None  # Diário de batches para retomada (None = configuração)
+    background: bool = False  # Executa como job e retorna o job_id na hora
 
 class ValidateDimensionRequest(BaseModel):
     """Modelo para validação contra tabela de dimensão"""
@@ -145,6 +181,7 @@ class FilterOutliersRequest(BaseModel):
     
     # Mapeamento de colunas para aplicar antes da filtragem
     column_mapping: Optional[list] = None
+    background: bool = False  # Executa como job e retorna o job_id na hora
 
 # Configuração de logging
 import os
@@ -162,11 +199,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Partida e encerramento da API
+
+    Na partida: snapshot de schemas (sem rede), limpeza de frames órfãos,
+    cliente Supabase com pool compartilhado e instância do ETL (a conexão é
+    testada aqui, nenhuma requisição paga a configuração), aquecimento do
+    pool de CPU e sonda de saúde. No encerramento: para a sonda, cancela
+    jobs, para os pools e fecha as conexões.
+    """
+    try:
+        bootstrap_schema_registry()
+    except Exception as e:
+        logger.warning(f"Partida a quente do registro de schemas falhou: {e}")
+    
+    # Frames Arrow deixados por workers interrompidos na execução anterior
+    try:
+        sweep_handoff_dir()
+    except Exception as e:
+        logger.warning(f"Limpeza dos frames Arrow falhou: {e}")
+    
+    try:
+        await run_io(get_etl_instance)
+    except Exception as e:
+        logger.warning(f"Inicialização do ETL falhou (nova tentativa na primeira requisição): {e}")
+    
+    # Processos do pool de CPU sobem em segundo plano (imports e caches carregados)
+    if get_settings().cpu_executor_prewarm:
+        get_io_executor().submit(prewarm_cpu_executor)
+    
+    # Sonda do Supabase: /health responde com o último estado medido
+    get_health_prober().start()
+    
+    yield
+    
+    get_health_prober().stop(timeout=1)
+    # Jobs em andamento recebem cancelamento (cargas ficam retomáveis pelo checkpoint)
+    get_job_manager().shutdown(wait=False)
+    shutdown_executors(wait=False)
+    close_supabase_clients()
+
 # Inicialização da aplicação
 app = FastAPI(
     title="ConectaBoi ETL API",
     description="API para processamento inteligente de dados de confinamento bovino",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuração CORS
@@ -178,16 +258,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Instância global do ETL
+# Compressão gzip/br das respostas JSON, NDJSON e CSV (negociada pelo Accept-Encoding)
+if get_settings().response_compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=get_settings().response_compression_min_bytes,
+        gzip_level=get_settings().response_gzip_level,
+        brotli_quality=get_settings().response_brotli_quality,
+    )
+
+# Instância global do ETL (criada no lifespan; compartilhada pelas threads do pool de I/O e pelos jobs)
 etl_instance = None
+etl_instance_lock = threading.Lock()
 
 def get_etl_instance():
-    """Obtém instância singleton do ETL"""
+    """Obtém instância singleton do ETL (thread-safe; usa o cliente Supabase compartilhado)"""
     global etl_instance
     if etl_instance is None:
-        etl_instance = ConectaBoiETL()
+        with etl_instance_lock:
+            if etl_instance is None:
+                etl = ConectaBoiETL()
+                # A API conecta na partida (lifespan); scripts e CLI conectam no primeiro uso
+                etl.setup_supabase()
+                if get_settings().etl_stages_in_processes:
+                    etl.stage_executor = call_cpu
+                etl_instance = etl
     return etl_instance
 
+def _submit_job(kind: str, fn, params: Dict[str, Any]) -> JSONResponse:
+    """Enfileira o trabalho e responde 202 com o job_id (429 se o limite de jobs foi atingido)"""
+    try:
+        job = get_job_manager().submit(kind, fn, params)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JSONResponse(status_code=202, content={
+        "status": "accepted",
+        "job": job.snapshot(),
+        "status_url": f"/jobs/{job.job_id}",
+        "events_url": f"/jobs/{job.job_id}/events",
+        "result_url": f"/jobs/{job.job_id}/result"
+    })
+
 @app.get("/")
 async def root():
     """Endpoint de status da API"""
@@ -195,82 +306,46 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Verificação de saúde da API"""
-    try:
-        etl = get_etl_instance()
-        # Teste simples de conexão com Supabase se disponível
-        if etl.supabase:
-            try:
-                # Testa uma query simples
-                result = etl.supabase.table('information_schema.tables').select('table_name').limit(1).execute()
-                return {"status": "healthy", "database": "connected", "supabase": "operational"}
-            except Exception as db_error:
-                return {"status": "partial", "database": "connection_issue", "supabase": str(db_error)}
-        else:
-            return {"status": "healthy", "database": "not_configured", "supabase": "simulated_mode"}
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return JSONResponse(
-            status_code=200,  # Mudança: sempre retorna 200 para não quebrar o frontend
-            content={"status": "unhealthy", "error": str(e)}
-        )
+    """Verificação de saúde da API (estado do Supabase vem da sonda em segundo plano, sem consulta)"""
+    probe = get_health_prober().snapshot()
+    if probe["status"] == PROBE_OPERATIONAL:
+        return {"status": "healthy", "database": "connected", "supabase": "operational", "probe": probe}
+    if probe["status"] == PROBE_NOT_CONFIGURED:
+        return {"status": "healthy", "database": "not_configured", "supabase": "simulated_mode", "probe": probe}
+    if probe["status"] == PROBE_UNKNOWN:
+        return {"status": "healthy", "database": "checking", "supabase": "checking", "probe": probe}
+    return {"status": "partial", "database": "connection_issue", "supabase": probe["error"], "probe": probe}
 
 @app.get("/health/supabase")
 async def supabase_health_check():
-    """Verificação específica de conectividade com Supabase"""
-    try:
-        etl = get_etl_instance()
-        
-        if not etl.supabase:
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "connected": False,
-                    "status": "not_configured",
-                    "message": "Supabase não configurado",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-        
-        # Teste de conectividade real
-        try:
-            # Tentar uma operação simples que funciona se conectado
-            result = etl.supabase.table('etl_staging_01_historico_consumo').select('*').limit(1).execute()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "connected": True,
-                    "status": "operational",
-                    "message": "Supabase conectado e operacional",
-                    "timestamp": datetime.now().isoformat(),
-                    "test_table": "etl_staging_01_historico_consumo"
-                }
-            )
-            
-        except Exception as supabase_error:
-            logger.warning(f"Supabase connection test failed: {supabase_error}")
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "connected": False,
-                    "status": "connection_failed",
-                    "message": f"Falha na conexão: {str(supabase_error)}",
-                    "timestamp": datetime.now().isoformat()
-                }
-            )
-            
-    except Exception as e:
-        logger.error(f"Supabase health check failed: {e}")
-        return JSONResponse(
-            status_code=200,
-            content={
-                "connected": False,
-                "status": "error",
-                "message": f"Erro interno: {str(e)}",
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+    """Verificação específica de conectividade com Supabase (último resultado da sonda e latências)"""
+    probe = get_health_prober().snapshot()
+    messages = {
+        PROBE_OPERATIONAL: "Supabase conectado e operacional",
+        PROBE_NOT_CONFIGURED: "Supabase não configurado",
+        PROBE_UNKNOWN: "Primeira verificação em andamento",
+        PROBE_FAILED: f"Falha na conexão: {probe['error']}"
+    }
+    return {
+        "connected": probe["connected"],
+        "status": probe["status"],
+        "message": messages.get(probe["status"], probe["status"]),
+        "timestamp": probe["checked_at"] or datetime.now().isoformat(),
+        "test_table": PROBE_TABLE,
+        "latency_ms": probe["latency_ms"],
+        "probe": probe
+    }
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def classify_upload_head(head: bytes, file_name: str) -> Dict[str, Any]:
+    """Classifica o arquivo a partir das duas primeiras linhas do upload"""
+    lines = head.decode("utf-8", errors="replace").splitlines()[:2]
+    classification = get_file_type_index().classify_header_lines(lines, file_name)
+    if classification["file_type"]:
+        logger.info(f"🗂️ Arquivo classificado como {classification['file_type']} "
+                    f"({classification['method']}, confiança {classification['confidence']})")
+    return classification
 
 @app.post("/upload-csv")
 async def upload_csv(file: UploadFile = File(...)):
@@ -294,15 +369,27 @@ async def upload_csv(file: UploadFile = File(...)):
         file_id = f"{timestamp}_{safe_filename}"
         file_path = temp_dir / file_id
         
-        # Salvar arquivo
-        content = await file.read()
+        # Salvar arquivo em blocos, classificando pelas primeiras linhas do primeiro bloco
+        head = b""
+        classification = None
         with open(file_path, "wb") as f:
-            f.write(content)
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await run_io(f.write, chunk)
+                if classification is None:
+                    head += chunk
+                    if head.count(b"\n") >= 2:
+                        classification = classify_upload_head(head, file.filename)
+        if classification is None:
+            classification = classify_upload_head(head, file.filename)
         
         # Detectar estrutura básica
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         try:
-            structure_info = etl.detect_csv_structure(str(file_path))
+            structure_info = await run_io(etl.detect_csv_structure, str(file_path),
+                                          classification.get("skip_first_line", False))
         except Exception as e:
             logger.warning(f"Erro ao detectar estrutura: {e}")
             structure_info = {"error": str(e), "basic_info": f"Arquivo salvo: {file_path}"}
@@ -314,6 +401,7 @@ async def upload_csv(file: UploadFile = File(...)):
             "file_path": str(file_path),
             "original_filename": file.filename,
             "structure_info": structure_info,
+            "classification": classification,
             "message": "Arquivo enviado com sucesso"
         }
         
@@ -330,76 +418,249 @@ async def process_step2_preview(request: ProcessStep2PreviewRequest):
     try:
         logger.info(f"Processando preview da Etapa 2 para arquivo: {request.file_id}")
         
+        if request.data_format not in DATA_FORMATS:
+            raise HTTPException(status_code=400, detail=f"data_format inválido: {request.data_format}")
+        
         file_path = Path("../../data/temp") / request.file_id
         
         if not file_path.exists():
             raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
         
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         
         # Processar dados conforme mapeamento configurado
-        preview_result = etl.process_step2_preview(
+        preview_result = await run_io(
+            etl.process_step2_preview,
             file_path=str(file_path),
             column_mapping=request.column_mapping,
             skip_first_line=request.skip_first_line,
             preview_rows=request.preview_rows
         )
         
+        transformed = preview_result.get("transformed_data") if isinstance(preview_result, dict) else None
+        if request.data_format == "columnar" and transformed and "preview_rows" in transformed:
+            transformed["preview_rows"] = frame_to_columnar(
+                pd.DataFrame.from_records(transformed["preview_rows"], columns=transformed.get("columns")))
+        
         logger.info("Preview da Etapa 2 concluído com sucesso")
-        return {
+        response = {
             "success": True,
             "preview_data": preview_result,
             "message": "Preview dos dados transformados gerado com sucesso"
         }
+        return Response(content=dumps(response), media_type="application/json")
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no preview da Etapa 2: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro no preview: {str(e)}")
 
+def _run_step3_load(request: ProcessStep3LoadRequest, job: Job = None) -> Dict[str, Any]:
+    """Carga da Etapa 3 (na própria requisição ou como job, com progresso e cancelamento)"""
+    file_path = Path("../../data/temp") / request.file_id
+    etl = get_etl_instance()
+    
+    # Carregar dados no banco de dados
+    load_result = etl.process_step3_load_data(
+        file_path=str(file_path),
+        column_mapping=request.column_mapping,
+        target_table=request.target_table,
+        skip_first_line=request.skip_first_line,
+        batch_size=request.batch_size,
+        auto_remove_outliers=request.auto_remove_outliers,
+        workers=request.workers,
+        load_backend=request.load_backend,
+        load_mode=request.load_mode,
+        incremental=request.incremental,
+        source=request.source,
+        checkpoint=request.checkpoint,
+        progress_callback=load_progress_reporter(job) if job else None,
+        cancel_event=job.cancel_event if job else None
+    )
+    
+    if load_result["success"]:
+        logger.info(f"Carregamento concluído: {load_result['load_summary']['rows_loaded']} linhas")
+        return {
+            "success": True,
+            "load_result": load_result,
+            "message": f"Dados carregados com sucesso na tabela {request.target_table}"
+        }
+    elif load_result.get("cancelled"):
+        return {
+            "success": False,
+            "load_result": load_result,
+            "message": "Carga cancelada; retome pelo checkpoint para enviar o restante"
+        }
+    else:
+        logger.error(f"Falha no carregamento: {load_result.get('error', 'Erro desconhecido')}")
+        return {
+            "success": False,
+            "load_result": load_result,
+            "message": "Falha no carregamento dos dados"
+        }
+
 @app.post("/process-step3-load")
 async def process_step3_load(request: ProcessStep3LoadRequest):
     """
     Carrega dados finalmente no banco de dados após validação do preview
+    
+    Com background=true retorna 202 com o job_id; o progresso sai em /jobs/{job_id}/events.
     """
+    logger.info(f"Carregando dados da Etapa 3 para tabela: {request.target_table}")
+    
+    if not (Path("../../data/temp") / request.file_id).exists():
+        raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
+    
+    if request.background:
+        return _submit_job("step3_load", lambda job: _run_step3_load(request, job),
+                           {"file_id": request.file_id, "target_table": request.target_table})
+    
     try:
-        logger.info(f"Carregando dados da Etapa 3 para tabela: {request.target_table}")
-        
-        file_path = Path("../../data/temp") / request.file_id
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
-        
-        etl = get_etl_instance()
-        
-        # Carregar dados no banco de dados
-        load_result = etl.process_step3_load_data(
-            file_path=str(file_path),
-            column_mapping=request.column_mapping,
-            target_table=request.target_table,
-            skip_first_line=request.skip_first_line,
-            batch_size=request.batch_size,
-            auto_remove_outliers=request.auto_remove_outliers
-        )
-        
-        if load_result["success"]:
-            logger.info(f"Carregamento concluído: {load_result['load_summary']['rows_loaded']} linhas")
-            return {
-                "success": True,
-                "load_result": load_result,
-                "message": f"Dados carregados com sucesso na tabela {request.target_table}"
-            }
-        else:
-            logger.error(f"Falha no carregamento: {load_result.get('error', 'Erro desconhecido')}")
-            return {
-                "success": False,
-                "load_result": load_result,
-                "message": "Falha no carregamento dos dados"
-            }
-        
+        return await run_io(_run_step3_load, request)
     except Exception as e:
         logger.error(f"Erro no carregamento da Etapa 3: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro no carregamento: {str(e)}")
 
+class ResumeStep3LoadRequest(BaseModel):
+    """Modelo para retomar uma carga da Etapa 3 interrompida"""
+    workers: Optional[int] = None
+    resend_in_doubt: bool = False  # Reenvia batches em dúvida fora do upsert (pode duplicar linhas)
+
+@app.post("/process-step3-load/{run_id}/resume")
+async def resume_step3_load(run_id: str, request: ResumeStep3LoadRequest = ResumeStep3LoadRequest()):
+    """
+    Retoma uma carga da Etapa 3 interrompida a partir do checkpoint, sem reenviar linhas já gravadas
+    """
+    try:
+        load_result = await run_io(lambda: get_etl_instance().resume_step3_load(
+            run_id, workers=request.workers, resend_in_doubt=request.resend_in_doubt))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao retomar carga {run_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao retomar carga: {str(e)}")
+    
+    message = "Carga retomada e concluída" if load_result["success"] else "Falha ao retomar a carga"
+    checkpoint_info = load_result.get("checkpoint") or {}
+    if checkpoint_info.get("in_doubt_resent_without_key"):
+        message += (f" ({checkpoint_info['in_doubt_batches']} batches em dúvida reenviados sem chave natural: "
+                    f"confira duplicatas na tabela)")
+    return {
+        "success": load_result["success"],
+        "load_result": load_result,
+        "message": message
+    }
+
+@app.get("/etl/checkpoints")
+async def list_checkpoints():
+    """
+    Lista as execuções da Etapa 3 com checkpoint, mais recentes primeiro
+    """
+    return {
+        "status": "success",
+        "checkpoints": await run_io(list_journals)
+    }
+
+@app.get("/etl/checkpoints/{run_id}")
+async def get_checkpoint(run_id: str):
+    """
+    Resumo e batches registrados de uma execução
+    """
+    def read_checkpoint():
+        journal = open_journal(run_id)
+        return {"status": "success", "checkpoint": journal.summary(),
+                "batches": list(journal.state()["batches"].values())}
+    
+    try:
+        return await run_io(read_checkpoint)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    Lista os jobs em segundo plano (ativos e terminados ainda retidos)
+    """
+    manager = get_job_manager()
+    return {
+        "status": "success",
+        "active": manager.active_count(),
+        "max_active": manager.max_active,
+        "jobs": manager.list()
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Situação e progresso (linhas lidas, convertidas, carregadas, rejeitadas) de um job
+    """
+    try:
+        return {"status": "success", "job": get_job_manager().get(job_id).snapshot()}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, after: int = 0, last_event_id: Optional[str] = Header(None)):
+    """
+    Progresso do job via Server-Sent Events; termina quando o job termina
+    
+    Reconexões retomam do Last-Event-ID (ou ?after=N) sem repetir eventos.
+    """
+    try:
+        job = get_job_manager().get(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    
+    async def event_stream():
+        seq = after
+        while True:
+            events = await asyncio.to_thread(job.events_after, seq, 15.0)
+            for event in events:
+                seq = event["seq"]
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if job.finished and seq >= job.last_seq:
+                break
+            if not events:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Resultado do job terminado (mesmo corpo da resposta síncrona do endpoint)
+    """
+    try:
+        job = get_job_manager().get(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} ainda em andamento ({job.status})")
+    if job.result is None:
+        raise HTTPException(status_code=410, detail=job.error or f"Job {job_id} terminou sem resultado ({job.status})")
+    if isinstance(job.result, bytes):
+        return Response(content=job.result, media_type="application/json")
+    return job.result
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancela o job: na fila sai na hora; em execução para entre etapas/batches
+    """
+    try:
+        job = get_job_manager().cancel(job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "success", "job": job.snapshot()}
+
 @app.post("/validate-dimension")
 async def validate_dimension(request: ValidateDimensionRequest):
     """
@@ -413,10 +674,10 @@ async def validate_dimension(request: ValidateDimensionRequest):
         if not file_path.exists():
             raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
         
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         
-        # Carregar dados para extrair valores da coluna
-        df = etl._load_and_prepare_dataframe(str(file_path), request.skip_first_line)
+        # Carregar dados para extrair valores da coluna (parse no pool de processos)
+        df = await run_cpu(parse_csv_file, str(file_path), request.skip_first_line)
         
         if request.csv_column not in df.columns:
             raise HTTPException(
@@ -428,7 +689,8 @@ async def validate_dimension(request: ValidateDimensionRequest):
         column_values = df[request.csv_column].dropna().astype(str).tolist()
         
         # Validar contra tabela de dimensão
-        validation_result = etl.validate_against_dimension_table(
+        validation_result = await run_io(
+            etl.validate_against_dimension_table,
             data_values=column_values,
             dimension_table=request.dimension_table,
             lookup_column=request.lookup_column
@@ -453,74 +715,93 @@ async def validate_dimension(request: ValidateDimensionRequest):
         logger.error(f"Erro na validação de dimensão: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro na validação: {str(e)}")
 
+def _run_filter_outliers(request: FilterOutliersRequest, job: Job = None) -> Dict[str, Any]:
+    """Filtragem de outliers (na própria requisição ou como job)"""
+    file_path = Path("../../data/temp") / request.file_id
+    
+    etl = get_etl_instance()
+    
+    # Carregar dados (parse no pool de processos)
+    df = call_cpu(parse_csv_file, str(file_path), request.skip_first_line)
+    if job:
+        job.report(stage="parse", rows_parsed=len(df))
+        job.check_cancelled()
+    
+    # Aplicar mapeamento de colunas se fornecido
+    if request.column_mapping:
+        df = etl._apply_column_mapping_transformations(df, request.column_mapping)
+    if job:
+        job.report(stage="convert", rows_converted=len(df))
+        job.check_cancelled()
+    
+    # Verificar se coluna existe
+    if request.column_name not in df.columns:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Coluna '{request.column_name}' não encontrada no arquivo"
+        )
+    
+    # Filtrar outliers
+    filter_result = etl.filter_outliers_by_dimension(
+        df=df,
+        column_name=request.column_name,
+        dimension_table=request.dimension_table,
+        lookup_column=request.lookup_column,
+        remove_outliers=request.remove_outliers
+    )
+    
+    if filter_result["success"]:
+        logger.info(f"Filtragem concluída: {filter_result['outliers_removed']} outliers removidos")
+        if job:
+            job.report(stage="filter", rows_rejected=filter_result['outliers_removed'])
+        
+        # Salvar DataFrame filtrado se outliers foram removidos
+        if filter_result['outliers_removed'] > 0 and request.remove_outliers:
+            filtered_df = filter_result['filtered_dataframe']
+            filtered_file_path = Path("../../data/temp") / f"filtered_{request.file_id}"
+            
+            # Salvar arquivo filtrado
+            filtered_df.to_csv(filtered_file_path, index=False, encoding='utf-8')
+            logger.info(f"Arquivo filtrado salvo: {filtered_file_path}")
+            
+            filter_result['filtered_file_id'] = f"filtered_{request.file_id}"
+        
+        return {
+            "success": True,
+            "filter_result": filter_result,
+            "message": f"Filtragem concluída: {filter_result['outliers_removed']} outliers removidos"
+        }
+    else:
+        logger.error(f"Falha na filtragem: {filter_result.get('error', 'Erro desconhecido')}")
+        return {
+            "success": False,
+            "filter_result": filter_result,
+            "message": "Falha na filtragem de outliers"
+        }
+
 @app.post("/filter-outliers")
 async def filter_outliers(request: FilterOutliersRequest):
     """
     Filtra outliers baseado em validação contra tabela de dimensão
     Remove automaticamente registros que não existem na dimensão
+    
+    Com background=true retorna 202 com o job_id; o progresso sai em /jobs/{job_id}/events.
     """
+    logger.info(f"Filtrando outliers para arquivo: {request.file_id}")
+    logger.info(f"Coluna: {request.column_name}, Dimensão: {request.dimension_table}")
+    
+    if not (Path("../../data/temp") / request.file_id).exists():
+        raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
+    
+    if request.background:
+        return _submit_job("filter_outliers", lambda job: _run_filter_outliers(request, job),
+                           {"file_id": request.file_id, "column_name": request.column_name,
+                            "dimension_table": request.dimension_table})
+    
     try:
-        logger.info(f"Filtrando outliers para arquivo: {request.file_id}")
-        logger.info(f"Coluna: {request.column_name}, Dimensão: {request.dimension_table}")
-        
-        file_path = Path("../../data/temp") / request.file_id
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
-        
-        # Inicializar ETL
-        etl = ConectaBoiETL()
-        
-        # Carregar dados
-        df = etl._load_and_prepare_dataframe(str(file_path), request.skip_first_line)
-        
-        # Aplicar mapeamento de colunas se fornecido
-        if request.column_mapping:
-            df = etl._apply_column_mapping_transformations(df, request.column_mapping)
-        
-        # Verificar se coluna existe
-        if request.column_name not in df.columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Coluna '{request.column_name}' não encontrada no arquivo"
-            )
-        
-        # Filtrar outliers
-        filter_result = etl.filter_outliers_by_dimension(
-            df=df,
-            column_name=request.column_name,
-            dimension_table=request.dimension_table,
-            lookup_column=request.lookup_column,
-            remove_outliers=request.remove_outliers
-        )
-        
-        if filter_result["success"]:
-            logger.info(f"Filtragem concluída: {filter_result['outliers_removed']} outliers removidos")
-            
-            # Salvar DataFrame filtrado se outliers foram removidos
-            if filter_result['outliers_removed'] > 0 and request.remove_outliers:
-                filtered_df = filter_result['filtered_dataframe']
-                filtered_file_path = Path("../../data/temp") / f"filtered_{request.file_id}"
-                
-                # Salvar arquivo filtrado
-                filtered_df.to_csv(filtered_file_path, index=False, encoding='utf-8')
-                logger.info(f"Arquivo filtrado salvo: {filtered_file_path}")
-                
-                filter_result['filtered_file_id'] = f"filtered_{request.file_id}"
-            
-            return {
-                "success": True,
-                "filter_result": filter_result,
-                "message": f"Filtragem concluída: {filter_result['outliers_removed']} outliers removidos"
-            }
-        else:
-            logger.error(f"Falha na filtragem: {filter_result.get('error', 'Erro desconhecido')}")
-            return {
-                "success": False,
-                "filter_result": filter_result,
-                "message": "Falha na filtragem de outliers"
-            }
-        
+        return await run_io(_run_filter_outliers, request)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na filtragem de outliers: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro na filtragem: {str(e)}")
@@ -538,10 +819,11 @@ async def process_step1(request: ProcessStep1Request):
         if not file_path.exists():
             raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
         
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         
         # Processar arquivo conforme configurações da Etapa 1
-        processed_data = etl.process_step1_complete(
+        processed_data = await run_io(
+            etl.process_step1_complete,
             file_path=str(file_path),
             skip_first_line=request.skip_first_line,
             selected_table=request.selected_table,
@@ -578,12 +860,12 @@ async def prepare_for_mapping(
         # Salva o arquivo temporariamente
         temp_file_path = f"../../data/input/temp_mapping_{file.filename}"
         content = await file.read()
-        with open(temp_file_path, 'wb') as f:
-            f.write(content)
+        await run_io(Path(temp_file_path).write_bytes, content)
         
         # Processa completamente o arquivo
-        etl = get_etl_instance()
-        result = etl.process_csv_with_preprocessing(
+        etl = await run_io(get_etl_instance)
+        result = await run_io(
+            etl.process_csv_with_preprocessing,
             file_path=temp_file_path,
             target_table=target_table,
             skip_first_line=skip_first_line
@@ -608,13 +890,13 @@ async def prepare_for_mapping(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/etl/table-schema/{table_name}")
-async def get_table_schema_detailed(table_name: str):
+async def get_table_schema_detailed(table_name: str, refresh: bool = False):
     """
-    Retorna schema detalhado de uma tabela específica consultando diretamente o Supabase
+    Retorna schema detalhado de uma tabela específica (cache com TTL; refresh=true consulta o Supabase)
     """
     try:
-        etl = get_etl_instance()
-        schema_info = etl.get_supabase_table_schema(table_name)
+        etl = await run_io(get_etl_instance)
+        schema_info = await run_io(etl.get_supabase_table_schema, table_name, force_refresh=refresh)
         
         return {
             "status": "success",
@@ -624,6 +906,215 @@ async def get_table_schema_detailed(table_name: str):
         logger.error(f"Erro ao obter schema detalhado da tabela {table_name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/etl/schema-registry/reload")
+async def reload_schema_registry():
+    """
+    Recarrega o registro de schemas a partir do OpenAPI do PostgREST e invalida o cache
+    """
+    try:
+        settings = get_settings()
+        registry = get_schema_registry()
+        table_count = await run_io(
+            registry.load_openapi, settings.supabase_url, settings.supabase_service_role_key
+        )
+        await run_io(registry.save_snapshot, resolve_snapshot_path(settings.schema_snapshot_path))
+        get_schema_cache().invalidate()
+        return {
+            "status": "success",
+            "tables_loaded": table_count
+        }
+    except Exception as e:
+        logger.error(f"Erro ao recarregar registro de schemas: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+@app.get("/etl/schema-cache")
+async def get_schema_cache_stats():
+    """
+    Retorna estatísticas do cache de schemas
+    """
+    return {
+        "status": "success",
+        "cache": get_schema_cache().stats()
+    }
+
+@app.delete("/etl/schema-cache")
+async def invalidate_schema_cache(table_name: Optional[str] = None):
+    """
+    Invalida o cache de schemas (uma tabela ou todas)
+    """
+    removed = get_schema_cache().invalidate(table_name)
+    return {
+        "status": "success",
+        "invalidated": removed,
+        "table_name": table_name
+    }
+
+@app.get("/etl/watermarks")
+async def list_watermarks():
+    """
+    Lista as marcas d'água da carga incremental (tabela, origem, último instante)
+    """
+    return {
+        "status": "success",
+        "watermarks": get_watermark_store().entries()
+    }
+
+@app.delete("/etl/watermarks/{table_name}")
+async def reset_watermark(table_name: str, source: Optional[str] = None):
+    """
+    Remove a marca d'água de uma tabela (uma origem ou todas) para recarregar o período
+    """
+    removed = get_watermark_store().reset(table_name, source)
+    return {
+        "status": "success",
+        "removed": removed,
+        "table_name": table_name,
+        "source": source
+    }
+
+@app.get("/etl/results/{result_id}")
+async def get_result_info(result_id: str):
+    """
+    Linhas, colunas e tamanho de um resultado do Quick ETL mantido no servidor
+    """
+    try:
+        return {"status": "success", "result": get_result_cache().describe(result_id)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Resultado {result_id} não encontrado ou expirado")
+
+@app.get("/etl/results/{result_id}/rows")
+async def get_result_rows(result_id: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                          data_format: str = "records"):
+    """
+    Página de linhas de um resultado em cache (paginação por cursor)
+    
+    next_cursor é null na última página. data_format=columnar devolve as linhas
+    no formato colunar.
+    """
+    if data_format not in DATA_FORMATS:
+        raise HTTPException(status_code=400, detail=f"data_format inválido: {data_format}")
+    settings = get_settings()
+    limit = min(limit or settings.result_page_rows, settings.result_page_max_rows)
+    try:
+        df = get_result_cache().get(result_id)
+        page, next_cursor = page_rows(df, result_id, cursor, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Resultado {result_id} não encontrado ou expirado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    envelope = {"status": "success", "result_id": result_id, "total": len(df), "next_cursor": next_cursor}
+    return Response(content=encode_envelope(envelope, "rows", page, columnar=data_format == "columnar"),
+                    media_type="application/json")
+
+@app.get("/etl/results/{result_id}/stream")
+async def stream_result_rows(result_id: str, cursor: Optional[str] = None):
+    """
+    Linhas de um resultado em cache como NDJSON (um registro por linha), em blocos
+    
+    Com cursor, continua a partir da página indicada.
+    """
+    try:
+        df = get_result_cache().get(result_id)
+        start = decode_cursor(cursor, result_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Resultado {result_id} não encontrado ou expirado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _ndjson_response(df, start=start, headers={"X-Total-Rows": str(len(df)), "X-Result-Id": result_id})
+
+@app.get("/etl/rejects")
+async def list_reject_runs():
+    """
+    Lista as execuções com linhas rejeitadas (tabela, contagens por etapa, pendentes)
+    """
+    return {
+        "status": "success",
+        "runs": await run_io(get_reject_store().runs)
+    }
+
+@app.get("/etl/rejects/{run_id}")
+async def get_reject_run(run_id: str, offset: int = 0, limit: int = 100):
+    """
+    Manifesto e linhas rejeitadas pendentes de uma execução (paginado)
+    """
+    def read_page():
+        store = get_reject_store()
+        manifest = store.manifest(run_id)
+        frame = store.read(run_id)
+        page = frame.iloc[max(0, offset):max(0, offset) + max(0, limit)]
+        return encode_envelope({"status": "success", "run": manifest, "total": len(frame),
+                                "offset": offset}, "rows", page)
+    
+    try:
+        content = await run_io(read_page)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=content, media_type="application/json")
+
+@app.get("/etl/rejects/{run_id}/download")
+async def download_reject_run(run_id: str):
+    """
+    Rejeitadas pendentes em CSV (editar os valores e reenviar em /corrections)
+    """
+    try:
+        content = await run_io(lambda: get_reject_store().read(run_id).to_csv(index=False))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=content, media_type="text/csv",
+                    headers={"Content-Disposition": f'attachment; filename="rejeitadas_{run_id}.csv"'})
+
+@app.post("/etl/rejects/{run_id}/corrections")
+async def upload_reject_corrections(run_id: str, file: UploadFile = File(...)):
+    """
+    Aplica correções (CSV ou Parquet com a coluna _row) às rejeitadas da execução
+    """
+    content = await file.read()
+    try:
+        corrections = await run_io(read_corrections, io.BytesIO(content), file.filename)
+        return {"status": "success", **await run_io(get_reject_store().apply_corrections, run_id, corrections)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class RejectReloadRequest(BaseModel):
+    """Modelo para recarregar rejeitadas corrigidas"""
+    rows: Optional[List[int]] = None  # Linhas de origem (None = todas as elegíveis)
+    only_corrected: bool = True
+    workers: Optional[int] = None
+
+@app.post("/etl/rejects/{run_id}/reload")
+async def reload_reject_run(run_id: str, request: RejectReloadRequest):
+    """
+    Recarrega só as rejeitadas corrigidas na tabela da execução
+    """
+    try:
+        etl = await run_io(get_etl_instance)
+        result = await run_io(
+            get_reject_store().reload,
+            run_id, rows=request.rows, only_corrected=request.only_corrected,
+            supabase_client=etl.supabase, workers=request.workers
+        )
+        return {"status": "success", **result}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao recarregar rejeitadas: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao recarregar rejeitadas: {str(e)}")
+
+@app.delete("/etl/rejects/{run_id}")
+async def delete_reject_run(run_id: str):
+    """
+    Remove as rejeitadas de uma execução
+    """
+    try:
+        removed = await run_io(get_reject_store().delete, run_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "success", "removed": removed, "run_id": run_id}
+
 @app.post("/etl/auto-mapping")
 async def generate_auto_mapping(
     file: UploadFile = File(...),
@@ -641,12 +1132,11 @@ async def generate_auto_mapping(
         
         # Salva temporariamente o arquivo
         temp_file_path = f"../../data/input/temp_{file.filename}"
-        with open(temp_file_path, 'wb') as f:
-            f.write(content)
+        await run_io(Path(temp_file_path).write_bytes, content)
         
         # Gera o mapeamento
-        etl = get_etl_instance()
-        mapping = etl.generate_auto_mapping(temp_file_path, target_table, skip_first_line)
+        etl = await run_io(get_etl_instance)
+        mapping = await run_io(etl.generate_auto_mapping, temp_file_path, target_table, skip_first_line)
         
         # Remove arquivo temporário
         os.remove(temp_file_path)
@@ -677,12 +1167,12 @@ async def process_etl(
         # Salva o arquivo de entrada
         input_file_path = f"../../data/input/{file.filename}"
         content = await file.read()
-        with open(input_file_path, 'wb') as f:
-            f.write(content)
+        await run_io(Path(input_file_path).write_bytes, content)
         
         # Processa o arquivo
-        etl = get_etl_instance()
-        result = etl.process_file(
+        etl = await run_io(get_etl_instance)
+        result = await run_io(
+            etl.process_file,
             file_path=input_file_path,
             target_table=config_data['target_table'],
             column_mapping=config_data['column_mapping'],
@@ -711,10 +1201,13 @@ async def get_available_tables():
     Retorna as tabelas disponíveis para ETL
     """
     try:
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
+        registry = await run_io(etl._ensure_schema_registry)
         return {
             "status": "success",
-            "tables": list(etl.table_schemas.keys())
+            "tables": registry.tables(),
+            "source": registry.source,
+            "loaded_at": registry.loaded_at
         }
     except Exception as e:
         logger.error(f"Erro ao obter tabelas: {e}")
@@ -726,7 +1219,7 @@ async def get_table_schema(table_name: str):
     Retorna o schema de uma tabela específica
     """
     try:
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         if table_name not in etl.table_schemas:
             raise HTTPException(status_code=404, detail="Tabela não encontrada")
         
@@ -746,161 +1239,258 @@ class ETLProcessRequest(BaseModel):
     excluded_rows: list[int] = []
     mappings: list[dict[str, Any]] = []
     skip_first_line: bool = True  # ✅ CORREÇÃO: Pular primeira linha por padrão para usar cabeçalhos reais
+    apply_dimension_suggestions: bool = False  # Aplica as sugestões "você quis dizer" como transformações
+    include_data: bool = True  # False = só result_id e uma prévia (result_preview_rows linhas)
+    # "json" (documento único), "page" (primeira página + next_cursor) ou "ndjson" (streaming)
+    response_mode: str = "json"
+    # "records" (lista de objetos) ou "columnar" (nomes uma vez, arrays e dicionários); json e page
+    data_format: str = "records"
+    background: bool = False  # Executa como job e retorna o job_id na hora
 
 class SupabaseUploadRequest(BaseModel):
     """Modelo para upload direto ao Supabase"""
     file_id: str
     table_name: str
-    data: list[dict[str, Any]]
+    data: Optional[list[dict[str, Any]]] = None  # Registros enviados pelo cliente (sem result_id)
+    result_id: Optional[str] = None  # Resultado do /etl/process-quick mantido no servidor
+    excluded_rows: list[int] = []  # Posições do resultado que não devem ser enviadas
+    load_mode: Optional[str] = None  # "insert" ou "upsert" pela chave natural (None = configuração)
 
-@app.post("/etl/process-quick")
-async def process_etl_simple(request: ETLProcessRequest):
-    """
-    Processa arquivo com transformações simples para Quick ETL
-    """
-    try:
-        logger.info(f"Processando ETL simples para arquivo: {request.file_id}")
-        
-        # 🔍 DEBUG: Log detalhado da requisição
-        logger.info(f"🔍 DEBUG - Configuração da requisição:")
-        logger.info(f"  skip_first_line: {request.skip_first_line}")
-        logger.info(f"  mappings count: {len(request.mappings) if request.mappings else 0}")
-        if request.mappings:
-            for i, mapping in enumerate(request.mappings):
-                logger.info(f"  mapping[{i}]: csvColumn='{mapping.get('csvColumn')}' → sqlColumn='{mapping.get('sqlColumn')}' (type={mapping.get('type')})")
-        
-        file_path = Path("../../data/temp") / request.file_id
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
-        
-        etl = get_etl_instance()
-        
-        # Carregar dados usando o valor de skip_first_line da requisição
-        df = etl._load_and_prepare_dataframe(str(file_path), skip_first_line=request.skip_first_line)
-        
-        # Se temos mappings, usar a lógica completa do ETL
-        if request.mappings and len(request.mappings) > 0:
-            logger.info(f"Aplicando {len(request.mappings)} mapeamentos de coluna")
-            logger.info(f"Colunas originais do DataFrame: {list(df.columns)}")
+def _process_quick(request: ETLProcessRequest, job: Job = None):
+    """Quick ETL: retorna o envelope da resposta (sem "data") e o DataFrame do resultado"""
+    logger.info(f"Processando ETL simples para arquivo: {request.file_id}")
+    
+    # 🔍 DEBUG: Log detalhado da requisição
+    logger.info(f"🔍 DEBUG - Configuração da requisição:")
+    logger.info(f"  skip_first_line: {request.skip_first_line}")
+    logger.info(f"  mappings count: {len(request.mappings) if request.mappings else 0}")
+    if request.mappings:
+        for i, mapping in enumerate(request.mappings):
+            logger.info(f"  mapping[{i}]: csvColumn='{mapping.get('csvColumn')}' → sqlColumn='{mapping.get('sqlColumn')}' (type={mapping.get('type')})")
+    
+    file_path = Path("../../data/temp") / request.file_id
+    
+    etl = get_etl_instance()
+    
+    # Carregar dados usando o valor de skip_first_line da requisição
+    df = call_cpu(parse_csv_file, str(file_path), request.skip_first_line)
+    if job:
+        job.report(stage="parse", rows_parsed=len(df))
+        job.check_cancelled()
+    
+    # Se temos mappings, usar a lógica completa do ETL
+    if request.mappings and len(request.mappings) > 0:
+        logger.info(f"Aplicando {len(request.mappings)} mapeamentos de coluna")
+        logger.info(f"Colunas originais do DataFrame: {list(df.columns)}")
+        
+        # Converter mappings para formato esperado pelo ETL
+        column_mapping = []
+        for mapping in request.mappings:
+            # Aplicar transformações específicas primeiro se existirem
+            if mapping.get('type') == 'derived' and mapping.get('transformations'):
+                csv_col = mapping.get('derivedFrom', mapping.get('csvColumn', ''))
+                if csv_col and csv_col in df.columns:
+                    logger.info(f"Aplicando transformações derivadas na coluna '{csv_col}'")
+                    for old_val, new_val in mapping['transformations'].items():
+                        df[csv_col] = df[csv_col].replace(old_val, new_val)
+                        logger.debug(f"  {old_val} → {new_val}")
+            
+            # Adicionar ao mapeamento no formato correto
+            csv_column = mapping.get('csvColumn', '')
+            sql_column = mapping.get('sqlColumn', '')
             
-            # Converter mappings para formato esperado pelo ETL
-            column_mapping = []
-            for mapping in request.mappings:
-                # Aplicar transformações específicas primeiro se existirem
-                if mapping.get('type') == 'derived' and mapping.get('transformations'):
-                    csv_col = mapping.get('derivedFrom', mapping.get('csvColumn', ''))
-                    if csv_col and csv_col in df.columns:
-                        logger.info(f"Aplicando transformações derivadas na coluna '{csv_col}'")
-                        for old_val, new_val in mapping['transformations'].items():
-                            df[csv_col] = df[csv_col].replace(old_val, new_val)
-                            logger.debug(f"  {old_val} → {new_val}")
+            if csv_column and sql_column:
+                # ✅ CORREÇÃO: Limpar nome da coluna CSV para coincidir com DataFrame limpo
+                csv_column_clean = etl._clean_column_name(csv_column.lower())
                 
-                # Adicionar ao mapeamento no formato correto
-                csv_column = mapping.get('csvColumn', '')
-                sql_column = mapping.get('sqlColumn', '')
+                column_mapping.append({
+                    'csv_column': csv_column_clean,  # ✅ Usar nome limpo!
+                    'db_column': sql_column,         # Formato esperado pela função  
+                    'enabled': True,
+                    'data_type': 'TEXT'
+                })
+                logger.debug(f"Mapeamento: '{csv_column}' → '{csv_column_clean}' → '{sql_column}'")
                 
-                if csv_column and sql_column:
-                    # ✅ CORREÇÃO: Limpar nome da coluna CSV para coincidir com DataFrame limpo
-                    csv_column_clean = etl._clean_column_name(csv_column.lower())
+                # Aplicar transformações específicas se existirem para este mapping
+                if mapping.get('transformations') and csv_column_clean in df.columns:
+                    logger.info(f"Aplicando transformações específicas na coluna '{csv_column_clean}'")
+                    for old_val, new_val in mapping['transformations'].items():
+                        df[csv_column_clean] = df[csv_column_clean].replace(old_val, new_val)
+                        logger.debug(f"  {old_val} → {new_val}")
+        
+        logger.info(f"Total de mapeamentos válidos: {len(column_mapping)}")
+        
+        # Aplicar mapeamento de colunas usando a função do ETL
+        df_result = etl._apply_column_mapping_transformations(df, column_mapping)
+        
+        logger.info(f"Colunas após mapeamento: {list(df_result.columns)}")
+        
+        # ✅ VALIDAÇÃO DE CURRAIS: Verificar se há mappings que precisam de validação com dim_curral
+        dimension_validation = {}
+        for mapping in request.mappings:
+            if mapping.get('validateInDimCurral') and mapping.get('sqlColumn'):
+                sql_column = mapping.get('sqlColumn')
+                if sql_column in df_result.columns:
+                    logger.info(f"🔍 Validando coluna '{sql_column}' contra dim_curral")
                     
-                    column_mapping.append({
-                        'csv_column': csv_column_clean,  # ✅ Usar nome limpo!
-                        'db_column': sql_column,         # Formato esperado pela função  
-                        'enabled': True,
-                        'data_type': 'TEXT'
-                    })
-                    logger.debug(f"Mapeamento: '{csv_column}' → '{csv_column_clean}' → '{sql_column}'")
+                    # Obter valores únicos da coluna para validação
+                    unique_values = df_result[sql_column].dropna().unique().tolist()
                     
-                    # Aplicar transformações específicas se existirem para este mapping
-                    if mapping.get('transformations') and csv_column_clean in df.columns:
-                        logger.info(f"Aplicando transformações específicas na coluna '{csv_column_clean}'")
-                        for old_val, new_val in mapping['transformations'].items():
-                            df[csv_column_clean] = df[csv_column_clean].replace(old_val, new_val)
-                            logger.debug(f"  {old_val} → {new_val}")
-            
-            logger.info(f"Total de mapeamentos válidos: {len(column_mapping)}")
-            
-            # Aplicar mapeamento de colunas usando a função do ETL
-            df_result = etl._apply_column_mapping_transformations(df, column_mapping)
-            
-            logger.info(f"Colunas após mapeamento: {list(df_result.columns)}")
-            
-            # ✅ VALIDAÇÃO DE CURRAIS: Verificar se há mappings que precisam de validação com dim_curral
-            for mapping in request.mappings:
-                if mapping.get('validateInDimCurral') and mapping.get('sqlColumn'):
-                    sql_column = mapping.get('sqlColumn')
-                    if sql_column in df_result.columns:
-                        logger.info(f"🔍 Validando coluna '{sql_column}' contra dim_curral")
+                    # Validar contra dim_curral
+                    validation_result = etl.validate_against_dimension_table(
+                        data_values=unique_values,
+                        dimension_table='dim_curral',
+                        lookup_column='nome'  # Assumindo que o campo é 'nome' na dim_curral
+                    )
+                    
+                    if validation_result.get('success') and validation_result.get('invalid_values'):
+                        invalid_currals = validation_result['invalid_values']
+                        logger.warning(f"⚠️ Currais inválidos encontrados: {invalid_currals}")
                         
-                        # Obter valores únicos da coluna para validação
-                        unique_values = df_result[sql_column].dropna().unique().tolist()
+                        # Sugestões no mesmo formato de mapping['transformations']
+                        suggested = validation_result.get('suggested_transformations', {})
+                        dimension_validation[sql_column] = {
+                            "invalid_values": invalid_currals,
+                            "suggestions": validation_result.get('suggestions', {}),
+                            "suggested_transformations": suggested
+                        }
                         
-                        # Validar contra dim_curral
-                        validation_result = etl.validate_against_dimension_table(
-                            data_values=unique_values,
-                            dimension_table='dim_curral',
-                            lookup_column='nome'  # Assumindo que o campo é 'nome' na dim_curral
-                        )
+                        if request.apply_dimension_suggestions and suggested:
+                            df_result[sql_column] = df_result[sql_column].replace(suggested)
+                            logger.info(f"💡 {len(suggested)} sugestões aplicadas como transformações em '{sql_column}'")
                         
-                        if validation_result.get('success') and validation_result.get('invalid_values'):
-                            invalid_currals = validation_result['invalid_values']
-                            logger.warning(f"⚠️ Currais inválidos encontrados: {invalid_currals}")
-                            
-                            # Opcional: Remover linhas com currais inválidos ou marcá-las
-                            # Por enquanto, apenas loggar o aviso
-                            logger.info(f"Total de registros com currais válidos mantidos: {len(df_result)}")
-            
-            # Remover colunas de controle ETL que têm defaults no Supabase
-            columns_to_remove = ['batch_id', 'uploaded_at', 'processed', 'created_at', 'id']
-            for col in columns_to_remove:
-                if col in df_result.columns:
-                    df_result = df_result.drop(columns=[col])
-                    logger.info(f"Removida coluna de controle: {col}")
-            
-            logger.info(f"Colunas finais para Supabase: {list(df_result.columns)}")
-            
-        else:
-            # Fallback: lógica simples original
-            logger.info("Nenhum mapeamento fornecido, usando transformações simples")
-            
-            # Aplicar transformações
-            for old_value, new_value in request.transformations.items():
-                df = df.replace(old_value, new_value)
-            
-            # Remover colunas excluídas
-            if request.excluded_columns:
-                existing_excluded_columns = [col for col in request.excluded_columns if col in df.columns]
-                if existing_excluded_columns:
-                    df = df.drop(columns=existing_excluded_columns)
-            
-            df_result = df
-        
-        # Remover linhas excluídas
-        if request.excluded_rows:
-            df_result = df_result.drop(index=request.excluded_rows, errors='ignore')
-        
-        # Converter formatos brasileiros (vírgula → ponto, dd/mm/yyyy → yyyy-mm-dd) antes de enviar para Supabase
-        df_result = _convert_brazilian_numeric_format(df_result)
-        
-        # Converter para lista de dicionários
-        data = df_result.to_dict('records')
-        
-        logger.info(f"ETL simples concluído: {len(data)} registros processados")
-        
-        return {
-            "status": "success",
-            "data": data,
-            "message": f"Processamento concluído: {len(data)} registros",
-            "summary": {
-                "total_records": len(data),
-                "transformations_applied": len(request.transformations),
-                "columns_removed": len(request.excluded_columns),
-                "rows_removed": len(request.excluded_rows),
-                "mappings_applied": len(request.mappings) if request.mappings else 0
-            }
+                        # Opcional: Remover linhas com currais inválidos ou marcá-las
+                        # Por enquanto, apenas loggar o aviso
+                        logger.info(f"Total de registros com currais válidos mantidos: {len(df_result)}")
+        
+        # Remover colunas de controle ETL que têm defaults no Supabase
+        columns_to_remove = ['batch_id', 'uploaded_at', 'processed', 'created_at', 'id']
+        for col in columns_to_remove:
+            if col in df_result.columns:
+                df_result = df_result.drop(columns=[col])
+                logger.info(f"Removida coluna de controle: {col}")
+        
+        logger.info(f"Colunas finais para Supabase: {list(df_result.columns)}")
+        
+    else:
+        # Fallback: lógica simples original
+        logger.info("Nenhum mapeamento fornecido, usando transformações simples")
+        dimension_validation = {}
+        
+        # Aplicar transformações
+        for old_value, new_value in request.transformations.items():
+            df = df.replace(old_value, new_value)
+        
+        # Remover colunas excluídas
+        if request.excluded_columns:
+            existing_excluded_columns = [col for col in request.excluded_columns if col in df.columns]
+            if existing_excluded_columns:
+                df = df.drop(columns=existing_excluded_columns)
+        
+        df_result = df
+    
+    # Remover linhas excluídas
+    if request.excluded_rows:
+        df_result = df_result.drop(index=request.excluded_rows, errors='ignore')
+    
+    # Converter formatos brasileiros (vírgula → ponto, dd/mm/yyyy → yyyy-mm-dd) antes de enviar para Supabase
+    df_result = _convert_brazilian_numeric_format(df_result)
+    
+    total_records = len(df_result)
+    logger.info(f"ETL simples concluído: {total_records} registros processados")
+    if job:
+        job.report(stage="convert", rows_converted=total_records)
+        job.check_cancelled()
+    
+    # Resultado fica no servidor: o upload referencia o result_id em vez de reenviar as linhas
+    try:
+        result_id = get_result_cache().put(df_result, file_id=request.file_id)
+    except MemoryError as e:
+        logger.warning(f"⚠️ Resultado não mantido em cache: {e}")
+        result_id = None
+    
+    envelope = {
+        "status": "success",
+        "message": f"Processamento concluído: {total_records} registros",
+        "result_id": result_id,
+        "data_complete": request.include_data,
+        "dimension_validation": dimension_validation,
+        "summary": {
+            "total_records": total_records,
+            "transformations_applied": len(request.transformations),
+            "columns_removed": len(request.excluded_columns),
+            "rows_removed": len(request.excluded_rows),
+            "mappings_applied": len(request.mappings) if request.mappings else 0
         }
-        
+    }
+    return envelope, df_result
+
+def _run_process_quick(request: ETLProcessRequest, job: Job = None) -> bytes:
+    """Quick ETL (na própria requisição ou como job); retorna o JSON da resposta"""
+    envelope, df_result = _process_quick(request, job)
+    
+    if envelope["result_id"] is None:
+        # Resultado fora do cache: não há como buscar o restante depois, então vão todas as linhas
+        envelope["data_complete"] = True
+        if request.response_mode == "page":
+            envelope["next_cursor"] = None
+    elif request.response_mode == "page":
+        # Primeira página; as seguintes vêm de /etl/results/{result_id}/rows?cursor=...
+        df_result, next_cursor = page_rows(df_result, envelope["result_id"], None,
+                                           get_settings().result_page_rows)
+        envelope["data_complete"] = next_cursor is None
+        envelope["next_cursor"] = next_cursor
+    elif not request.include_data:
+        df_result = df_result.head(get_settings().result_preview_rows)
+    
+    # "data" é serializado direto das colunas (sem lista de dicionários intermediária)
+    return encode_envelope(envelope, "data", df_result, columnar=request.data_format == "columnar")
+
+def _ndjson_response(df: pd.DataFrame, first_line: Dict[str, Any] = None, start: int = 0,
+                     headers: Dict[str, str] = None) -> StreamingResponse:
+    """
+    Resposta NDJSON em blocos de result_stream_chunk_rows linhas (memória limitada a um bloco)
+    
+    `first_line` (opcional) vai antes das linhas, com os metadados do resultado.
+    """
+    def chunks():
+        if first_line is not None:
+            yield dumps(first_line) + b"\n"
+        yield from iter_frame_ndjson(df, get_settings().result_stream_chunk_rows, start)
+    
+    return StreamingResponse(chunks(), media_type="application/x-ndjson", headers=headers)
+    
+
+@app.post("/etl/process-quick")
+async def process_etl_simple(request: ETLProcessRequest):
+    """
+    Processa arquivo com transformações simples para Quick ETL
+    
+    Com background=true retorna 202 com o job_id; a resposta fica em /jobs/{job_id}/result.
+    response_mode=page devolve só a primeira página e o next_cursor; ndjson
+    transmite o envelope na primeira linha e depois um registro por linha.
+    """
+    if not (Path("../../data/temp") / request.file_id).exists():
+        raise HTTPException(status_code=404, detail=f"Arquivo {request.file_id} não encontrado")
+    
+    if request.response_mode not in ("json", "page", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"response_mode inválido: {request.response_mode}")
+    if request.data_format not in DATA_FORMATS:
+        raise HTTPException(status_code=400, detail=f"data_format inválido: {request.data_format}")
+    
+    if request.background:
+        if request.response_mode == "ndjson":
+            raise HTTPException(status_code=400, detail="ndjson não disponível como job: "
+                                "use response_mode=page e /etl/results/{result_id}/stream")
+        return _submit_job("process_quick", lambda job: _run_process_quick(request, job),
+                           {"file_id": request.file_id})
+    
+    try:
+        if request.response_mode == "ndjson":
+            # 1ª linha: envelope (result_id, resumo); depois um registro por linha
+            envelope, df_result = await run_io(_process_quick, request)
+            return _ndjson_response(df_result, first_line=envelope)
+        return Response(content=await run_io(_run_process_quick, request), media_type="application/json")
     except Exception as e:
         logger.error(f"Erro no ETL simples: {e}")
         raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
@@ -911,34 +1501,75 @@ async def upload_to_supabase(request: SupabaseUploadRequest):
     Faz upload de dados processados diretamente para uma tabela do Supabase
     """
     try:
-        etl = get_etl_instance()
+        etl = await run_io(get_etl_instance)
         
         if not etl.supabase:
             raise HTTPException(status_code=503, detail="Supabase não configurado")
         
-        if not request.data:
+        if request.result_id:
+            try:
+                data = select_rows(get_result_cache().get(request.result_id), request.excluded_rows)
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"Resultado {request.result_id} expirado; processe o arquivo novamente")
+        elif request.data:
+            data = request.data
+        else:
             raise HTTPException(status_code=400, detail="Nenhum dado fornecido para upload")
         
-        logger.info(f"Iniciando upload para Supabase - Tabela: {request.table_name}, Registros: {len(request.data)}")
+        logger.info(f"Iniciando upload para Supabase - Tabela: {request.table_name}, Registros: {len(data)}")
+        
+        # Inserir dados na tabela em batches dimensionados pelo payload
+        load_mode = resolve_load_mode(request.load_mode)
+        natural_key = natural_key_for(request.table_name) if load_mode == LOAD_MODE_UPSERT else None
+        if load_mode == LOAD_MODE_UPSERT and not natural_key:
+            raise HTTPException(status_code=400, detail=f"Tabela {request.table_name} sem chave natural para upsert")
         
-        # Inserir dados na tabela
-        result = etl.supabase.table(request.table_name).insert(request.data).execute()
+        source = data
+        duplicates_removed = 0
+        if natural_key:
+            data, duplicates_removed = deduplicate_rows(data, natural_key)
         
-        if hasattr(result, 'data') and result.data:
-            records_inserted = len(result.data)
+        # Rejeitadas são reportadas pela posição do registro no resultado / em request.data (a partir de 1)
+        if isinstance(data, pd.DataFrame):
+            row_numbers = (data.index + 1).tolist()
         else:
-            records_inserted = len(request.data)  # Fallback
+            positions = {id(record): position for position, record in enumerate(source, start=1)}
+            row_numbers = [positions[id(record)] for record in data]
+        
+        def send_batches():
+            backend = create_load_backend(request.table_name, etl.supabase, backend="rest",
+                                          load_mode=load_mode, conflict_columns=natural_key)
+            try:
+                return BatchLoader(backend).load(request.table_name, data, row_numbers=row_numbers)
+            finally:
+                backend.close()
+        
+        load_report = await run_io(send_batches)
+        records_inserted = load_report["rows_loaded"]
         
-        logger.info(f"Upload concluído: {records_inserted} registros inseridos em {request.table_name}")
+        if load_report["errors"] and records_inserted == 0:
+            raise Exception(load_report["errors"][0])
+        
+        logger.info(f"Upload concluído: {records_inserted} registros inseridos em {request.table_name} "
+                    f"({load_report['batches_processed']} batches)")
         
         return {
-            "status": "success",
-            "message": f"Upload concluído com sucesso",
+            "status": "success" if not load_report["errors"] else "partial",
+            "message": f"Upload concluído com sucesso" if not load_report["errors"] else "Upload concluído parcialmente",
             "table_name": request.table_name,
             "records_inserted": records_inserted,
-            "file_id": request.file_id
+            "records_failed": load_report["rows_failed"],
+            "batches_processed": load_report["batches_processed"],
+            "load_errors": load_report["errors"][:10],
+            "rejected_rows": load_report["rejects"],
+            "load_mode": load_mode,
+            "duplicates_removed": duplicates_removed,
+            "file_id": request.file_id,
+            "result_id": request.result_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no upload para Supabase: {e}", exc_info=True)
         
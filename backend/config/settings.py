@@ -17,6 +17,12 @@ class Settings(BaseSettings):
     supabase_url: str = os.getenv("SUPABASE_URL", "")
     supabase_anon_key: str = os.getenv("SUPABASE_ANON_KEY", "")
     supabase_service_role_key: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    # Pool HTTP compartilhado (None = loader_workers × jobs_max_workers + 2 conexões)
+    supabase_pool_size: Optional[int] = None
+    supabase_keepalive_seconds: float = 60.0
+
+    # Conexão direta ao Postgres (backend de carregamento COPY)
+    database_url: str = os.getenv("DATABASE_URL", "")
     
     # Configurações da API
     api_host: str = "0.0.0.0"
@@ -35,7 +41,97 @@ class Settings(BaseSettings):
     # Configurações do ETL
     batch_size: int = 1000
     max_retries: int = 3
-    
+
+    # Carregamento paralelo (BatchLoader): batches em voo e backoff dos retries
+    loader_workers: int = 4
+    loader_backoff_base_seconds: float = 0.5
+    loader_backoff_max_seconds: float = 30.0
+    loader_request_timeout_seconds: float = 60.0
+    # Batches com erro de dados são divididos até isolar as linhas rejeitadas;
+    # acima deste total de rejeitadas por carga o batch falha inteiro
+    loader_max_rejects: int = 1000
+
+    # Tamanho adaptativo dos batches (AIMD sobre bytes de payload JSON)
+    loader_target_batch_bytes: int = 1024 * 1024
+    loader_min_batch_bytes: int = 64 * 1024
+    loader_max_batch_bytes: int = 4 * 1024 * 1024
+    loader_batch_increase_bytes: int = 256 * 1024
+    loader_target_latency_seconds: float = 2.0
+    loader_max_batch_rows: int = 10000
+
+    # Backend de carregamento: "rest" (PostgREST) ou "copy" (COPY FROM STDIN),
+    # com exceções por tabela, ex.: {"etl_staging_01_historico_consumo": "copy"}
+    loader_backend: str = "rest"
+    loader_table_backends: dict = {}
+
+    # Modo de carregamento: "insert" ou "upsert" (idempotente pela chave natural);
+    # natural_keys acrescenta/sobrescreve chaves por tabela, ex.: {"tabela": ["data", "curral"]}
+    loader_load_mode: str = "insert"
+    natural_keys: dict = {}
+
+    # Carga incremental por marca d'água (tabela + origem); watermark_columns
+    # sobrescreve as colunas de data/hora por tabela, ex.: {"tabela": ["data", "hora"]}
+    loader_incremental: bool = False
+    watermark_columns: dict = {}
+
+    # Linhas rejeitadas por execução (vazio = data/rejects)
+    reject_store_dir: str = ""
+
+    # Diário de checkpoints das cargas da Etapa 3 (vazio = data/checkpoints)
+    loader_checkpoint: bool = True
+    checkpoint_dir: str = ""
+
+    # Resultados do Quick ETL mantidos no servidor (result_id) para o upload
+    result_cache_max_bytes: int = 512 * 1024 * 1024
+    result_cache_ttl_seconds: int = 3600
+    result_preview_rows: int = 100
+    # Paginação por cursor (/etl/results/{id}/rows) e streaming NDJSON em blocos
+    result_page_rows: int = 1000
+    result_page_max_rows: int = 10_000
+    result_stream_chunk_rows: int = 5000
+
+    # Compressão das respostas (gzip; br com o pacote brotli) a partir de N bytes
+    response_compression_enabled: bool = True
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 4
+
+    # Jobs em segundo plano (carga, filtragem, Quick ETL): executando ao mesmo
+    # tempo, limite de ativos (fila + execução) e retenção dos terminados
+    jobs_max_workers: int = 2
+    jobs_max_active: int = 8
+    jobs_retention_seconds: int = 3600
+
+    # Executores fora do event loop: threads para I/O bloqueante (Supabase, disco)
+    # e processos para CPU (parse de CSV); None = núcleos - 1, 0 = sem processos
+    io_executor_workers: int = 16
+    cpu_executor_workers: Optional[int] = None
+    # Etapas de CPU da carga (ler, limpar, mapear, converter) nos processos do pool,
+    # que sobem aquecidos na partida da API
+    etl_stages_in_processes: bool = True
+    cpu_executor_prewarm: bool = True
+    # DataFrames dos processos voltam por Arrow IPC em memória compartilhada (requer pyarrow);
+    # abaixo de frame_handoff_min_rows o pickle sai mais barato. Diretório vazio = /dev/shm
+    frame_handoff_enabled: bool = True
+    frame_handoff_min_rows: int = 50_000
+    frame_handoff_dir: str = ""
+
+    # Sonda de saúde do Supabase em segundo plano (/health responde com o último estado)
+    health_probe_interval_seconds: float = 15.0
+    health_probe_window: int = 120
+
+    # Cache de schemas de tabelas (get_supabase_table_schema)
+    schema_cache_ttl_seconds: int = 300
+
+    # Snapshot do registro de schemas (vazio = data/cache/schema_snapshot.json)
+    schema_snapshot_path: str = ""
+    schema_snapshot_refresh_seconds: int = 3600
+
+    # Cache de dimensões e sugestões "você quis dizer"
+    dimension_cache_ttl_seconds: int = 600
+    dimension_suggestions_top_k: int = 3
+    dimension_suggestions_min_similarity: float = 0.3
+
     class Config:
         env_file = "../../.env"
         case_sensitive = False
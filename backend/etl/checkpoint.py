@@ -0,0 +1,242 @@
+"""
+Diário de checkpoints da carga (JSONL por execução) para retomar cargas interrompidas
+
+Cada batch grava "begin" (faixas de posições + hash do conteúdo) antes do envio
+e "commit" (linhas gravadas e posições rejeitadas) ao terminar. Na retomada, as
+posições já gravadas não são reenviadas.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from etl.lazy_imports import lazy_module
+from etl.serializer import dumps
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = Path(__file__).resolve().parents[2] / "data" / "checkpoints"
+
+_RUN_ID = re.compile(r'^[\w\-]+$')
+
+
+def resolve_checkpoint_dir(configured_dir: str = None) -> Path:
+    """Diretório dos diários: o configurado ou data/checkpoints do projeto"""
+    return Path(configured_dir) if configured_dir else DEFAULT_CHECKPOINT_DIR
+
+
+def batch_hash(batch) -> str:
+    """Hash do conteúdo do batch (valores + índice de origem)"""
+    if isinstance(batch, pd.DataFrame):
+        digest = pd.util.hash_pandas_object(batch, index=True).values.tobytes()
+    else:
+        digest = dumps(list(batch))
+    return hashlib.sha1(digest).hexdigest()
+
+
+def position_spans(positions: Sequence[int]) -> List[List[int]]:
+    """Compacta posições ordenadas em faixas [início, fim)"""
+    positions = np.asarray(positions, dtype=np.int64)
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(positions)]))
+    return [[int(positions[s]), int(positions[e - 1]) + 1] for s, e in zip(starts, ends)]
+
+
+def span_positions(spans: List[List[int]]) -> np.ndarray:
+    """Expande faixas [início, fim) em posições"""
+    if not spans:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in spans])
+
+
+class LoadJournal:
+    """
+    Diário de uma execução da Etapa 3 (append-only, um evento JSON por linha)
+
+    Eventos: start (parâmetros da carga), resume, begin, commit e finish.
+    Cada sessão (carga inicial ou retomada) numera seus batches como
+    "<sessão>:<batch>". Batches com begin e sem commit ficam "em dúvida":
+    podem ter sido gravados antes da queda e são reenviados na retomada
+    (em modo upsert isso é idempotente).
+    """
+
+    def __init__(self, run_id: str, base_dir: Path = None):
+        if not run_id or not _RUN_ID.match(run_id):
+            raise KeyError(f"Execução inválida: {run_id}")
+        self.run_id = run_id
+        self.path = Path(base_dir or DEFAULT_CHECKPOINT_DIR) / f"{run_id}.jsonl"
+        self._lock = threading.Lock()
+        self.session = 0
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def append(self, event: str, **fields):
+        """Grava um evento e força para o disco (sobrevive a queda do processo)"""
+        record = {"event": event, "at": datetime.now().isoformat(), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Eventos gravados (linha final truncada por queda é ignorada)"""
+        if not self.path.exists():
+            raise KeyError(f"Checkpoint não encontrado: {self.run_id}")
+        events = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"⚠️ Linha inválida no checkpoint {self.run_id} ignorada")
+        return events
+
+    def start(self, params: Dict[str, Any], total_rows: int = None):
+        """Abre a execução com os parâmetros necessários para retomá-la"""
+        self.session = 1
+        self.append("start", run_id=self.run_id, session=self.session, params=params, total_rows=total_rows)
+
+    def resume(self, total_rows: int, skipped_rows: int, in_doubt: int):
+        """Abre uma nova sessão de envio na mesma execução"""
+        self.session = sum(1 for event in self.events() if event["event"] in ("start", "resume")) + 1
+        self.append("resume", session=self.session, total_rows=total_rows,
+                    skipped_rows=skipped_rows, in_doubt_batches=in_doubt)
+
+    def finish(self, **summary):
+        self.append("finish", session=self.session, **summary)
+
+    def state(self) -> Dict[str, Any]:
+        """Parâmetros, batches (begin + commit) e situação da execução"""
+        params, total_rows, finished = None, None, None
+        batches: Dict[str, Dict[str, Any]] = {}
+        for event in self.events():
+            kind = event["event"]
+            if kind == "start":
+                params, total_rows = event.get("params"), event.get("total_rows")
+            elif kind == "resume":
+                total_rows = event.get("total_rows", total_rows)
+            elif kind == "begin":
+                batches[event["batch"]] = {**event, "status": "in_doubt"}
+            elif kind == "commit" and event["batch"] in batches:
+                batches[event["batch"]].update({
+                    "status": event["status"], "loaded": event["loaded"],
+                    "rejected": event.get("rejected", []), "unsent": event.get("unsent", []),
+                    "error": event.get("error")
+                })
+            elif kind == "finish":
+                finished = event
+        return {"run_id": self.run_id, "params": params, "total_rows": total_rows,
+                "batches": batches, "finished": finished}
+
+    def loaded_positions(self, state: Dict[str, Any] = None) -> np.ndarray:
+        """Posições (no DataFrame final da carga) já gravadas no banco"""
+        state = state or self.state()
+        loaded = [np.setdiff1d(span_positions(batch["spans"]), batch["rejected"] + batch.get("unsent", []))
+                  for batch in state["batches"].values() if batch["status"] in ("committed", "partial")]
+        return np.unique(np.concatenate(loaded)) if loaded else np.empty(0, dtype=np.int64)
+
+    def verify(self, df: pd.DataFrame, state: Dict[str, Any] = None) -> List[str]:
+        """Batches gravados cujo conteúdo não bate mais com o DataFrame (arquivo ou mapeamento mudou)"""
+        state = state or self.state()
+        mismatches = []
+        for batch_id, batch in state["batches"].items():
+            if batch["status"] not in ("committed", "partial"):
+                continue
+            positions = span_positions(batch["spans"])
+            if len(positions) and positions[-1] >= len(df):
+                mismatches.append(batch_id)
+            elif batch_hash(df.iloc[positions]) != batch["hash"]:
+                mismatches.append(batch_id)
+        return mismatches
+
+    def tracker(self, positions: Sequence[int]) -> "CheckpointTracker":
+        """Adaptador para o BatchLoader; `positions` mapeia a posição enviada para a original"""
+        return CheckpointTracker(self, positions)
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumo da execução para listagem"""
+        state = self.state()
+        batches = state["batches"].values()
+        params = state["params"] or {}
+        return {
+            "run_id": self.run_id,
+            "target_table": params.get("target_table"),
+            "file_path": params.get("file_path"),
+            "total_rows": state["total_rows"],
+            "rows_loaded": int(len(self.loaded_positions(state))),
+            "batches_committed": sum(1 for batch in batches if batch["status"] in ("committed", "partial")),
+            "batches_in_doubt": sum(1 for batch in batches if batch["status"] == "in_doubt"),
+            "finished": state["finished"] is not None,
+            "status": state["finished"]["status"] if state["finished"] else "interrupted"
+        }
+
+
+class CheckpointTracker:
+    """Grava begin/commit de cada batch enviado pelo BatchLoader"""
+
+    def __init__(self, journal: LoadJournal, positions: Sequence[int]):
+        self.journal = journal
+        self.positions = np.asarray(positions, dtype=np.int64)
+
+    def _batch_id(self, batch_number: int) -> str:
+        return f"{self.journal.session}:{batch_number}"
+
+    def batch_started(self, batch_number: int, start: int, end: int, batch):
+        self.journal.append("begin", batch=self._batch_id(batch_number),
+                            spans=position_spans(self.positions[start:end]), hash=batch_hash(batch))
+
+    def batch_finished(self, result: Dict[str, Any]):
+        rejected = [int(self.positions[reject["row"]]) for reject in result["rejects"]]
+        # Partes do batch que falharam por erro passageiro: não gravadas, reenviadas na retomada
+        unsent = [int(self.positions[row]) for row in result.get("unsent", [])]
+        if result["loaded"] == 0:
+            status = "failed"
+        elif rejected or unsent:
+            status = "partial"
+        else:
+            status = "committed"
+        self.journal.append("commit", batch=self._batch_id(result["batch"]), status=status,
+                            loaded=result["loaded"], rejected=rejected, unsent=unsent, error=result["error"])
+
+
+def _configured_dir() -> Path:
+    from config.settings import get_settings
+    return resolve_checkpoint_dir(get_settings().checkpoint_dir)
+
+
+def open_journal(run_id: str) -> LoadJournal:
+    """Diário da execução no diretório configurado"""
+    return LoadJournal(run_id, _configured_dir())
+
+
+def list_journals(base_dir: Path = None) -> List[Dict[str, Any]]:
+    """Resumo de todas as execuções com checkpoint, mais recentes primeiro"""
+    base_dir = Path(base_dir or _configured_dir())
+    if not base_dir.exists():
+        return []
+    summaries = []
+    for path in sorted(base_dir.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True):
+        try:
+            summaries.append(LoadJournal(path.stem, base_dir).summary())
+        except (KeyError, OSError, ValueError):
+            continue
+    return summaries
+
@@ -4,65 +4,92 @@ ETL Inteligente para ConectaBoi
 Sistema que detecta automaticamente estruturas de dados e configura ETL
 """
 
-import pandas as pd
+from __future__ import annotations
+
+import io
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 import os
+import sys
+import threading
+import time
 from pathlib import Path
 
-# Configuração de logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Garante que o diretório backend esteja no path (config.*, etl.*)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.dimension_index import TrigramIndex, build_suggested_transformations
+from etl.checkpoint import open_journal
+from etl.file_type_index import file_type_for_table, get_file_type_index
+from etl.lazy_imports import lazy_module
+from etl.loader import (
+    LOAD_MODE_UPSERT, BatchLoader, create_load_backend, deduplicate_rows, natural_key_for, resolve_load_mode
+)
+from etl.mapping_store import get_mapping_store, normalize_column_name
+from etl.reject_store import (
+    STAGE_CONVERSION, STAGE_DIMENSION, STAGE_LOAD, get_reject_store, new_run_id, reject_frame
+)
+from etl.schema_cache import get_schema_cache
+from etl.supabase_client import get_supabase_client
+from etl.watermark_store import (
+    event_timestamps, filter_new_rows, get_watermark_store, source_from_file_name, watermark_columns_for
+)
+from etl.schema_registry import (
+    SchemaRegistry, bootstrap_schema_registry, get_schema_registry, resolve_snapshot_path
+)
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
 logger = logging.getLogger(__name__)
 
+# _apply_watermark sem marca d'água informada: lê do watermark store
+_READ_STORE = object()
+# ConectaBoiETL.supabase ainda não resolvido (o cliente é criado no primeiro uso)
+_NOT_CONNECTED = object()
+
 class ConectaBoiETL:
     """Classe principal para processamento ETL inteligente"""
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, connect: bool = True):
         self.config = self.load_config(config_path) if config_path else {}
-        self.supabase = None
-        self.setup_supabase()
-    
-    def setup_supabase(self):
-        """Configura conexão REAL com Supabase"""
+        self._connect = connect
+        self._supabase = _NOT_CONNECTED
+        self._dimension_indexes: Dict[tuple, Dict[str, Any]] = {}
+        # Executa run_transform_stages fora do processo (ex.: api.executors.call_cpu); None = inline
+        self.stage_executor: Optional[Callable] = None
+        # connect=False: só leitura/limpeza de arquivos (processos do pool de CPU).
+        # Com connect=True o cliente Supabase só é criado no primeiro uso de self.supabase
+        if connect:
+            self._warm_start_schemas()
+
+    @property
+    def supabase(self):
+        """Cliente Supabase compartilhado, criado no primeiro acesso (None sem conexão)"""
+        if self._supabase is _NOT_CONNECTED:
+            self._supabase = get_supabase_client() if self._connect else None
+        return self._supabase
+
+    @supabase.setter
+    def supabase(self, client):
+        self._supabase = client
+
+    def _warm_start_schemas(self):
+        """Carrega schemas do snapshot em disco e agenda a atualização em segundo plano"""
         try:
-            from supabase import create_client, Client
-            import sys
-            import os
-            sys.path.append(os.path.dirname(os.path.dirname(__file__)))
             from config.settings import get_settings
-            
             settings = get_settings()
-            
-            if settings.supabase_url and settings.supabase_service_role_key:
-                self.supabase: Client = create_client(
-                    settings.supabase_url, 
-                    settings.supabase_service_role_key
-                )
-                logger.info("✅ Conexão REAL com Supabase estabelecida")
-                logger.info(f"🔗 URL: {settings.supabase_url}")
-                
-                # Testa a conexão
-                try:
-                    # Tenta uma query simples para validar conexão
-                    result = self.supabase.table('information_schema.tables').select('table_name').limit(1).execute()
-                    logger.info("✅ Teste de conexão com Supabase bem-sucedido")
-                except Exception as test_error:
-                    logger.warning(f"⚠️ Conexão estabelecida mas teste falhou: {test_error}")
-                        
-            else:
-                logger.warning("❌ Credenciais Supabase não configuradas - usando modo simulado")
-                logger.info("💡 Configure SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY no arquivo .env")
-                self.supabase = None
-                
-        except ImportError as import_error:
-            logger.error(f"❌ Erro de importação: {import_error}")
-            logger.info("💡 Execute: pip install supabase")
-            self.supabase = None
+            has_credentials = bool(settings.supabase_url and settings.supabase_service_role_key)
+            bootstrap_schema_registry(background_refresh=has_credentials)
         except Exception as e:
-            logger.error(f"❌ Erro ao conectar com Supabase: {e}")
-            self.supabase = None
+            logger.warning(f"⚠️ Partida a quente do registro de schemas falhou: {e}")
+    
+    def setup_supabase(self):
+        """Conecta agora ao cliente Supabase compartilhado (em vez de esperar o primeiro uso)"""
+        self._supabase = get_supabase_client() if self._connect else None
+        return self._supabase
     
     def load_config(self, config_path: str) -> Dict:
         """Carrega configuração de arquivo JSON"""
@@ -87,16 +114,23 @@ class ConectaBoiETL:
         logger.info(f"Analisando estrutura do arquivo: {file_path}")
         
         try:
-            # Leitura inicial para análise
+            # Leitura inicial para análise: só as primeiras linhas são guardadas,
+            # o restante do arquivo é apenas contado
+            lines = []
+            line_count = 0
             with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+                for line in f:
+                    if len(lines) < 7:
+                        lines.append(line)
+                    line_count += 1
             
-            if len(lines) < 2:
+            if line_count < 2:
                 raise ValueError("Arquivo deve ter pelo menos 2 linhas")
             
             # Aplicar skip_first_line se necessário
             if skip_first_line:
                 lines = lines[1:]  # Remove primeira linha
+                line_count -= 1
                 logger.info("Primeira linha removida, usando segunda linha como cabeçalho")
             
             # Parse das linhas
@@ -106,22 +140,24 @@ class ConectaBoiETL:
             # Detectar tipos de dados
             column_types = self._detect_column_types(headers, sample_data)
             
-            # Detectar padrões conhecidos
-            file_type = self._detect_file_type(file_path, headers)
+            # Detectar padrões conhecidos (índice de assinaturas de cabeçalho)
+            file_type, method, confidence = get_file_type_index().detect(headers, Path(file_path).name)
             
             structure = {
                 'file_path': file_path,
                 'headers': headers,
                 'column_count': len(headers),
-                'estimated_rows': len(lines) - 1,
+                'estimated_rows': line_count - 1,
                 'column_types': column_types,
                 'detected_file_type': file_type,
+                'detection_method': method,
+                'detection_confidence': round(confidence, 4),
                 'skip_first_line': skip_first_line,
                 'sample_data': sample_data[:3],  # Primeiras 3 linhas como exemplo
                 'suggested_table': f"etl_staging_{file_type}" if file_type else None
             }
             
-            logger.info(f"Estrutura detectada: {len(headers)} colunas, ~{len(lines)} linhas")
+            logger.info(f"Estrutura detectada: {len(headers)} colunas, ~{line_count} linhas")
             return structure
             
         except Exception as e:
@@ -192,40 +228,11 @@ class ConectaBoiETL:
     
     def _detect_file_type(self, file_path: str, headers: List[str]) -> Optional[str]:
         """Detecta tipo de arquivo baseado no nome e cabeçalhos"""
-        file_name = Path(file_path).stem.lower()
-        headers_lower = [h.lower() for h in headers]
-        
-        # Padrões conhecidos do ConectaBoi
-        patterns = {
-            '01_historico_consumo': ['curral', 'data', 'cms', 'consumo', 'animais'],
-            '02_desvio_carregamento': ['carregamento', 'desvio', 'pazeiro', 'ingrediente'],
-            '03_desvio_distribuicao': ['distribuicao', 'tratador', 'trato', 'curral'],
-            '04_itens_trato': ['trato', 'ingrediente', 'carregamento'],
-            '05_trato_curral': ['trato', 'curral', 'abastecido', 'vagao']
-        }
-        
-        # Primeiro, tenta pelo nome do arquivo
-        for pattern_name in patterns.keys():
-            if pattern_name in file_name:
-                return pattern_name
-        
-        # Depois, tenta pelos cabeçalhos
-        best_match = None
-        best_score = 0
-        
-        for pattern_name, keywords in patterns.items():
-            score = sum(1 for keyword in keywords 
-                       if any(keyword in header for header in headers_lower))
-            
-            if score > best_score:
-                best_score = score
-                best_match = pattern_name
-        
-        return best_match if best_score > 1 else None
+        file_type, _, _ = get_file_type_index().detect(headers, Path(file_path).name)
+        return file_type
     
     def generate_auto_mapping(self, structure: Dict) -> List[Dict]:
         """Gera mapeamento automático baseado na estrutura detectada"""
-        mappings = []
         detected_type = structure.get('detected_file_type')
         headers = structure.get('headers', [])
         
@@ -233,56 +240,8 @@ class ConectaBoiETL:
             logger.warning("Tipo de arquivo não detectado, usando mapeamento genérico")
             return self._generate_generic_mapping(headers)
         
-        # Mapeamentos específicos por tipo
-        type_mappings = {
-            '01_historico_consumo': {
-                'data': 'data',
-                'curral': 'id_curral',
-                'animais': 'qtd_animais',
-                'cms_realizado': 'cms_realizado_kg',
-                'cms_previsto': 'cms_previsto_kg',
-                'lote': 'lote',
-                'sexo': 'sexo',
-                'peso_entrada': 'peso_entrada_kg'
-            },
-            '02_desvio_carregamento': {
-                'data': 'data',
-                'carregamento': 'carregamento',
-                'pazeiro': 'pazeiro',
-                'ingrediente': 'ingrediente',
-                'desvio_kg': 'desvio_kg',
-                'previsto': 'previsto_kg',
-                'realizado': 'realizado_kg'
-            }
-            # Adicionar outros tipos conforme necessário
-        }
-        
-        mapping_rules = type_mappings.get(detected_type, {})
-        
-        for header in headers:
-            header_lower = header.lower()
-            
-            # Busca mapeamento direto
-            sql_column = None
-            mapping_type = 'direct'
-            
-            for pattern, target in mapping_rules.items():
-                if pattern in header_lower:
-                    sql_column = target
-                    break
-            
-            if not sql_column:
-                # Mapeamento genérico
-                sql_column = header_lower.replace(' ', '_').replace('-', '_')
-                
-            mappings.append({
-                'csvColumn': header,
-                'sqlColumn': sql_column,
-                'type': mapping_type,
-                'confidence': 0.8 if sql_column in mapping_rules.values() else 0.5
-            })
-        
-        return mappings
+        # Plano compilado e memorizado por (tipo, cabeçalhos)
+        return get_file_type_index().compile_mapping(detected_type, headers)
     
     def _generate_generic_mapping(self, headers: List[str]) -> List[Dict]:
         """Gera mapeamento genérico quando tipo não é detectado"""
@@ -299,6 +258,23 @@ class ConectaBoiETL:
         
         return mappings
     
+    def validate_file_structure(self, file_path: str, skip_first_line: bool = False) -> Dict:
+        """
+        Validação a seco: estrutura e mapeamento sugerido, sem carregar o arquivo
+        com pandas nem conectar ao Supabase (rápida, para a CLI e scripts)
+        """
+        try:
+            structure = self.detect_csv_structure(file_path, skip_first_line)
+            return {
+                'structure': structure,
+                'mapping': self.generate_auto_mapping(structure),
+                'success': True,
+                'validated_at': datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Erro na validação: {e}")
+            return {'success': False, 'error': str(e)}
+    
     def process_file(self, file_path: str, skip_first_line: bool = False, 
                     custom_config: Dict = None) -> Dict:
         """
@@ -365,7 +341,73 @@ class ConectaBoiETL:
         
         return result_df
 
-    def get_supabase_table_schema(self, table_name: str) -> Dict[str, Any]:
+    def get_supabase_table_schema(self, table_name: str, force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Retorna o schema de uma tabela usando o cache de schemas do processo
+        Só consulta o Supabase quando não há entrada válida (TTL) ou em force_refresh
+        
+        Args:
+            table_name: Nome da tabela para consultar o schema
+            force_refresh: Se True, descarta o cache e consulta novamente
+            
+        Returns:
+            Dicionário com informações do schema da tabela
+        """
+        cache = get_schema_cache()
+        if force_refresh:
+            cache.invalidate(table_name)
+        return cache.get(table_name, lambda: self._load_table_schema(table_name))
+
+    def _load_table_schema(self, table_name: str) -> Dict[str, Any]:
+        """
+        Usa o registro de schemas (OpenAPI do PostgREST) quando a tabela está registrada;
+        caso contrário consulta a tabela diretamente
+        """
+        registry = self._ensure_schema_registry()
+        columns_info = registry.get_columns(table_name)
+
+        if columns_info:
+            logger.info(f"📖 Schema de {table_name} obtido do registro ({registry.source}): {len(columns_info)} colunas")
+            return self._build_schema_info(table_name, columns_info, source=registry.source)
+
+        return self._fetch_supabase_table_schema(table_name)
+
+    def _ensure_schema_registry(self) -> SchemaRegistry:
+        """Garante que o registro de schemas foi carregado (uma requisição OpenAPI por processo)"""
+        registry = get_schema_registry()
+        if not registry.is_loaded:
+            settings = self._get_settings()
+            registry.ensure_loaded(
+                settings.supabase_url,
+                settings.supabase_service_role_key,
+                snapshot_path=resolve_snapshot_path(settings.schema_snapshot_path)
+            )
+        return registry
+
+    @property
+    def table_schemas(self) -> Dict[str, Dict[str, Any]]:
+        """Schemas de todas as tabelas etl_staging_* e dim_* conhecidas pelo registro"""
+        registry = self._ensure_schema_registry()
+        return {
+            table_name: self._build_schema_info(table_name, columns, source=registry.source)
+            for table_name, columns in registry.snapshot().items()
+        }
+
+    def _build_schema_info(self, table_name: str, columns_info: List[Dict[str, Any]],
+                           source: str) -> Dict[str, Any]:
+        """Monta o dicionário de schema retornado para a API e para o mapeamento"""
+        return {
+            "table_name": table_name,
+            "columns": columns_info,
+            "create_table_sql": self._build_create_table_statement(table_name, columns_info),
+            "column_count": len(columns_info),
+            "exists": True,
+            "source": source,
+            "column_mapping": self._suggest_column_mapping(columns_info),
+            "processed_at": datetime.now().isoformat()
+        }
+
+    def _fetch_supabase_table_schema(self, table_name: str) -> Dict[str, Any]:
         """
         Conecta REALMENTE no Supabase e consulta o schema de uma tabela específica
         SEMPRE busca schema real - nunca usa predefinido
@@ -484,20 +526,8 @@ class ConectaBoiETL:
             if not columns_info:
                 raise Exception(f"Nenhuma coluna encontrada para tabela {table_name}")
             
-            # Constrói o CREATE TABLE statement
-            create_table_sql = self._build_create_table_statement(table_name, columns_info)
-            
             # Organiza informações do schema
-            schema_info = {
-                "table_name": table_name,
-                "columns": columns_info,
-                "create_table_sql": create_table_sql,
-                "column_count": len(columns_info),
-                "exists": True,
-                "source": "supabase_real",
-                "column_mapping": self._suggest_column_mapping(columns_info),
-                "processed_at": datetime.now().isoformat()
-            }
+            schema_info = self._build_schema_info(table_name, columns_info, source="supabase_real")
             
             logger.info(f"✅ Schema da tabela {table_name} obtido: {len(columns_info)} colunas")
             return schema_info
@@ -734,11 +764,19 @@ class ConectaBoiETL:
                 table_schema = self.get_supabase_table_schema(selected_table)
                 logger.info(f"Schema da tabela {selected_table} obtido")
             
-            # 6. Gerar mapeamento automático inteligente
+            # 6. Gerar mapeamento automático inteligente (mapeamentos já confirmados primeiro)
+            learned_mappings = {}
+            if selected_table:
+                learned_mappings = get_mapping_store().lookup(df.columns.tolist(), selected_table)
+                if learned_mappings:
+                    logger.info(f"🧠 {len(learned_mappings)}/{len(df.columns)} colunas com mapeamento já confirmado")
+            
+            unseen_columns = [col for col in df.columns if col not in learned_mappings]
             auto_mapping = self._generate_intelligent_mapping(
                 csv_columns=df.columns.tolist(),
                 table_schema=table_schema,
-                sample_data=df.head(5).to_dict('records') if len(df) > 0 else []
+                sample_data=df[unseen_columns].head(5).to_dict('records') if len(df) > 0 and unseen_columns else [],
+                learned_mappings=learned_mappings
             )
             
             # 7. Preparar dados para a Etapa 2
@@ -1006,21 +1044,11 @@ class ConectaBoiETL:
         """
         Limpa e padroniza nomes de colunas garantindo unicidade
         """
-        import re
-        
         if used_names is None:
             used_names = set()
         
-        # Remove caracteres especiais e espaços extras
-        cleaned = re.sub(r'[^\w\s]', '', str(column_name))
-        cleaned = re.sub(r'\s+', '_', cleaned.strip())
-        cleaned = cleaned.lower()
-        
-        # Remove underscores múltiplos
-        cleaned = re.sub(r'_+', '_', cleaned)
-        
-        # Remove underscore no início ou fim
-        cleaned = cleaned.strip('_')
+        # Remove caracteres especiais, espaços extras e underscores múltiplos (com cache)
+        cleaned = normalize_column_name(str(column_name))
         
         # Se nome está vazio ou inválido, cria nome baseado no índice
         if not cleaned or cleaned in ['nan', 'none', 'null', '']:
@@ -1160,17 +1188,32 @@ class ConectaBoiETL:
         }
     
     def _generate_intelligent_mapping(self, csv_columns: list, table_schema: Dict = None, 
-                                    sample_data: list = None) -> list:
+                                    sample_data: list = None, learned_mappings: Dict = None) -> list:
         """
         Gera mapeamento inteligente entre colunas CSV e tabela do banco
+        Colunas com mapeamento já confirmado (learned_mappings) não passam pela heurística
         """
         mappings = []
+        learned_mappings = learned_mappings or {}
         
         # Se temos schema da tabela, usar para mapeamento inteligente
         if table_schema and table_schema.get('columns'):
             db_columns = [col['column_name'] for col in table_schema['columns']]
             
             for csv_col in csv_columns:
+                learned = learned_mappings.get(csv_col)
+                if learned and (not learned.get('db_column') or learned['db_column'] in db_columns):
+                    mappings.append({
+                        "csv_column": csv_col,
+                        "db_column": learned.get('db_column'),
+                        "confidence": 1.0,
+                        "data_type": learned.get('data_type', 'TEXT'),
+                        "enabled": learned.get('enabled', True),
+                        "suggested": True,
+                        "source": learned.get('source', 'learned')
+                    })
+                    continue
+                
                 best_match = self._find_best_column_match(csv_col, db_columns)
                 
                 mapping = {
@@ -1469,9 +1512,53 @@ class ConectaBoiETL:
             logger.error(f"❌ Erro ao carregar DataFrame: {e}")
             raise Exception(f"Erro ao carregar dados: {str(e)}")
     
-    def _apply_column_mapping_transformations(self, df: pd.DataFrame, column_mapping: List[Dict]) -> pd.DataFrame:
+    def _divert_conversion_failures(self, df: pd.DataFrame, failures: List[Dict],
+                                    skip_first_line: bool = False):
+        """
+        Separa as linhas com valores que não converteram para o tipo da coluna
+        
+        A rejeitada guarda o valor original na coluna que falhou, para correção.
+        
+        Returns:
+            Tupla (DataFrame sem as linhas, bloco de rejeitadas)
+        """
+        reasons: Dict[Any, List[str]] = {}
+        rows = df.loc[list(dict.fromkeys(failure["index"] for failure in failures))].astype(object)
+        for failure in failures:
+            rows.at[failure["index"], failure["column"]] = failure["value"]
+            reasons.setdefault(failure["index"], []).append(
+                f"{failure['column']}: '{failure['value']}' não é {failure['data_type'].upper()}"
+            )
+        
+        logger.warning(f"🚫 {len(rows)} linhas com valores inválidos para o tipo da coluna separadas como rejeitadas")
+        return df.drop(index=rows.index), reject_frame(
+            rows, self._source_row_numbers(rows, skip_first_line), STAGE_CONVERSION,
+            ["; ".join(reasons[index]) for index in rows.index]
+        )
+    
+    def _dimension_reject_frame(self, removed: pd.DataFrame, skip_first_line: bool = False) -> pd.DataFrame:
+        """Bloco de rejeitadas das linhas removidas pelo filtro de uma dimensão"""
+        column, dimension_table = removed['_column'].iloc[0], removed['_dimension_table'].iloc[0]
+        rows = removed.drop(columns=['_column', '_dimension_table'])
+        reasons = [f"{column}: '{value}' não existe em {dimension_table}" for value in rows[column]]
+        return reject_frame(rows, self._source_row_numbers(rows, skip_first_line), STAGE_DIMENSION, reasons)
+    
+    @staticmethod
+    def _source_row_numbers(df: pd.DataFrame, skip_first_line: bool = False) -> List[int]:
+        """
+        Linha do arquivo de cada registro (1 = cabeçalho), a partir do índice
+        preservado desde a leitura do CSV
+        """
+        first_data_line = 3 if skip_first_line else 2
+        return [int(index) + first_data_line for index in df.index]
+    
+    def _apply_column_mapping_transformations(self, df: pd.DataFrame, column_mapping: List[Dict],
+                                              conversion_failures: Optional[List[Dict]] = None) -> pd.DataFrame:
         """
         Aplica transformações baseadas no mapeamento de colunas configurado
+        
+        Se conversion_failures for informado, recebe um item por valor não vazio
+        que não pôde ser convertido para o tipo da coluna (index, column, value, data_type)
         """
         try:
             logger.info(f"🔄 Aplicando mapeamentos de colunas...")
@@ -1507,9 +1594,16 @@ class ConectaBoiETL:
                     target_column = self._clean_column_name(csv_column)
                 
                 # Copiar dados e aplicar transformações de tipo
-                df_result[target_column] = self._apply_data_type_transformation(
-                    df[csv_column], data_type
-                )
+                converted = self._apply_data_type_transformation(df[csv_column], data_type)
+                df_result[target_column] = converted
+                
+                if conversion_failures is not None and data_type.upper() not in ['TEXT', 'VARCHAR', 'STRING']:
+                    original = df[csv_column]
+                    present = original.notna() & (original.astype(str).str.strip() != '')
+                    for index, value in original[present & converted.isna()].items():
+                        conversion_failures.append({
+                            "index": index, "column": target_column, "value": value, "data_type": data_type
+                        })
                 
                 mapped_count += 1
                 logger.debug(f"✅ '{csv_column}' → '{target_column}' ({data_type})")
@@ -1545,7 +1639,8 @@ class ConectaBoiETL:
                         return int(float(clean_x))
                     except:
                         return None
-                return series.apply(safe_int_convert)
+                # Int64 (nullable) mantém inteiros sem virar float ("1.0") quando há vazios
+                return series.apply(safe_int_convert).astype('Int64')
                 
             elif target_type in ['NUMERIC', 'DECIMAL', 'FLOAT', 'DOUBLE']:
                 # Tenta converter para float, mantém vazio se falhar
@@ -1721,7 +1816,17 @@ class ConectaBoiETL:
     
     def process_step3_load_data(self, file_path: str, column_mapping: List[Dict], 
                                target_table: str, skip_first_line: bool = False, 
-                               batch_size: int = 1000, auto_remove_outliers: bool = True) -> Dict[str, Any]:
+                               batch_size: Optional[int] = None, auto_remove_outliers: bool = True,
+                               workers: Optional[int] = None,
+                               load_backend: Optional[str] = None,
+                               load_mode: Optional[str] = None,
+                               incremental: Optional[bool] = None,
+                               source: Optional[str] = None,
+                               progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                               checkpoint: Optional[bool] = None,
+                               resume_run_id: Optional[str] = None,
+                               resend_in_doubt: bool = False,
+                               cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         Carrega dados finais no banco de dados após validação do preview
         Inclui filtragem automática de outliers baseada em tabelas de dimensão
@@ -1731,88 +1836,261 @@ class ConectaBoiETL:
             column_mapping: Mapeamento de colunas validado
             target_table: Tabela de destino no Supabase
             skip_first_line: Se deve pular primeira linha
-            batch_size: Tamanho do batch para inserção
+            batch_size: Tamanho fixo do batch (None = adaptativo por bytes de payload)
             auto_remove_outliers: Se deve remover automaticamente outliers de dimensões
+            workers: Batches enviados em paralelo (None = settings.loader_workers)
+            load_backend: "rest" ou "copy" (None = settings.loader_table_backends / loader_backend)
+            load_mode: "insert" ou "upsert" pela chave natural (None = settings.loader_load_mode)
+            incremental: Descarta períodos já carregados pela marca d'água (None = settings.loader_incremental)
+            source: Origem do arquivo para a marca d'água (None = derivada do nome do arquivo)
+            progress_callback: Chamado ao fim da leitura ("parse"), da conversão ("convert")
+                e a cada batch concluído ("load", na ordem dos batches); a etapa vem em "stage"
+            checkpoint: Grava o diário de batches para retomada (None = settings.loader_checkpoint)
+            resume_run_id: Retoma esta execução, sem reenviar as linhas já gravadas
+            resend_in_doubt: Na retomada em modo insert, reenvia os batches em dúvida mesmo
+                podendo duplicar linhas (em upsert pela chave natural o reenvio é sempre seguro)
+            cancel_event: Interrompe a carga entre batches; o checkpoint fica aberto para retomada
             
         Returns:
             Resultado da operação de carregamento
         """
         try:
             logger.info(f"🚀 Iniciando carregamento final dos dados na tabela {target_table}")
+            run_params = {
+                "file_path": str(Path(file_path).resolve()), "column_mapping": column_mapping,
+                "target_table": target_table, "skip_first_line": skip_first_line, "batch_size": batch_size,
+                "auto_remove_outliers": auto_remove_outliers, "load_backend": load_backend,
+                "load_mode": load_mode, "incremental": incremental, "source": source
+            }
             
-            # 1. Carregar e transformar dados
-            df_original = self._load_and_prepare_dataframe(file_path, skip_first_line)
-            df_transformed = self._apply_column_mapping_transformations(df_original, column_mapping)
+            # 1. Ler, limpar, mapear e converter (no pool de processos quando há stage_executor);
+            #    na carga incremental os períodos já carregados saem antes da transformação
+            if incremental is None:
+                incremental = self._get_settings().loader_incremental
+            watermark_filter = None
+            if incremental:
+                watermark_source = source or source_from_file_name(file_path)
+                watermark_filter = {"target_table": target_table, "source": watermark_source,
+                                    "watermark": get_watermark_store().get(target_table, watermark_source)}
+            if self.stage_executor:
+                stages = self.stage_executor(run_transform_stages, file_path, column_mapping,
+                                             skip_first_line, watermark_filter)
+            else:
+                stages = self._run_transform_stages(file_path, column_mapping, skip_first_line, watermark_filter)
+            if progress_callback:
+                progress_callback({"stage": "parse", "rows_parsed": stages["rows_parsed"]})
+            
+            watermark_info = stages["watermark"]
+            if watermark_info and watermark_info["enabled"] and stages["rows_remaining"] == 0:
+                logger.info(f"🌊 Nenhuma linha nova para {target_table} desde {watermark_info['watermark']}")
+                return {
+                    "success": True,
+                    "load_summary": {
+                        "target_table": target_table,
+                        "total_rows_processed": 0,
+                        "rows_loaded": 0,
+                        "rows_failed": 0,
+                        "success_rate_percent": 100.0,
+                        "loaded_at": datetime.now().isoformat()
+                    },
+                    "incremental": watermark_info,
+                    "load_errors": [],
+                    "column_mapping_used": column_mapping,
+                    "recommendations": ["🌊 Nenhuma linha nova desde a última carga - nada a enviar"]
+                }
+            
+            # 1.1 Valores que não convertem para o tipo da coluna já vêm separados como rejeitadas
+            df_transformed = stages["df"]
+            reject_frames = []
+            if stages["conversion_rejects"] is not None:
+                reject_frames.append(stages["conversion_rejects"])
             
             # 2. Filtragem automática de outliers por dimensões
             outlier_results = []
             if auto_remove_outliers:
-                df_transformed = self._auto_filter_dimension_outliers(df_transformed, outlier_results)
+                removed_rows = []
+                df_transformed = self._auto_filter_dimension_outliers(df_transformed, outlier_results, removed_rows)
+                reject_frames.extend(self._dimension_reject_frame(removed, skip_first_line) for removed in removed_rows)
+            
+            if progress_callback:
+                progress_callback({"stage": "convert", "rows_converted": len(df_transformed),
+                                   "rows_rejected": sum(len(frame) for frame in reject_frames)})
             
             # 3. Validação final antes do carregamento
             validation_results = self._validate_transformed_data(df_transformed)
             if not validation_results.get('is_valid', False):
                 raise Exception(f"Dados inválidos para carregamento: {validation_results.get('errors', [])}")
+            if cancel_event is not None and cancel_event.is_set():
+                raise Exception("Carga cancelada antes do envio")
+            
+            # 4. Escolher modo e backend de carregamento (REST do Supabase ou COPY direto no Postgres)
+            load_mode = resolve_load_mode(load_mode)
+            natural_key = natural_key_for(target_table) if load_mode == LOAD_MODE_UPSERT else None
+            backend = create_load_backend(target_table, self.supabase, load_backend,
+                                          load_mode=load_mode, conflict_columns=natural_key)
+            
+            # Upsert: linhas repetidas na chave natural saem antes do envio
+            duplicates_removed = 0
+            if natural_key:
+                df_transformed, duplicates_removed = deduplicate_rows(df_transformed, natural_key)
+                if duplicates_removed:
+                    logger.info(f"🧬 {duplicates_removed} linhas duplicadas na chave natural {natural_key} removidas")
+            
+            # 4.1 Checkpoint: cada batch fica registrado; na retomada as posições já gravadas são puladas
+            if checkpoint is None:
+                checkpoint = self._get_settings().loader_checkpoint
+            journal = None
+            checkpoint_info = None
+            df_load = df_transformed
+            pending_positions = np.arange(len(df_transformed))
+            if resume_run_id:
+                journal = open_journal(resume_run_id)
+                state = journal.state()
+                mismatches = journal.verify(df_transformed, state)
+                if mismatches:
+                    raise Exception(f"Dados mudaram desde a execução {resume_run_id} (batches {mismatches[:5]}); "
+                                    f"retomada cancelada para não duplicar linhas")
+                loaded_positions = journal.loaded_positions(state)
+                pending_positions = np.setdiff1d(pending_positions, loaded_positions)
+                df_load = df_transformed.iloc[pending_positions]
+                in_doubt = self._check_in_doubt_resend(resume_run_id, state, natural_key, resend_in_doubt)
+                journal.resume(len(df_transformed), len(loaded_positions), in_doubt)
+                checkpoint_info = {"run_id": resume_run_id, "resumed": True,
+                                   "skipped_rows": int(len(loaded_positions)), "in_doubt_batches": in_doubt,
+                                   "in_doubt_resent_without_key": bool(in_doubt and not natural_key)}
+                logger.info(f"⏯️ Retomando {resume_run_id}: {len(loaded_positions)} linhas já gravadas puladas, "
+                            f"{len(df_load)} a enviar ({in_doubt} batches em dúvida reenviados)")
+            elif checkpoint:
+                journal = open_journal(new_run_id())
+                journal.start({**run_params, "load_mode": load_mode, "incremental": incremental},
+                              len(df_transformed))
+                checkpoint_info = {"run_id": journal.run_id, "resumed": False, "skipped_rows": 0,
+                                   "in_doubt_batches": 0, "in_doubt_resent_without_key": False}
+            
+            # 5. Carregar dados em batches (envio paralelo com retry de erros passageiros)
+            total_rows = len(df_load)
+            
+            def log_batch(progress: Dict[str, Any]):
+                if progress["error"]:
+                    logger.error(f"❌ Batch {progress['batch']}: {progress['error']}")
+                else:
+                    logger.info(f"✅ Batch {progress['batch']}: {progress['loaded']} linhas carregadas "
+                                f"({progress['rows_loaded']}/{progress['total_rows']})")
+                if progress_callback:
+                    progress_callback({**progress, "stage": "load"})
+            
+            loader = BatchLoader(backend, workers=workers)
+            logger.info(f"📤 Carregando {total_rows} linhas via {backend.name} em batches "
+                        f"{'de ' + str(batch_size) if batch_size else 'adaptativos'} ({loader.workers} em paralelo)")
+            try:
+                load_report = loader.load(target_table, df_load, batch_size, progress_callback=log_batch,
+                                          row_numbers=self._source_row_numbers(df_load, skip_first_line),
+                                          checkpoint=journal.tracker(pending_positions) if journal else None,
+                                          cancel_event=cancel_event)
+            finally:
+                if hasattr(backend, 'close'):
+                    backend.close()
+            
+            loaded_rows = load_report["rows_loaded"]
+            failed_rows = load_report["rows_failed"]
+            load_errors = load_report["errors"]
+            if load_report["rows_rejected"]:
+                logger.warning(f"🚫 {load_report['rows_rejected']} linhas rejeitadas "
+                               f"(ex.: linha {load_report['rejects'][0]['row']}: {load_report['rejects'][0]['error']})")
+                load_rejects = load_report["rejects"]
+                reject_frames.append(reject_frame(
+                    df_load.iloc[[reject["position"] for reject in load_rejects]],
+                    [reject["row"] for reject in load_rejects], STAGE_LOAD,
+                    [reject["error"] for reject in load_rejects]
+                ))
+            
+            # 5.1 Gravar as rejeitadas da execução (recarga só das corrigidas, sem reprocessar o arquivo),
+            #     com o mesmo run_id do checkpoint; na retomada só as linhas reenviadas agora são
+            #     substituídas (as demais mantêm correções e histórico de recargas)
+            cancelled = load_report["cancelled"]
+            reject_store_info = None
+            reject_run_id = journal.run_id if journal else new_run_id()
+            resent_rows = None
+            if resume_run_id:
+                sent_positions = np.intersect1d(pending_positions, journal.loaded_positions())
+                resent_rows = (self._source_row_numbers(df_transformed.iloc[sent_positions], skip_first_line)
+                               + [reject["row"] for reject in load_report["rejects"]])
+            try:
+                if reject_frames or resume_run_id:
+                    reject_store_info = get_reject_store().save(
+                        reject_run_id, target_table, reject_frames, source_file=file_path, load_mode=load_mode,
+                        resent_rows=resent_rows
+                    )
+            except Exception as store_error:
+                logger.warning(f"⚠️ Não foi possível gravar as linhas rejeitadas: {store_error}")
             
-            # 4. Verificar conexão com Supabase
-            if not self.supabase:
-                raise Exception("Conexão com Supabase não disponível")
-            
-            # 5. Carregar dados em batches
-            total_rows = len(df_transformed)
-            loaded_rows = 0
-            failed_rows = 0
-            load_errors = []
-            
-            logger.info(f"📤 Carregando {total_rows} linhas em batches de {batch_size}")
-            
-            for start_idx in range(0, total_rows, batch_size):
-                end_idx = min(start_idx + batch_size, total_rows)
-                batch_df = df_transformed.iloc[start_idx:end_idx]
-                
-                try:
-                    # Converter DataFrame para lista de dicionários
-                    batch_data = batch_df.fillna(None).to_dict('records')
-                    
-                    # Inserir batch no Supabase
-                    result = self.supabase.table(target_table).insert(batch_data).execute()
-                    
-                    if result.data:
-                        batch_loaded = len(result.data)
-                        loaded_rows += batch_loaded
-                        logger.info(f"✅ Batch {start_idx//batch_size + 1}: {batch_loaded} linhas carregadas")
-                    else:
-                        failed_rows += len(batch_data)
-                        load_errors.append(f"Batch {start_idx//batch_size + 1}: Resposta vazia do Supabase")
-                        
-                except Exception as batch_error:
-                    failed_rows += len(batch_df)
-                    error_msg = f"Batch {start_idx//batch_size + 1}: {str(batch_error)}"
-                    load_errors.append(error_msg)
-                    logger.error(f"❌ {error_msg}")
+            # Carga cancelada: o diário fica aberto para /process-step3-load/{run_id}/resume
+            if cancelled:
+                logger.warning(f"⏹️ Carga cancelada após {loaded_rows} linhas ({load_report['rows_not_sent']} não enviadas)")
+            elif journal:
+                journal.finish(status="completed" if failed_rows == 0 else "completed_with_failures",
+                               rows_loaded=loaded_rows, rows_failed=failed_rows)
             
             # 6. Calcular estatísticas finais
-            success_rate = (loaded_rows / total_rows) * 100 if total_rows > 0 else 0
+            success_rate = (loaded_rows / total_rows) * 100 if total_rows > 0 else 100.0
             
-            # 7. Resultado final
+            # 7. Resultado final (retomada sem linhas pendentes também é sucesso)
             result = {
-                "success": loaded_rows > 0,
+                "success": (loaded_rows > 0 or total_rows == 0) and not cancelled,
+                "cancelled": cancelled,
                 "load_summary": {
                     "target_table": target_table,
+                    "load_backend": load_report["backend"],
+                    "load_mode": load_mode,
+                    "natural_key": natural_key,
+                    "duplicates_removed": duplicates_removed,
                     "total_rows_processed": total_rows,
                     "rows_loaded": loaded_rows,
                     "rows_failed": failed_rows,
+                    "rows_not_sent": load_report["rows_not_sent"],
                     "success_rate_percent": round(success_rate, 2),
-                    "batches_processed": (total_rows // batch_size) + (1 if total_rows % batch_size > 0 else 0),
+                    "batches_processed": load_report["batches_processed"],
+                    "batches_failed": load_report["batches_failed"],
+                    "retries": load_report["retries"],
+                    "splits": load_report["splits"],
+                    "bisections": load_report["bisections"],
+                    "rows_rejected": load_report["rows_rejected"],
+                    "workers": load_report["workers"],
+                    "batch_sizing": load_report["batch_sizing"],
+                    "elapsed_seconds": load_report["elapsed_seconds"],
+                    "rows_per_second": load_report["rows_per_second"],
                     "loaded_at": datetime.now().isoformat()
                 },
                 "outlier_filtering": outlier_results,
+                "incremental": watermark_info,
                 "validation_results": validation_results,
                 "load_errors": load_errors[:10],  # Primeiros 10 erros apenas
+                "rejected_rows": load_report["rejects"],
+                "reject_store": reject_store_info,
+                "checkpoint": checkpoint_info,
                 "column_mapping_used": column_mapping,
                 "recommendations": self._generate_load_recommendations(success_rate, load_errors, outlier_results)
             }
             
+            # 7.1 Avançar a marca d'água só quando tudo foi carregado (falhas voltam no próximo arquivo)
+            if watermark_info and watermark_info["enabled"]:
+                if loaded_rows > 0 and failed_rows == 0 and not cancelled:
+                    watermark_info["new_watermark"] = self._advance_watermark(
+                        df_transformed, target_table, watermark_info
+                    )
+                else:
+                    logger.warning("⚠️ Carga com falhas: marca d'água mantida para reprocessar o período")
+            
+            # 8. Memorizar o mapeamento confirmado para os próximos arquivos do mesmo tipo
+            if loaded_rows > 0:
+                try:
+                    get_mapping_store().record(stages["original_columns"], target_table, column_mapping)
+                    learned_type = file_type_for_table(target_table)
+                    if learned_type:
+                        get_file_type_index().register(stages["original_columns"], learned_type)
+                except Exception as store_error:
+                    logger.warning(f"⚠️ Não foi possível memorizar o mapeamento: {store_error}")
+            
             if loaded_rows == total_rows:
                 logger.info(f"🎉 Carregamento 100% bem-sucedido: {loaded_rows} linhas em {target_table}")
             elif loaded_rows > 0:
@@ -1837,9 +2115,168 @@ class ConectaBoiETL:
                 }
             }
     
-    def _auto_filter_dimension_outliers(self, df: pd.DataFrame, outlier_results: List[Dict]) -> pd.DataFrame:
+    def _run_transform_stages(self, file_path: str, column_mapping: List[Dict], skip_first_line: bool = False,
+                              watermark_filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Etapas de CPU da carga: ler, limpar, [marca d'água], mapear e converter
+        
+        Não usa rede nem o estado da conexão, por isso também roda nos processos
+        do pool (run_transform_stages); o resultado é serializável.
+        
+        Args:
+            watermark_filter: {"target_table", "source", "watermark"} da carga incremental
+            
+        Returns:
+            rows_parsed, rows_remaining, original_columns, watermark, df e conversion_rejects
+        """
+        df_original = self._load_and_prepare_dataframe(file_path, skip_first_line)
+        rows_parsed = len(df_original)
+        
+        watermark_info = None
+        if watermark_filter:
+            df_original, watermark_info = self._apply_watermark(
+                df_original, column_mapping, watermark_filter["target_table"],
+                watermark_filter["source"], watermark_filter["watermark"]
+            )
+        
+        stages = {
+            "rows_parsed": rows_parsed,
+            "rows_remaining": len(df_original),
+            "original_columns": list(df_original.columns),
+            "watermark": watermark_info,
+            "df": df_original,
+            "conversion_rejects": None
+        }
+        if watermark_info and watermark_info["enabled"] and len(df_original) == 0:
+            return stages
+        
+        conversion_failures = []
+        df_transformed = self._apply_column_mapping_transformations(df_original, column_mapping, conversion_failures)
+        if conversion_failures:
+            df_transformed, stages["conversion_rejects"] = self._divert_conversion_failures(
+                df_transformed, conversion_failures, skip_first_line
+            )
+        stages["df"] = df_transformed
+        return stages
+    
+    def resume_step3_load(self, run_id: str, workers: Optional[int] = None,
+                          progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          cancel_event: Optional[threading.Event] = None,
+                          resend_in_doubt: bool = False) -> Dict[str, Any]:
+        """
+        Retoma uma carga da Etapa 3 interrompida (queda ou deploy) pelo checkpoint
+        
+        O arquivo é reprocessado com os mesmos parâmetros; os batches já gravados
+        são conferidos pelo hash e suas linhas não são reenviadas. Batches em dúvida
+        (enviados sem confirmação) só são reenviados sem pedido explícito no upsert
+        pela chave natural.
+        
+        Raises:
+            KeyError: Checkpoint inexistente
+            ValueError: Execução já concluída (rejeitadas são recarregadas pelo reject store)
+                ou batches em dúvida em modo insert sem resend_in_doubt
+        """
+        journal = open_journal(run_id)
+        state = journal.state()
+        if not state["params"]:
+            raise KeyError(f"Checkpoint sem parâmetros de carga: {run_id}")
+        if state["finished"]:
+            raise ValueError(f"Execução {run_id} já concluída ({state['finished']['status']})")
+        
+        params = state["params"]
+        load_mode = resolve_load_mode(params.get("load_mode"))
+        natural_key = natural_key_for(params["target_table"]) if load_mode == LOAD_MODE_UPSERT else None
+        self._check_in_doubt_resend(run_id, state, natural_key, resend_in_doubt)
+        
+        return self.process_step3_load_data(**params, workers=workers,
+                                            progress_callback=progress_callback, resume_run_id=run_id,
+                                            resend_in_doubt=resend_in_doubt, cancel_event=cancel_event)
+    
+    @staticmethod
+    def _check_in_doubt_resend(run_id: str, state: Dict[str, Any], natural_key: Optional[List[str]],
+                               resend_in_doubt: bool) -> int:
+        """
+        Batches em dúvida da execução; sem chave natural o reenvio pode duplicar
+        linhas e só acontece com resend_in_doubt
+        
+        Raises:
+            ValueError: Batches em dúvida, carga sem upsert pela chave natural e sem resend_in_doubt
+        """
+        in_doubt = sum(1 for batch in state["batches"].values() if batch["status"] == "in_doubt")
+        if in_doubt and not natural_key and not resend_in_doubt:
+            raise ValueError(
+                f"Execução {run_id} tem {in_doubt} batches em dúvida (enviados sem confirmação do banco); "
+                f"sem upsert pela chave natural o reenvio pode duplicar linhas. Confira a tabela e retome "
+                f"com resend_in_doubt para reenviá-los"
+            )
+        return in_doubt
+    
+    def _apply_watermark(self, df: pd.DataFrame, column_mapping: List[Dict],
+                         target_table: str, source: str, watermark=_READ_STORE):
+        """
+        Remove do CSV as linhas até a marca d'água de (tabela, origem)
+        
+        watermark já lido pelo processo principal evita consultar o store
+        (no pool de processos o store do worker pode estar desatualizado).
+        
+        Returns:
+            Tupla (DataFrame filtrado, informações da carga incremental)
+        """
+        columns = watermark_columns_for(target_table)
+        if not columns:
+            return df, {"enabled": False, "source": source, "reason": f"Tabela {target_table} sem colunas de marca d'água"}
+        
+        csv_for_db = {
+            mapping.get('db_column'): mapping.get('csv_column')
+            for mapping in column_mapping
+            if mapping.get('enabled', True) and mapping.get('db_column')
+        }
+        date_csv = csv_for_db.get(columns[0])
+        if not date_csv or date_csv not in df.columns:
+            return df, {"enabled": False, "source": source, "reason": f"Coluna '{columns[0]}' não mapeada"}
+        
+        time_csv = csv_for_db.get(columns[1]) if len(columns) > 1 else None
+        if time_csv not in df.columns:
+            time_csv = None
+        used_columns = [columns[0]] + ([columns[1]] if time_csv else [])
+        
+        if watermark is _READ_STORE:
+            watermark = get_watermark_store().get(target_table, source)
+        filtered, skipped = filter_new_rows(df, watermark, date_csv, time_csv)
+        
+        if skipped:
+            logger.info(f"🌊 {skipped} linhas até {watermark.isoformat()} descartadas ({target_table}, {source})")
+        
+        return filtered, {
+            "enabled": True,
+            "source": source,
+            "columns": used_columns,
+            "watermark": watermark.isoformat() if watermark is not None else None,
+            "rows_skipped": skipped,
+            "rows_remaining": len(filtered)
+        }
+    
+    def _advance_watermark(self, df: pd.DataFrame, target_table: str, watermark_info: Dict) -> Optional[str]:
+        """Avança a marca d'água para o maior instante carregado"""
+        columns = watermark_info["columns"]
+        if columns[0] not in df.columns:
+            return watermark_info.get("watermark")
+        
+        timestamps = event_timestamps(df, columns[0], columns[1] if len(columns) > 1 else None)
+        latest = timestamps.max()
+        if pd.isna(latest):
+            return watermark_info.get("watermark")
+        
+        get_watermark_store().advance(target_table, watermark_info["source"], latest, columns)
+        return latest.isoformat()
+    
+    def _auto_filter_dimension_outliers(self, df: pd.DataFrame, outlier_results: List[Dict],
+                                        removed_rows: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
         """
         Aplica filtragem automática de outliers baseada em tabelas de dimensão conhecidas
+        
+        Se removed_rows for informado, recebe as linhas removidas de cada coluna
+        (com as colunas de controle _column e _dimension_table)
         """
         try:
             logger.info(f"🧹 Iniciando filtragem automática de outliers por dimensão")
@@ -1874,7 +2311,11 @@ class ConectaBoiETL:
                     )
                     
                     if filter_result.get('success', False):
+                        df_before = df_filtered
                         df_filtered = filter_result.get('filtered_dataframe', df_filtered)
+                        if removed_rows is not None and len(df_filtered) < len(df_before):
+                            removed = df_before[~df_before.index.isin(df_filtered.index)]
+                            removed_rows.append(removed.assign(_column=column, _dimension_table=dimension_table))
                         outliers_removed = filter_result.get('outliers_removed', 0)
                         total_outliers_removed += outliers_removed
                         
@@ -1885,6 +2326,7 @@ class ConectaBoiETL:
                             "outliers_removed": outliers_removed,
                             "outlier_percentage": filter_result.get('outlier_percentage', 0.0),
                             "outlier_values_sample": filter_result.get('outlier_values', [])[:5],
+                            "suggested_transformations": filter_result.get('suggested_transformations', {}),
                             "recommendations": filter_result.get('recommendations', [])
                         })
                         
@@ -2042,6 +2484,8 @@ class ConectaBoiETL:
                 "filtered_dataframe": df_filtered,
                 "outlier_values": invalid_values[:20],  # Primeiros 20 valores inválidos
                 "validation_summary": validation_result.get('validation_summary', {}),
+                "suggestions": validation_result.get('suggestions', {}),
+                "suggested_transformations": validation_result.get('suggested_transformations', {}),
                 "recommendations": self._generate_outlier_filter_recommendations(
                     outliers_removed, original_rows, len(invalid_values)
                 ),
@@ -2138,13 +2582,22 @@ class ConectaBoiETL:
             
             # Buscar valores existentes na dimensão
             logger.info(f"🔍 Consultando {lookup_column} em {dimension_table}")
-            
+
+            # Dimensão em cache: validação local, sem round trips por batch
+            dimension_index = self._get_dimension_index(dimension_table, lookup_column)
+
             # Faz consulta por batches para evitar URLs muito longas
             valid_values = set()
             batch_size = 50
-            
-            for i in range(0, len(unique_values), batch_size):
-                batch = unique_values[i:i + batch_size]
+
+            if dimension_index is not None:
+                valid_values = {v for v in unique_values if v in dimension_index}
+                unique_to_query = []
+            else:
+                unique_to_query = unique_values
+
+            for i in range(0, len(unique_to_query), batch_size):
+                batch = unique_to_query[i:i + batch_size]
                 
                 try:
                     # Consulta no Supabase
@@ -2166,6 +2619,16 @@ class ConectaBoiETL:
             valid_count = len(valid_values)
             invalid_count = len(invalid_values)
             total_unique = len(unique_values)
+
+            # Sugestões "você quis dizer" para os valores inválidos
+            suggestions = {}
+            if invalid_values and dimension_index is not None:
+                settings = self._get_settings()
+                suggestions = dimension_index.suggest_many(
+                    invalid_values,
+                    top_k=settings.dimension_suggestions_top_k,
+                    min_similarity=settings.dimension_suggestions_min_similarity
+                )
             
             validation_result = {
                 "success": True,
@@ -2180,6 +2643,8 @@ class ConectaBoiETL:
                     "invalid_count": invalid_count,
                     "valid_percentage": round((valid_count / total_unique) * 100, 2) if total_unique > 0 else 0.0
                 },
+                "suggestions": suggestions,
+                "suggested_transformations": build_suggested_transformations(suggestions),
                 "recommendations": self._generate_dimension_validation_recommendations(
                     valid_count, invalid_count, dimension_table, invalid_values[:5]
                 ),
@@ -2199,6 +2664,65 @@ class ConectaBoiETL:
                 "validated_at": datetime.now().isoformat()
             }
     
+    def _get_settings(self):
+        """Retorna as configurações globais da aplicação"""
+        from config.settings import get_settings
+        return get_settings()
+
+    def _get_dimension_index(self, dimension_table: str, lookup_column: str) -> Optional[TrigramIndex]:
+        """
+        Retorna o índice de trigramas da dimensão, carregando todas as chaves
+        (paginado) na primeira chamada e mantendo em cache pelo TTL configurado
+
+        Returns:
+            TrigramIndex com as chaves da dimensão, ou None se não foi possível carregar
+        """
+        cache_key = (dimension_table, lookup_column)
+        ttl = self._get_settings().dimension_cache_ttl_seconds
+        cached = self._dimension_indexes.get(cache_key)
+
+        if cached and time.monotonic() - cached["loaded_at"] < ttl:
+            return cached["index"]
+
+        if not self.supabase:
+            return cached["index"] if cached else None
+
+        try:
+            index = TrigramIndex()
+            page_size = 1000
+            start = 0
+
+            while True:
+                result = self.supabase.table(dimension_table)\
+                    .select(lookup_column)\
+                    .range(start, start + page_size - 1)\
+                    .execute()
+                rows = result.data or []
+
+                for row in rows:
+                    if row.get(lookup_column) is not None:
+                        index.add(row[lookup_column])
+
+                if len(rows) < page_size:
+                    break
+                start += page_size
+
+            self._dimension_indexes[cache_key] = {"index": index, "loaded_at": time.monotonic()}
+            logger.info(f"📚 Dimensão {dimension_table}.{lookup_column} em cache: {len(index)} chaves indexadas")
+            return index
+
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível carregar {dimension_table} em cache: {e}")
+            return cached["index"] if cached else None
+
+    def invalidate_dimension_cache(self, dimension_table: str = None):
+        """Descarta o cache de dimensões (de uma tabela específica ou de todas)"""
+        if dimension_table is None:
+            self._dimension_indexes.clear()
+        else:
+            for cache_key in [k for k in self._dimension_indexes if k[0] == dimension_table]:
+                del self._dimension_indexes[cache_key]
+
     def _detect_dimension_key_column(self, dimension_table: str) -> str:
         """
         Detecta automaticamente a coluna chave de uma tabela de dimensão
@@ -2265,6 +2789,54 @@ class ConectaBoiETL:
         return recommendations
 
 
+# ETL sem conexão, um por processo do pool de CPU
+_offline_etl = None
+
+
+def _get_offline_etl() -> ConectaBoiETL:
+    global _offline_etl
+    if _offline_etl is None:
+        _offline_etl = ConectaBoiETL(connect=False)
+    return _offline_etl
+
+
+def parse_csv_file(file_path: str, skip_first_line: bool = False) -> pd.DataFrame:
+    """
+    Lê e limpa o CSV (encoding, separador, limpeza) sem conectar ao Supabase
+
+    Função de módulo para rodar no pool de processos da API (ver api.executors).
+    """
+    return _get_offline_etl()._load_and_prepare_dataframe(file_path, skip_first_line)
+
+
+def run_transform_stages(file_path: str, column_mapping: List[Dict], skip_first_line: bool = False,
+                         watermark_filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Etapas de CPU da Etapa 3 (ver ConectaBoiETL._run_transform_stages) para o pool de processos"""
+    return _get_offline_etl()._run_transform_stages(file_path, column_mapping, skip_first_line, watermark_filter)
+
+
+def warm_worker():
+    """
+    Inicializador dos processos do pool de CPU
+
+    Deixa pandas, o parser de CSV e o ETL offline carregados e o snapshot de
+    schemas em memória, para a primeira tarefa não pagar a partida a frio.
+    """
+    configure_logging()
+    _get_offline_etl()
+    pd.read_csv(io.StringIO("a;b\n1,5;2"), sep=";", decimal=",")
+    try:
+        bootstrap_schema_registry(background_refresh=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Worker sem snapshot de schemas: {e}")
+    logger.info(f"🔥 Worker {os.getpid()} pronto")
+
+
+def configure_logging(level: int = logging.INFO):
+    """Logging no console para a CLI e os processos do pool (importar o módulo não configura nada)"""
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
 def main():
     """Função principal para teste"""
     import argparse
@@ -2275,20 +2847,29 @@ def main():
                        help='Pular primeira linha e usar segunda como cabeçalho')
     parser.add_argument('--config', help='Arquivo de configuração JSON (opcional)')
     parser.add_argument('--output', help='Arquivo de saída (opcional)')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Só valida estrutura e mapeamento (sem pandas e sem Supabase)')
     
     args = parser.parse_args()
+    configure_logging()
     
-    # Inicializar ETL
-    etl = ConectaBoiETL(args.config)
+    # Inicializar ETL (a validação a seco não conecta ao Supabase)
+    etl = ConectaBoiETL(args.config, connect=not args.dry_run)
     
     # Processar arquivo
-    result = etl.process_file(args.file_path, args.skip_first_line)
+    if args.dry_run:
+        result = etl.validate_file_structure(args.file_path, args.skip_first_line)
+    else:
+        result = etl.process_file(args.file_path, args.skip_first_line)
     
     if result['success']:
-        print(f"✅ Processamento concluído!")
+        print(f"✅ {'Validação concluída' if args.dry_run else 'Processamento concluído'}!")
         print(f"📊 Estrutura detectada: {result['structure']['detected_file_type']}")
         print(f"📝 Colunas: {result['structure']['column_count']}")
-        print(f"📈 Linhas processadas: {result['total_rows']}")
+        if args.dry_run:
+            print(f"📈 Linhas estimadas: {result['structure']['estimated_rows']}")
+        else:
+            print(f"📈 Linhas processadas: {result['total_rows']}")
         
         if args.output:
             with open(args.output, 'w', encoding='utf-8') as f:
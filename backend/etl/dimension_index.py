@@ -0,0 +1,147 @@
+"""
+Índice de trigramas para sugestões "você quis dizer" em valores de dimensão
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+
+def normalize_dimension_value(value: str) -> str:
+    """Normaliza valor para comparação: minúsculas, sem acentos e espaços simples"""
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+def extract_trigrams(value: str) -> frozenset:
+    """
+    Extrai trigramas no estilo pg_trgm (duas posições de padding no início
+    e uma no fim de cada palavra)
+    """
+    trigrams = set()
+    for word in normalize_dimension_value(value).split(' '):
+        if not word:
+            continue
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return frozenset(trigrams)
+
+
+class TrigramIndex:
+    """
+    Índice invertido trigrama → chaves da dimensão
+
+    A busca usa prefix filtering: só os trigramas mais raros da consulta geram
+    candidatos, e cada candidato é verificado pela similaridade de Jaccard exata.
+    Assim o custo depende do tamanho das listas raras, não do tamanho da dimensão.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._keys: List[str] = []
+        self._trigrams: List[frozenset] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._seen = set()
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self._seen
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def add(self, key) -> None:
+        """Adiciona uma chave ao índice (ignora vazias e duplicadas)"""
+        key = str(key).strip()
+        if not key or key in self._seen:
+            return
+
+        key_id = len(self._keys)
+        trigrams = extract_trigrams(key)
+        self._keys.append(key)
+        self._trigrams.append(trigrams)
+        self._seen.add(key)
+
+        for trigram in trigrams:
+            self._postings[trigram].append(key_id)
+
+    def suggest(self, value: str, top_k: int = 3, min_similarity: float = 0.3) -> List[Dict]:
+        """
+        Retorna as top-k chaves mais parecidas com o valor informado
+
+        Args:
+            value: Valor inválido a ser corrigido
+            top_k: Quantidade máxima de sugestões
+            min_similarity: Similaridade mínima (0.0 a 1.0) para sugerir
+
+        Returns:
+            Lista de {"value", "similarity"} em ordem decrescente de similaridade
+        """
+        query = extract_trigrams(value)
+        if not query or not self._keys or top_k <= 0:
+            return []
+
+        threshold = max(min_similarity, 1e-9)
+
+        # Jaccard >= s implica overlap >= ceil(s * |Q|): basta olhar os
+        # |Q| - ceil(s * |Q|) + 1 trigramas mais raros para achar todo candidato
+        min_overlap = max(1, math.ceil(threshold * len(query)))
+        probe_count = len(query) - min_overlap + 1
+        ordered = sorted(query, key=lambda t: len(self._postings.get(t, ())))
+
+        candidates = set()
+        for trigram in ordered[:probe_count]:
+            candidates.update(self._postings.get(trigram, ()))
+
+        min_size = threshold * len(query)
+        max_size = len(query) / threshold
+
+        scored = []
+        for key_id in candidates:
+            trigrams = self._trigrams[key_id]
+            # Filtro de tamanho: Jaccard >= s exige s|Q| <= |K| <= |Q|/s
+            if not (min_size <= len(trigrams) <= max_size):
+                continue
+            overlap = len(query & trigrams)
+            similarity = overlap / (len(query) + len(trigrams) - overlap)
+            if similarity >= min_similarity:
+                scored.append((similarity, self._keys[key_id]))
+
+        best = heapq.nlargest(top_k, scored, key=lambda item: (item[0], -len(item[1])))
+        return [{"value": key, "similarity": round(score, 4)} for score, key in best]
+
+    def suggest_many(self, values: Iterable[str], top_k: int = 3,
+                     min_similarity: float = 0.3) -> Dict[str, List[Dict]]:
+        """Sugestões para vários valores de uma vez"""
+        return {
+            str(value): self.suggest(value, top_k=top_k, min_similarity=min_similarity)
+            for value in values
+        }
+
+
+def build_suggested_transformations(suggestions: Dict[str, List[Dict]],
+                                    min_similarity: float = 0.5) -> Dict[str, str]:
+    """
+    Converte sugestões em pares {valor_inválido: valor_dimensão} no formato do
+    campo `transformations` dos mapeamentos (Quick ETL e scripts exportados)
+    """
+    transformations = {}
+    for invalid_value, options in suggestions.items():
+        if not options:
+            continue
+        best: Optional[Dict] = options[0]
+        # Empate no topo é ambíguo demais para virar transformação automática
+        if len(options) > 1 and options[1]["similarity"] == best["similarity"]:
+            continue
+        if best["similarity"] >= min_similarity:
+            transformations[invalid_value] = best["value"]
+    return transformations
@@ -0,0 +1,329 @@
+"""
+Índice de assinaturas de cabeçalho para classificação instantânea de arquivos
+Cabeçalhos → tipo de arquivo, tabela de staging, configuração salva e plano de mapeamento
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from etl.mapping_store import normalize_column_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_DIR = Path(__file__).resolve().parents[2] / "arquivos_exportados"
+
+# Tipos de arquivo conhecidos do ConectaBoi
+FILE_TYPE_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    '01_historico_consumo': {
+        'target_table': 'etl_staging_01_historico_consumo',
+        'keywords': ['curral', 'data', 'cms', 'consumo', 'animais'],
+        'mapping_rules': {
+            'data': 'data',
+            'curral': 'id_curral',
+            'animais': 'qtd_animais',
+            'cms_realizado': 'cms_realizado_kg',
+            'cms_previsto': 'cms_previsto_kg',
+            'lote': 'lote',
+            'sexo': 'sexo',
+            'peso_entrada': 'peso_entrada_kg'
+        }
+    },
+    '02_desvio_carregamento': {
+        'target_table': 'etl_staging_02_desvio_carregamento',
+        'keywords': ['carregamento', 'desvio', 'pazeiro', 'ingrediente'],
+        'mapping_rules': {
+            'data': 'data',
+            'carregamento': 'carregamento',
+            'pazeiro': 'pazeiro',
+            'ingrediente': 'ingrediente',
+            'desvio_kg': 'desvio_kg',
+            'previsto': 'previsto_kg',
+            'realizado': 'realizado_kg'
+        }
+    },
+    '03_desvio_distribuicao': {
+        'target_table': 'etl_staging_03_desvio_distribuicao',
+        'keywords': ['distribuicao', 'tratador', 'trato', 'curral'],
+        'mapping_rules': {}
+    },
+    '04_itens_trato': {
+        'target_table': 'etl_staging_04_itens_trato',
+        'keywords': ['trato', 'ingrediente', 'carregamento'],
+        'mapping_rules': {}
+    },
+    '05_trato_curral': {
+        'target_table': 'etl_staging_05_trato_curral',
+        'keywords': ['trato', 'curral', 'abastecido', 'vagao'],
+        'mapping_rules': {}
+    }
+}
+
+_GENERATED_COLUMN = re.compile(r'^col_\d+$')
+_FUZZY_MIN_SIMILARITY = 0.6
+
+
+def header_tokens(headers: Iterable[str]) -> frozenset:
+    """Cabeçalhos normalizados, sem vazios nem nomes gerados (col_N)"""
+    tokens = set()
+    for header in headers:
+        token = normalize_column_name(str(header))
+        if token and token not in ('nan', 'none', 'null') and not _GENERATED_COLUMN.match(token):
+            tokens.add(token)
+    return frozenset(tokens)
+
+
+def header_fingerprint(headers: Iterable[str]) -> str:
+    """Impressão digital exata de um conjunto de cabeçalhos"""
+    return hashlib.sha1('\x1f'.join(sorted(header_tokens(headers))).encode('utf-8')).hexdigest()
+
+
+def file_type_for_table(table_name: str) -> Optional[str]:
+    """Tipo de arquivo correspondente a uma tabela de staging (ou None)"""
+    for file_type, definition in FILE_TYPE_DEFINITIONS.items():
+        if definition['target_table'] == table_name:
+            return file_type
+    return None
+
+
+def parse_header_line(line: str) -> List[str]:
+    """Separa uma linha de cabeçalho CSV (aceita vírgula ou ponto e vírgula)"""
+    line = line.strip().lstrip('\ufeff')
+    delimiter = ';' if line.count(';') > line.count(',') else ','
+    return [cell.strip() for cell in next(csv.reader([line], delimiter=delimiter), [])]
+
+
+@lru_cache(maxsize=4096)
+def _keyword_hits(token: str) -> Tuple[Tuple[str, str], ...]:
+    """Pares (tipo, palavra-chave) contidos em um cabeçalho normalizado"""
+    return tuple(
+        (file_type, keyword)
+        for file_type, definition in FILE_TYPE_DEFINITIONS.items()
+        for keyword in definition['keywords']
+        if keyword in token
+    )
+
+
+class FileTypeIndex:
+    """
+    Índice pré-computado de cabeçalhos para tipo de arquivo
+
+    - Exato: impressão digital do conjunto de cabeçalhos → tipo (configs salvas)
+    - Aproximado: índice invertido cabeçalho → tipos, com Jaccard sobre os
+      cabeçalhos das configs salvas (tolera colunas a mais ou a menos)
+    - Palavras-chave: fallback com o score por palavras dos padrões conhecidos
+    """
+
+    def __init__(self, config_dir: Path = None):
+        self._lock = threading.Lock()
+        self._exact: Dict[str, str] = {}
+        self._header_sets: Dict[str, List[frozenset]] = defaultdict(list)
+        self._inverted: Dict[str, set] = defaultdict(set)
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._plans: Dict[str, List[Tuple[str, str]]] = {
+            file_type: list(definition['mapping_rules'].items())
+            for file_type, definition in FILE_TYPE_DEFINITIONS.items()
+        }
+        self._load_saved_configs(Path(config_dir or DEFAULT_CONFIG_DIR))
+
+    def _load_saved_configs(self, config_dir: Path):
+        """Indexa as configurações exportadas (arquivos_exportados/*_config.json)"""
+        if not config_dir.exists():
+            return
+
+        for config_path in sorted(config_dir.glob('*_config.json')):
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Configuração ilegível ignorada ({config_path.name}): {e}")
+                continue
+
+            file_type = config.get('fileId')
+            if file_type not in FILE_TYPE_DEFINITIONS:
+                continue
+
+            self._configs[file_type] = config
+            if config.get('csvHeaders'):
+                self.register(config['csvHeaders'], file_type)
+
+    def load_learned_signatures(self, known_headers: Iterable[Tuple[str, List[str]]]):
+        """Indexa os cabeçalhos já confirmados na memória de mapeamentos"""
+        for target_table, headers in known_headers:
+            file_type = file_type_for_table(target_table)
+            if file_type:
+                self.register(headers, file_type)
+
+    def register(self, headers: Iterable[str], file_type: str):
+        """Registra um conjunto de cabeçalhos como pertencente a um tipo de arquivo"""
+        tokens = header_tokens(headers)
+        if not tokens or file_type not in FILE_TYPE_DEFINITIONS:
+            return
+
+        with self._lock:
+            self._exact[header_fingerprint(tokens)] = file_type
+            if tokens not in self._header_sets[file_type]:
+                self._header_sets[file_type].append(tokens)
+            for token in tokens:
+                self._inverted[token].add(file_type)
+
+    def classify(self, headers: List[str], file_name: str = None) -> Dict[str, Any]:
+        """
+        Classifica o arquivo e devolve tudo que é preciso para configurá-lo
+
+        Returns:
+            Dicionário com file_type, target_table, method, confidence,
+            saved_config e mapping_plan (file_type None se não reconhecido)
+        """
+        file_type, method, confidence = self.detect(headers, file_name)
+
+        result = {
+            "file_type": file_type,
+            "target_table": FILE_TYPE_DEFINITIONS[file_type]['target_table'] if file_type else None,
+            "method": method,
+            "confidence": round(confidence, 4),
+            "saved_config": self._configs.get(file_type) if file_type else None,
+            "mapping_plan": self.compile_mapping(file_type, headers) if file_type else []
+        }
+        return result
+
+    def classify_header_lines(self, lines: List[str], file_name: str = None) -> Dict[str, Any]:
+        """
+        Classifica a partir das primeiras linhas brutas do arquivo
+
+        Os exports do ConectaBoi às vezes trazem uma linha de título antes do
+        cabeçalho; a segunda linha é testada e vence se classificar melhor.
+        """
+        candidates = []
+        for line_number, line in enumerate(lines[:2]):
+            headers = parse_header_line(line)
+            file_type, method, confidence = self.detect(headers)
+            candidates.append((confidence, -line_number, headers, file_type, method))
+
+        if not candidates:
+            return {**self.classify([], file_name), "headers": [], "skip_first_line": False}
+
+        confidence, line_number, headers, file_type, method = max(candidates, key=lambda c: c[:2])
+        named_type, named_method, _ = self.detect([], file_name)
+        if named_type:
+            file_type, method, confidence = named_type, named_method, 1.0
+
+        return {
+            "file_type": file_type,
+            "target_table": FILE_TYPE_DEFINITIONS[file_type]['target_table'] if file_type else None,
+            "method": method,
+            "confidence": round(confidence, 4),
+            "saved_config": self._configs.get(file_type) if file_type else None,
+            "mapping_plan": self.compile_mapping(file_type, headers),
+            "headers": headers,
+            "skip_first_line": line_number == -1
+        }
+
+    def detect(self, headers: List[str], file_name: str = None) -> Tuple[Optional[str], str, float]:
+        """Retorna (tipo de arquivo, método, confiança) sem montar o plano"""
+        # 1. Nome do arquivo
+        if file_name:
+            stem = Path(file_name).stem.lower()
+            for file_type in FILE_TYPE_DEFINITIONS:
+                if file_type in stem:
+                    return file_type, "file_name", 1.0
+
+        tokens = header_tokens(headers)
+        if not tokens:
+            return None, "unknown", 0.0
+
+        # 2. Impressão digital exata
+        file_type = self._exact.get(header_fingerprint(tokens))
+        if file_type:
+            return file_type, "exact_signature", 1.0
+
+        # 3. Aproximado: só os tipos que compartilham algum cabeçalho são avaliados
+        candidates = set()
+        for token in tokens:
+            candidates.update(self._inverted.get(token, ()))
+
+        best_type, best_similarity = None, 0.0
+        for candidate in candidates:
+            for known in self._header_sets[candidate]:
+                overlap = len(tokens & known)
+                similarity = overlap / (len(tokens) + len(known) - overlap)
+                if similarity > best_similarity:
+                    best_type, best_similarity = candidate, similarity
+
+        if best_type and best_similarity >= _FUZZY_MIN_SIMILARITY:
+            return best_type, "fuzzy_signature", best_similarity
+
+        # 4. Palavras-chave (mesmo critério do detector original: score > 1)
+        matched = defaultdict(set)
+        for token in tokens:
+            for file_type, keyword in _keyword_hits(token):
+                matched[file_type].add(keyword)
+
+        best_type, best_score = None, 0
+        for file_type in FILE_TYPE_DEFINITIONS:
+            score = len(matched.get(file_type, ()))
+            if score > best_score:
+                best_type, best_score = file_type, score
+
+        if best_score > 1:
+            total = len(FILE_TYPE_DEFINITIONS[best_type]['keywords'])
+            return best_type, "keywords", best_score / total
+
+        return None, "unknown", 0.0
+
+    @lru_cache(maxsize=256)
+    def _compile_mapping_cached(self, file_type: str, headers: Tuple[str, ...]) -> Tuple[Tuple, ...]:
+        rules = self._plans.get(file_type, [])
+        targets = {target for _, target in rules}
+        compiled = []
+        for header in headers:
+            header_lower = header.lower()
+            sql_column = None
+            for pattern, target in rules:
+                if pattern in header_lower:
+                    sql_column = target
+                    break
+            if not sql_column:
+                sql_column = header_lower.replace(' ', '_').replace('-', '_')
+            compiled.append((header, sql_column, 0.8 if sql_column in targets else 0.5))
+        return tuple(compiled)
+
+    def compile_mapping(self, file_type: Optional[str], headers: List[str]) -> List[Dict[str, Any]]:
+        """
+        Plano de mapeamento (formato do Quick ETL) para os cabeçalhos informados
+        O resultado é memorizado por (tipo, cabeçalhos)
+        """
+        if not file_type:
+            return []
+        return [
+            {'csvColumn': header, 'sqlColumn': sql_column, 'type': 'direct', 'confidence': confidence}
+            for header, sql_column, confidence in self._compile_mapping_cached(file_type, tuple(headers))
+        ]
+
+
+# Instância global do índice
+_file_type_index = None
+_file_type_index_lock = threading.Lock()
+
+
+def get_file_type_index() -> FileTypeIndex:
+    """Retorna instância singleton do índice de tipos de arquivo"""
+    global _file_type_index
+    if _file_type_index is None:
+        with _file_type_index_lock:
+            if _file_type_index is None:
+                index = FileTypeIndex()
+                try:
+                    from etl.mapping_store import get_mapping_store
+                    index.load_learned_signatures(get_mapping_store().known_headers())
+                except Exception as e:
+                    logger.warning(f"⚠️ Assinaturas aprendidas não indexadas: {e}")
+                _file_type_index = index
+    return _file_type_index
@@ -0,0 +1,173 @@
+"""
+Entrega de DataFrames dos processos do pool para a API via arquivos Arrow IPC
+
+O worker grava o DataFrame do resultado como Arrow IPC (sem compressão) em
+memória compartilhada (/dev/shm quando existe) e devolve só um FrameHandle; a
+API abre o arquivo por memory-map em vez de desserializar um pickle do tamanho
+do DataFrame. Sem pyarrow, com a entrega desligada ou para frames pequenos, o
+DataFrame volta por pickle como antes.
+
+O arquivo é removido logo após a abertura: no POSIX o mapeamento continua
+válido sem o nome e a memória volta ao sistema quando o último buffer do
+DataFrame deixa de ser referenciado (ex.: quando o ResultCache descarta o
+resultado). No Windows um arquivo mapeado não pode ser removido, então o
+conteúdo é lido para a memória do processo antes da remoção.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from etl.lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+
+def arrow_available() -> bool:
+    """Arrow IPC requer pyarrow; sem ele os frames voltam por pickle"""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    """Referência serializável a um DataFrame publicado em Arrow IPC"""
+    path: str
+    rows: int
+    nbytes: int
+
+
+def resolve_handoff_dir(configured_dir: str = "") -> Path:
+    """Diretório dos arquivos: o configurado, /dev/shm ou o temporário do sistema"""
+    if configured_dir:
+        return Path(configured_dir)
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / "conectaboi_frames"
+    return Path(tempfile.gettempdir()) / "conectaboi_frames"
+
+
+def publish_frame(df: pd.DataFrame, min_rows: int = None, base_dir: Path = None):
+    """
+    Publica o DataFrame em Arrow IPC e retorna o FrameHandle
+
+    Retorna o próprio DataFrame quando o Arrow não está disponível, a entrega
+    está desligada, o frame é pequeno (pickle sai mais barato), alguma
+    coluna não converte para Arrow ou a gravação falha (ex.: disco cheio).
+    """
+    from config.settings import get_settings
+    settings = get_settings()
+    min_rows = settings.frame_handoff_min_rows if min_rows is None else min_rows
+    if not settings.frame_handoff_enabled or len(df) < min_rows or not arrow_available():
+        return df
+
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.debug(f"Frame não convertido para Arrow ({e}); entrega por pickle")
+        return df
+
+    base_dir = Path(base_dir or resolve_handoff_dir(settings.frame_handoff_dir))
+    path = base_dir / f"{uuid.uuid4().hex}.arrow"
+    temp_path = path.with_suffix(".tmp")
+    try:
+        base_dir.mkdir(parents=True, exist_ok=True)
+        with pa.OSFile(str(temp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    except OSError as e:
+        # /dev/shm cheio (ENOSPC) ou sem permissão: o arquivo parcial sai e o frame vai por pickle
+        logger.warning(f"⚠️ Frame não publicado em {base_dir} ({e}); entrega por pickle")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return df
+    return FrameHandle(str(path), len(df), int(table.nbytes))
+
+
+def open_frame(handle: FrameHandle) -> pd.DataFrame:
+    """
+    Abre o frame publicado e remove o arquivo
+
+    Colunas numéricas sem nulos apontam direto para o mapeamento (sem cópia);
+    texto e colunas com nulos são materializados pelo pandas.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    try:
+        if os.name == "nt":
+            with pa.OSFile(handle.path, "rb") as source:
+                table = pa.ipc.open_file(source.read_buffer()).read_all()
+        else:
+            table = pa.ipc.open_file(pa.memory_map(handle.path, "r")).read_all()
+        return table.to_pandas(split_blocks=True)
+    finally:
+        try:
+            os.remove(handle.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Arquivo de frame não removido ({handle.path}): {e}")
+
+
+def publish_outputs(result: Any) -> Any:
+    """Publica os DataFrames do resultado (direto ou em dict, lista e tupla)"""
+    if isinstance(result, pd.DataFrame):
+        return publish_frame(result)
+    if isinstance(result, dict):
+        return {key: publish_outputs(value) for key, value in result.items()}
+    if isinstance(result, (list, tuple)):
+        return type(result)(publish_outputs(value) for value in result)
+    return result
+
+
+def open_outputs(result: Any) -> Any:
+    """Troca os FrameHandle do resultado pelos DataFrames"""
+    if isinstance(result, FrameHandle):
+        return open_frame(result)
+    if isinstance(result, dict):
+        return {key: open_outputs(value) for key, value in result.items()}
+    if isinstance(result, (list, tuple)):
+        return type(result)(open_outputs(value) for value in result)
+    return result
+
+
+def run_and_publish(fn: Callable, *args, **kwargs) -> Any:
+    """Executa `fn` no processo do pool e publica os DataFrames do resultado"""
+    return publish_outputs(fn(*args, **kwargs))
+
+
+def sweep_handoff_dir(base_dir: Path = None) -> int:
+    """Remove arquivos de workers interrompidos antes da entrega (na partida da API)"""
+    if base_dir is None:
+        from config.settings import get_settings
+        base_dir = resolve_handoff_dir(get_settings().frame_handoff_dir)
+    base_dir = Path(base_dir)
+    if not base_dir.exists():
+        return 0
+    removed = 0
+    for path in list(base_dir.glob("*.arrow")) + list(base_dir.glob("*.tmp")):
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"🧹 {removed} frames Arrow órfãos removidos de {base_dir}")
+    return removed
@@ -0,0 +1,38 @@
+"""
+Importação adiada de bibliotecas pesadas (pandas, numpy)
+
+`pd = lazy_module("pandas")` devolve um substituto que importa o módulo no
+primeiro acesso a um atributo. Assim `conectaboi_etl_smart.py --help`, os
+scripts gerados e a construção do ETL não pagam os ~0,4 s de import do
+pandas/numpy até que um DataFrame seja de fato necessário. Se o módulo já
+estiver importado, o próprio módulo é devolvido.
+
+Os módulos que usam o substituto declaram `from __future__ import annotations`
+para que anotações como `pd.DataFrame` não disparem o import.
+"""
+
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Módulo importado no primeiro acesso; os atributos lidos ficam no próprio substituto"""
+
+    def __getattr__(self, attr: str):
+        # importlib.import_module é thread-safe (lock de import por módulo)
+        module = importlib.import_module(self.__name__)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """Módulo `name` com import adiado até o primeiro uso"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
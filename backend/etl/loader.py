@@ -0,0 +1,827 @@
+"""
+Motor de carregamento em batches: envio concorrente, retry com backoff e progresso ordenado
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from etl.lazy_imports import lazy_module
+from etl.serializer import encode_rows_json
+from etl.supabase_client import get_http_client
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP que indicam falha passageira (vale tentar de novo)
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# Status que indicam payload grande demais para o gateway
+PAYLOAD_TOO_LARGE_STATUS_CODES = {413}
+_TRANSIENT_MESSAGES = (
+    'timeout', 'timed out', 'connection reset', 'connection aborted', 'connection refused',
+    'temporarily unavailable', 'too many requests', 'bad gateway', 'service unavailable',
+    'gateway timeout', 'server disconnected', 'remoteprotocolerror',
+    'server closed the connection', 'could not connect', 'connection is closed'
+)
+# Timeouts que indicam batch lento demais (httpx/urllib3/psycopg); conexão e pool não
+_SLOW_BATCH_TIMEOUT_NAMES = ('readtimeout', 'writetimeout', 'readtimeouterror')
+_SLOW_BATCH_TIMEOUT_MESSAGES = (
+    'read timed out', 'write timed out', 'read operation timed out', 'write operation timed out',
+    'statement timeout'
+)
+# SQLSTATE passageiros: classes 08 (conexão), 40 (rollback: serialização, deadlock),
+# 53 (recursos), 57P (desligamento do servidor) e 57014 (statement timeout)
+TRANSIENT_SQLSTATE_PREFIXES = ('08', '40', '53', '57P', '57014')
+SQLSTATE_STATEMENT_TIMEOUT = '57014'
+
+# Modos de carregamento
+LOAD_MODE_INSERT = "insert"
+LOAD_MODE_UPSERT = "upsert"
+
+# Chaves naturais das tabelas de staging (usadas no modo upsert);
+# settings.natural_keys sobrescreve ou acrescenta tabelas
+DEFAULT_NATURAL_KEYS: Dict[str, List[str]] = {
+    'etl_staging_01_historico_consumo': ['data', 'id_curral'],
+    'etl_staging_02_desvio_carregamento': ['data', 'hora_carregamento', 'carregamento', 'ingrediente'],
+    'etl_staging_03_desvio_distribuicao': ['data', 'hora', 'trato', 'curral']
+}
+
+# Marcador de nulo usado no COPY (CSV distingue "" de NULL por ele)
+COPY_NULL = '\\N'
+
+
+
+class BatchLoadError(Exception):
+    """Falha ao enviar um batch (status HTTP opcional para decidir o retry)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """Extrai o status HTTP de exceções do httpx/BatchLoadError, se houver"""
+    for attribute in ('status_code', 'status'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'status_code', None)
+    return value if isinstance(value, int) else None
+
+
+def error_sqlstate(error: BaseException) -> Optional[str]:
+    """
+    SQLSTATE do Postgres, se houver: `sqlstate` (psycopg), `pgcode` (psycopg2)
+    ou `code` do APIError do postgrest (que é SQLSTATE, não status HTTP)
+    """
+    for attribute in ('sqlstate', 'pgcode', 'code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, str) and len(value) == 5 and value.isalnum():
+            return value.upper()
+    return None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Erros de rede, timeouts, 429, 5xx e SQLSTATE de conexão/concorrência são passageiros; violações de dados não"""
+    sqlstate = error_sqlstate(error)
+    if sqlstate is not None:
+        return sqlstate.startswith(TRANSIENT_SQLSTATE_PREFIXES)
+
+    status_code = error_status_code(error)
+    if status_code is not None:
+        return status_code in TRANSIENT_STATUS_CODES
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    name = type(error).__name__.lower()
+    if 'timeout' in name or 'connect' in name or 'network' in name:
+        return True
+
+    message = str(error).lower()
+    return any(fragment in message for fragment in _TRANSIENT_MESSAGES)
+
+
+def is_timeout_error(error: BaseException) -> bool:
+    """
+    Batch lento demais: timeout de leitura/escrita, statement timeout do Postgres ou status 408/504
+
+    Timeouts de conexão e de pool não contam: o servidor está inacessível e
+    dividir o batch só multiplicaria as tentativas (ficam no retry normal).
+    """
+    if error_status_code(error) in (408, 504) or error_sqlstate(error) == SQLSTATE_STATEMENT_TIMEOUT:
+        return True
+    name = type(error).__name__.lower()
+    if 'connect' in name or 'pool' in name:
+        return False
+    if name in _SLOW_BATCH_TIMEOUT_NAMES:
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in _SLOW_BATCH_TIMEOUT_MESSAGES)
+
+
+def is_payload_too_large(error: BaseException) -> bool:
+    """413 ou mensagem equivalente do gateway"""
+    if error_status_code(error) in PAYLOAD_TOO_LARGE_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return 'payload too large' in message or 'request entity too large' in message
+
+
+Rows = Union["pd.DataFrame", Sequence[Dict[str, Any]]]
+
+
+def frame_to_records(batch_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Converte o batch em lista de dicionários com NaN/NaT como None"""
+    return batch_df.astype(object).where(batch_df.notna(), None).to_dict('records')
+
+
+def slice_rows(data: Rows, start: int, end: int) -> Rows:
+    """Fatia DataFrame (iloc) ou lista de registros"""
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:end]
+    return data[start:end]
+
+
+def estimate_row_bytes(data: Rows, sample_size: int = 200) -> float:
+    """Tamanho médio de uma linha em JSON, estimado por amostra espaçada"""
+    total_rows = len(data)
+    if total_rows == 0:
+        return 1.0
+
+    step = max(1, total_rows // sample_size)
+    if isinstance(data, pd.DataFrame):
+        sample = data.iloc[::step].head(sample_size)
+    else:
+        sample = list(data[::step][:sample_size])
+
+    return max(1.0, len(encode_rows_json(sample)) / max(1, len(sample)))
+
+
+class AdaptiveBatchSizer:
+    """
+    Tamanho de batch em bytes de payload, ajustado por AIMD
+
+    - Aumento aditivo (`increase_bytes`) quando o batch volta abaixo da
+      latência alvo
+    - Redução multiplicativa quando a latência passa do alvo, e redução mais
+      forte em 413 ou timeout
+    - O número de linhas de cada batch sai de target_bytes / bytes por linha
+    """
+
+    def __init__(self, target_bytes: int = None, min_bytes: int = None, max_bytes: int = None,
+                 target_latency_seconds: float = None, increase_bytes: int = None,
+                 max_rows: int = None, decrease_factor: float = 0.75, overload_factor: float = 0.5):
+        if None in (target_bytes, min_bytes, max_bytes, target_latency_seconds, increase_bytes, max_rows):
+            from config.settings import get_settings
+            settings = get_settings()
+            target_bytes = settings.loader_target_batch_bytes if target_bytes is None else target_bytes
+            min_bytes = settings.loader_min_batch_bytes if min_bytes is None else min_bytes
+            max_bytes = settings.loader_max_batch_bytes if max_bytes is None else max_bytes
+            if target_latency_seconds is None:
+                target_latency_seconds = settings.loader_target_latency_seconds
+            increase_bytes = settings.loader_batch_increase_bytes if increase_bytes is None else increase_bytes
+            max_rows = settings.loader_max_batch_rows if max_rows is None else max_rows
+
+        self.min_bytes = max(1, int(min_bytes))
+        self.max_bytes = max(self.min_bytes, int(max_bytes))
+        self.target_bytes = float(min(max(target_bytes, self.min_bytes), self.max_bytes))
+        self.target_latency_seconds = target_latency_seconds
+        self.increase_bytes = increase_bytes
+        self.max_rows = max(1, int(max_rows))
+        self.decrease_factor = decrease_factor
+        self.overload_factor = overload_factor
+        self.bytes_per_row = 1.0
+        self._lock = threading.Lock()
+        self._increases = 0
+        self._decreases = 0
+        self._overloads = 0
+
+    def calibrate(self, data: Rows):
+        """Mede o tamanho médio das linhas do conjunto que será carregado"""
+        with self._lock:
+            self.bytes_per_row = estimate_row_bytes(data)
+
+    def next_rows(self) -> int:
+        """Linhas do próximo batch para caber no payload alvo"""
+        with self._lock:
+            return int(min(self.max_rows, max(1, self.target_bytes // self.bytes_per_row)))
+
+    def on_success(self, rows: int, latency_seconds: float):
+        """Batch aceito: cresce se rápido, encolhe se lento"""
+        with self._lock:
+            if latency_seconds <= self.target_latency_seconds:
+                self.target_bytes = min(self.max_bytes, self.target_bytes + self.increase_bytes)
+                self._increases += 1
+            else:
+                self.target_bytes = max(self.min_bytes, self.target_bytes * self.decrease_factor)
+                self._decreases += 1
+
+    def on_overload(self):
+        """413 ou timeout: corta o payload alvo"""
+        with self._lock:
+            self.target_bytes = max(self.min_bytes, self.target_bytes * self.overload_factor)
+            self._overloads += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "target_bytes": int(self.target_bytes),
+                "bytes_per_row": round(self.bytes_per_row, 1),
+                "rows_per_batch": int(min(self.max_rows, max(1, self.target_bytes // self.bytes_per_row))),
+                "increases": self._increases,
+                "decreases": self._decreases,
+                "overloads": self._overloads
+            }
+
+
+class SupabaseRestBackend:
+    """
+    Backend de carregamento via PostgREST
+
+    Com URL e chave do Supabase, o batch vira bytes pelo encoder colunar e é
+    enviado direto por HTTP (sem um dict por linha); sem elas, usa o cliente
+    supabase (table(...).insert/upsert).
+    """
+
+    name = "rest"
+
+    def __init__(self, client=None, load_mode: str = LOAD_MODE_INSERT, conflict_columns: List[str] = None,
+                 rest_url: str = None, api_key: str = None, http_client=None, timeout: float = 60.0):
+        self.client = client
+        self.load_mode = load_mode
+        self.conflict_columns = conflict_columns or []
+        self.rest_url = rest_url.rstrip('/') if rest_url else None
+        self.api_key = api_key
+        self.timeout = timeout
+        self._http = http_client
+        self._owns_http = False
+        self._http_lock = threading.Lock()
+
+    def _http_client(self):
+        if self._http is None:
+            with self._http_lock:
+                if self._http is None:
+                    import httpx
+                    self._http = httpx.Client(timeout=self.timeout)
+                    self._owns_http = True
+        return self._http
+
+    def send(self, table: str, batch: Rows) -> int:
+        """Insere (ou faz upsert pela chave natural) o batch e devolve o número de linhas gravadas"""
+        if self.rest_url and self.api_key:
+            return self._post(table, batch)
+
+        batch_data = frame_to_records(batch) if isinstance(batch, pd.DataFrame) else list(batch)
+        if self.load_mode == LOAD_MODE_UPSERT:
+            result = self.client.table(table).upsert(
+                batch_data, on_conflict=','.join(self.conflict_columns)
+            ).execute()
+        else:
+            result = self.client.table(table).insert(batch_data).execute()
+        if not result.data:
+            raise BatchLoadError("Resposta vazia do Supabase")
+        return len(result.data)
+
+    def _post(self, table: str, batch: Rows) -> int:
+        payload = encode_rows_json(batch)
+        headers = {
+            "apikey": self.api_key,
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Prefer": "return=minimal"
+        }
+        params = {}
+        if self.load_mode == LOAD_MODE_UPSERT:
+            headers["Prefer"] = "return=minimal,resolution=merge-duplicates"
+            params["on_conflict"] = ','.join(self.conflict_columns)
+
+        response = self._http_client().post(
+            f"{self.rest_url}/rest/v1/{table}", content=payload, headers=headers, params=params
+        )
+        if response.status_code >= 300:
+            raise BatchLoadError(f"HTTP {response.status_code}: {response.text[:500]}",
+                                 status_code=response.status_code)
+        return len(batch)
+
+    def close(self):
+        """Fecha o cliente HTTP criado pelo backend"""
+        if self._owns_http and self._http is not None:
+            self._http.close()
+            self._http = None
+            self._owns_http = False
+
+
+def natural_key_for(table: str) -> Optional[List[str]]:
+    """Colunas da chave natural da tabela (None se não configurada)"""
+    from config.settings import get_settings
+    configured = get_settings().natural_keys.get(table)
+    key = configured if configured else DEFAULT_NATURAL_KEYS.get(table)
+    return list(key) if key else None
+
+
+def resolve_load_mode(load_mode: str = None) -> str:
+    """Modo pedido explicitamente ou o padrão das configurações"""
+    if not load_mode:
+        from config.settings import get_settings
+        load_mode = get_settings().loader_load_mode
+    load_mode = load_mode.lower()
+    if load_mode not in (LOAD_MODE_INSERT, LOAD_MODE_UPSERT):
+        raise ValueError(f"Modo de carregamento desconhecido: {load_mode}")
+    return load_mode
+
+
+def deduplicate_rows(data: Rows, key_columns: List[str]):
+    """
+    Remove linhas repetidas na chave natural, mantendo a última ocorrência
+
+    Returns:
+        Tupla (dados sem duplicatas, quantidade removida)
+    """
+    if isinstance(data, pd.DataFrame):
+        missing = [column for column in key_columns if column not in data.columns]
+        if missing:
+            raise ValueError(f"Colunas da chave natural ausentes nos dados: {missing}")
+        deduplicated = data.drop_duplicates(subset=key_columns, keep='last')
+        return deduplicated, len(data) - len(deduplicated)
+
+    latest: Dict[tuple, Dict[str, Any]] = {}
+    for record in data:
+        missing = [column for column in key_columns if column not in record]
+        if missing:
+            raise ValueError(f"Colunas da chave natural ausentes nos dados: {missing}")
+        key = tuple(record[column] for column in key_columns)
+        latest.pop(key, None)
+        latest[key] = record
+    deduplicated = list(latest.values())
+    return deduplicated, len(data) - len(deduplicated)
+
+
+def quote_identifier(name: str) -> str:
+    """Identificador SQL entre aspas (aceita schema.tabela)"""
+    return '.'.join('"' + part.replace('"', '""') + '"' for part in str(name).split('.'))
+
+
+def frame_to_copy_csv(batch_df: pd.DataFrame) -> str:
+    """
+    Serializa o batch em CSV para COPY
+
+    Colunas float com valores inteiros (inteiros com nulos no pandas) voltam
+    a ser escritas sem casas decimais, senão o COPY rejeita em colunas INTEGER.
+    """
+    frame = batch_df
+    for column in batch_df.columns:
+        series = batch_df[column]
+        if pd.api.types.is_float_dtype(series):
+            non_null = series.dropna()
+            if len(non_null) and (non_null % 1 == 0).all():
+                if frame is batch_df:
+                    frame = batch_df.copy()
+                frame[column] = series.astype('Int64')
+    return frame.to_csv(index=False, header=False, na_rep=COPY_NULL)
+
+
+def default_connection_factory(dsn: str) -> Callable[[], Any]:
+    """Conexões diretas ao Postgres via psycopg (3) ou psycopg2, o que estiver instalado"""
+    try:
+        import psycopg
+        return lambda: psycopg.connect(dsn)
+    except ImportError:
+        pass
+    try:
+        import psycopg2
+        return lambda: psycopg2.connect(dsn)
+    except ImportError:
+        raise ImportError("Backend COPY requer psycopg ou psycopg2 instalado")
+
+
+class PostgresCopyBackend:
+    """
+    Backend de carregamento via COPY FROM STDIN (CSV) em conexão direta
+
+    Cada thread do BatchLoader usa a sua conexão; cada batch é um COPY numa
+    transação própria (commit no sucesso, rollback no erro). No modo upsert o
+    COPY vai para uma tabela temporária e segue com INSERT ... ON CONFLICT.
+    """
+
+    name = "copy"
+
+    def __init__(self, dsn: str = None, connection_factory: Callable[[], Any] = None,
+                 load_mode: str = LOAD_MODE_INSERT, conflict_columns: List[str] = None):
+        self.load_mode = load_mode
+        self.conflict_columns = conflict_columns or []
+        self._factory = connection_factory or default_connection_factory(dsn)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(connection, 'closed', False):
+            connection = self._factory()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def copy_statement(self, table: str, columns: List[str]) -> str:
+        column_list = ', '.join(quote_identifier(column) for column in columns)
+        return (f"COPY {quote_identifier(table)} ({column_list}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')")
+
+    def upsert_statements(self, table: str, staging_table: str, columns: List[str]) -> List[str]:
+        """Tabela temporária + INSERT ... ON CONFLICT na chave natural"""
+        column_list = ', '.join(quote_identifier(column) for column in columns)
+        conflict_list = ', '.join(quote_identifier(column) for column in self.conflict_columns)
+        updates = [f"{quote_identifier(column)} = EXCLUDED.{quote_identifier(column)}"
+                   for column in columns if column not in self.conflict_columns]
+        action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+        return [
+            f"CREATE TEMP TABLE {quote_identifier(staging_table)} "
+            f"(LIKE {quote_identifier(table)} INCLUDING DEFAULTS) ON COMMIT DROP",
+            f"INSERT INTO {quote_identifier(table)} ({column_list}) "
+            f"SELECT {column_list} FROM {quote_identifier(staging_table)} "
+            f"ON CONFLICT ({conflict_list}) {action}"
+        ]
+
+    def _copy(self, cursor, statement: str, payload: str):
+        if hasattr(cursor, 'copy'):
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(payload)
+        else:
+            # psycopg2
+            cursor.copy_expert(statement, io.StringIO(payload))
+
+    def send(self, table: str, batch: Rows) -> int:
+        """Executa o COPY do batch e devolve o número de linhas gravadas"""
+        frame = batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(list(batch))
+        columns = [str(column) for column in frame.columns]
+        payload = frame_to_copy_csv(frame)
+
+        connection = self._connection()
+        try:
+            with connection.cursor() as cursor:
+                if self.load_mode == LOAD_MODE_UPSERT:
+                    staging_table = f"_etl_upsert_{threading.get_ident()}"
+                    create_statement, merge_statement = self.upsert_statements(table, staging_table, columns)
+                    cursor.execute(create_statement)
+                    self._copy(cursor, self.copy_statement(staging_table, columns), payload)
+                    cursor.execute(merge_statement)
+                else:
+                    self._copy(cursor, self.copy_statement(table, columns), payload)
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                self._local.connection = None
+            raise
+        return len(frame)
+
+    def close(self):
+        """Fecha as conexões abertas pelas threads do loader"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+def resolve_backend_name(table: str, backend: str = None) -> str:
+    """Backend pedido explicitamente, ou o configurado para a tabela, ou o padrão"""
+    if backend:
+        return backend.lower()
+    from config.settings import get_settings
+    settings = get_settings()
+    return (settings.loader_table_backends.get(table) or settings.loader_backend).lower()
+
+
+def create_load_backend(table: str, supabase_client=None, backend: str = None,
+                        load_mode: str = LOAD_MODE_INSERT, conflict_columns: List[str] = None):
+    """
+    Cria o backend de carregamento para a tabela ("rest" ou "copy")
+
+    "copy" sem DATABASE_URL ou sem driver instalado cai para REST com aviso.
+    No modo upsert, conflict_columns é a chave natural da tabela.
+    """
+    from config.settings import get_settings
+    settings = get_settings()
+    name = resolve_backend_name(table, backend)
+    if load_mode == LOAD_MODE_UPSERT and not conflict_columns:
+        raise ValueError(f"Upsert em {table} requer chave natural configurada (settings.natural_keys)")
+
+    if name == PostgresCopyBackend.name:
+        database_url = settings.database_url
+        if not database_url:
+            logger.warning(f"⚠️ COPY solicitado para {table} sem DATABASE_URL; usando REST")
+        else:
+            try:
+                return PostgresCopyBackend(database_url, load_mode=load_mode, conflict_columns=conflict_columns)
+            except ImportError as e:
+                logger.warning(f"⚠️ {e}; usando REST para {table}")
+    elif name != SupabaseRestBackend.name:
+        raise ValueError(f"Backend de carregamento desconhecido: {name}")
+
+    rest_url, api_key = settings.supabase_url, settings.supabase_service_role_key
+    if supabase_client is None and not (rest_url and api_key):
+        raise BatchLoadError("Conexão com Supabase não disponível")
+    return SupabaseRestBackend(
+        supabase_client, load_mode=load_mode, conflict_columns=conflict_columns,
+        rest_url=rest_url or None, api_key=api_key or None,
+        http_client=get_http_client() if rest_url and api_key else None,
+        timeout=settings.loader_request_timeout_seconds
+    )
+
+
+class BatchLoader:
+    """
+    Envia batches de um DataFrame (ou lista de registros) em paralelo
+
+    - Até `workers` batches em voo ao mesmo tempo (janela limitada, o
+      DataFrame não é convertido inteiro de uma vez)
+    - Sem batch_size fixo, o tamanho é decidido pelo AdaptiveBatchSizer; em
+      413/timeout o batch é dividido ao meio e reenviado
+    - Erros passageiros são repetidos até `max_retries` vezes com backoff
+      exponencial e jitter completo
+    - Erros de dados dividem o batch ao meio recursivamente até isolar as
+      linhas problemáticas (O(log n) envios extras por linha ruim); as boas
+      são carregadas e as isoladas vão para a lista de rejeitadas, até
+      `max_rejects` por carga (depois disso o batch falha inteiro)
+    - O callback de progresso é chamado na ordem dos batches, mesmo que as
+      respostas cheguem fora de ordem
+    """
+
+    def __init__(self, backend, workers: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 jitter: Callable[[], float] = random.random,
+                 sizer: Optional[AdaptiveBatchSizer] = None, max_rejects: int = None):
+        if None in (workers, max_retries, backoff_base, backoff_max, max_rejects):
+            from config.settings import get_settings
+            settings = get_settings()
+            workers = settings.loader_workers if workers is None else workers
+            max_retries = settings.max_retries if max_retries is None else max_retries
+            backoff_base = settings.loader_backoff_base_seconds if backoff_base is None else backoff_base
+            backoff_max = settings.loader_backoff_max_seconds if backoff_max is None else backoff_max
+            max_rejects = settings.loader_max_rejects if max_rejects is None else max_rejects
+
+        self.backend = backend
+        self.workers = max(1, int(workers))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._jitter = jitter
+        self.sizer = sizer
+        self.max_rejects = max(0, int(max_rejects))
+        self._retry_lock = threading.Lock()
+        self._retries = 0
+        self._splits = 0
+        self._bisections = 0
+        self._rejected = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Atraso antes da tentativa `attempt` (1, 2, ...): jitter completo sobre 2^n"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return self._jitter() * ceiling
+
+    def _send_with_retry(self, table: str, batch_number: int, batch: Rows,
+                         sizer: Optional[AdaptiveBatchSizer] = None, offset: int = 0) -> Dict[str, Any]:
+        rows = len(batch)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                loaded = self.backend.send(table, batch)
+                latency = time.perf_counter() - started
+                if sizer:
+                    sizer.on_success(rows, latency)
+                return {
+                    "batch": batch_number,
+                    "rows": rows,
+                    "loaded": loaded,
+                    "attempts": attempt + 1,
+                    "latency_seconds": latency,
+                    "error": None,
+                    "rejects": [],
+                    "unsent": []
+                }
+            except Exception as error:
+                latency = time.perf_counter() - started
+
+                # Payload grande demais (ou lento demais): reduz e divide ao meio
+                overloaded = is_payload_too_large(error) or (sizer is not None and is_timeout_error(error))
+                if overloaded and sizer:
+                    sizer.on_overload()
+                if overloaded and rows > 1:
+                    with self._retry_lock:
+                        self._splits += 1
+                    logger.warning(f"✂️ Batch {batch_number}: {error}; dividindo {rows} linhas em duas partes")
+                    return self._split(table, batch_number, batch, sizer, offset)
+
+                transient = is_transient_error(error)
+                if not transient and rows > 1 and self._can_bisect():
+                    with self._retry_lock:
+                        self._bisections += 1
+                    logger.warning(f"🔎 Batch {batch_number}: {error}; dividindo {rows} linhas para isolar as rejeitadas")
+                    return self._split(table, batch_number, batch, sizer, offset)
+
+                if not transient or attempt >= self.max_retries:
+                    # Erro de dados: linhas rejeitadas. Passageiro sem mais tentativas (rede, banco
+                    # fora do ar): nada a corrigir nos dados, as linhas ficam "não enviadas" para a retomada
+                    if not transient:
+                        with self._retry_lock:
+                            self._rejected += rows
+                    positions = [offset + position for position in range(rows)]
+                    return {
+                        "batch": batch_number,
+                        "rows": rows,
+                        "loaded": 0,
+                        "attempts": attempt + 1,
+                        "latency_seconds": latency,
+                        "error": str(error),
+                        "transient": transient,
+                        "rejects": [] if transient else [{"row": position, "error": str(error)}
+                                                         for position in positions],
+                        "unsent": positions if transient else []
+                    }
+
+                attempt += 1
+                with self._retry_lock:
+                    self._retries += 1
+                delay = self.backoff_delay(attempt)
+                logger.warning(f"🔁 Batch {batch_number}: erro passageiro ({error}); "
+                               f"tentativa {attempt}/{self.max_retries} em {delay:.2f}s")
+                self._sleep(delay)
+
+    def _run_batch(self, table: str, batch_number: int, batch: Rows,
+                   sizer: Optional[AdaptiveBatchSizer], offset: int, checkpoint=None) -> Dict[str, Any]:
+        result = self._send_with_retry(table, batch_number, batch, sizer, offset)
+        if checkpoint:
+            try:
+                checkpoint.batch_finished(result)
+            except Exception as error:
+                logger.error(f"❌ Batch {batch_number}: checkpoint não gravado ({error})")
+        return result
+
+    def _can_bisect(self) -> bool:
+        with self._retry_lock:
+            return self._rejected < self.max_rejects
+
+    def _split(self, table: str, batch_number: int, batch: Rows,
+               sizer: Optional[AdaptiveBatchSizer], offset: int) -> Dict[str, Any]:
+        """Envia as duas metades do batch em sequência e junta os resultados"""
+        middle = len(batch) // 2
+        return self._merge_results(batch_number, [
+            self._send_with_retry(table, batch_number, slice_rows(batch, 0, middle), sizer, offset),
+            self._send_with_retry(table, batch_number, slice_rows(batch, middle, len(batch)), sizer, offset + middle)
+        ])
+
+    def _merge_results(self, batch_number: int, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        errors = list(dict.fromkeys(part["error"] for part in parts if part["error"]))
+        error = None
+        if errors:
+            error = "; ".join(errors[:3]) + (f" (+{len(errors) - 3} erros)" if len(errors) > 3 else "")
+        return {
+            "batch": batch_number,
+            "rows": sum(part["rows"] for part in parts),
+            "loaded": sum(part["loaded"] for part in parts),
+            "attempts": sum(part["attempts"] for part in parts),
+            "latency_seconds": sum(part["latency_seconds"] for part in parts),
+            "error": error,
+            "rejects": [reject for part in parts for reject in part["rejects"]],
+            "unsent": [position for part in parts for position in part["unsent"]]
+        }
+
+    def load(self, table: str, data: Rows, batch_size: Optional[int] = None,
+             progress_callback: Callable[[Dict[str, Any]], None] = None,
+             row_numbers: Sequence[int] = None, checkpoint=None,
+             cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Carrega o DataFrame (ou lista de registros) na tabela
+
+        Args:
+            table: Tabela de destino
+            data: Dados já transformados
+            batch_size: Linhas por batch; None = tamanho adaptativo por bytes de payload
+            progress_callback: Recebe o resultado de cada batch, na ordem dos batches
+            row_numbers: Número da linha de origem de cada registro (padrão: posição, a partir de 1)
+            checkpoint: Recebe batch_started(batch, início, fim, dados) antes de cada envio e
+                batch_finished(resultado) assim que o batch termina (ver etl.checkpoint)
+            cancel_event: Quando sinalizado, nenhum batch novo é enviado; os que já estão
+                em andamento terminam e o resumo sai com cancelled=True
+
+        Returns:
+            Resumo com linhas carregadas/falhas, batches, retries, erros, rejeitadas e vazão
+        """
+        sizer = None
+        if batch_size is None:
+            sizer = self.sizer or AdaptiveBatchSizer()
+            sizer.calibrate(data)
+        else:
+            batch_size = max(1, int(batch_size))
+
+        total_rows = len(data)
+        if row_numbers is not None and len(row_numbers) != total_rows:
+            raise ValueError(f"row_numbers tem {len(row_numbers)} itens para {total_rows} linhas")
+        self._retries = 0
+        self._splits = 0
+        self._bisections = 0
+        self._rejected = 0
+        started = time.perf_counter()
+        results: Dict[int, Dict[str, Any]] = {}
+        next_to_report = 1
+        loaded_rows = 0
+        failed_rows = 0
+        errors = []
+        rejects = []
+        unsent = []
+
+        def report_ready():
+            nonlocal next_to_report, loaded_rows, failed_rows
+            while next_to_report in results:
+                result = results.pop(next_to_report)
+                loaded_rows += result["loaded"]
+                failed_rows += result["rows"] - result["loaded"]
+                unsent.extend(int(row_numbers[position]) if row_numbers is not None else position + 1
+                              for position in result["unsent"])
+                if result["error"]:
+                    errors.append(f"Batch {result['batch']}: {result['error']}")
+                for reject in result["rejects"]:
+                    position = reject["row"]
+                    rejects.append({
+                        "row": int(row_numbers[position]) if row_numbers is not None else position + 1,
+                        "position": position,
+                        "batch": result["batch"],
+                        "error": reject["error"]
+                    })
+                if progress_callback:
+                    progress_callback({**result, "rows_loaded": loaded_rows, "total_rows": total_rows})
+                next_to_report += 1
+
+        batch_number = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="etl-loader") as executor:
+            pending = set()
+            start_idx = 0
+
+            while start_idx < total_rows:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.warning(f"⏹️ Carga cancelada: {total_rows - start_idx} linhas não enviadas")
+                    break
+                rows = sizer.next_rows() if sizer else batch_size
+                batch_number += 1
+                batch = slice_rows(data, start_idx, start_idx + rows)
+                if checkpoint:
+                    checkpoint.batch_started(batch_number, start_idx, start_idx + len(batch), batch)
+                pending.add(executor.submit(self._run_batch, table, batch_number, batch, sizer, start_idx, checkpoint))
+                start_idx += rows
+
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        results[result["batch"]] = result
+                    report_ready()
+
+            for future in pending:
+                result = future.result()
+                results[result["batch"]] = result
+            report_ready()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "total_rows": total_rows,
+            "rows_loaded": loaded_rows,
+            "rows_failed": failed_rows,
+            # Canceladas antes do envio + batches com erro passageiro sem mais tentativas
+            "rows_not_sent": max(0, total_rows - start_idx) + len(unsent),
+            "cancelled": start_idx < total_rows,
+            "batches_processed": batch_number,
+            "batches_failed": len(errors),
+            "retries": self._retries,
+            "splits": self._splits,
+            "bisections": self._bisections,
+            "rows_rejected": len(rejects),
+            "rejects": rejects,
+            "unsent": unsent,
+            "workers": self.workers,
+            "batch_sizing": sizer.stats() if sizer else {"rows_per_batch": batch_size},
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(loaded_rows / elapsed, 1) if elapsed > 0 else 0.0
+        }
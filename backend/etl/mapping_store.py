@@ -0,0 +1,164 @@
+"""
+Memória de mapeamentos confirmados, indexada pela assinatura dos cabeçalhos
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAPPING_STORE_PATH = Path(__file__).resolve().parents[2] / "data" / "cache" / "mapping_store.json"
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+_UNDERSCORES = re.compile(r'_+')
+
+
+@lru_cache(maxsize=4096)
+def normalize_column_name(column_name: str) -> str:
+    """
+    Normaliza nome de coluna (sem garantir unicidade): remove caracteres
+    especiais, troca espaços por underscore e converte para minúsculas
+    """
+    cleaned = _NON_WORD.sub('', column_name)
+    cleaned = _WHITESPACE.sub('_', cleaned.strip()).lower()
+    return _UNDERSCORES.sub('_', cleaned).strip('_')
+
+
+def header_signature(headers: Iterable[str]) -> str:
+    """Assinatura estável dos cabeçalhos (independente da ordem das colunas)"""
+    normalized = sorted(normalize_column_name(str(h)) for h in headers)
+    return hashlib.sha1('\x1f'.join(normalized).encode('utf-8')).hexdigest()
+
+
+class MappingStore:
+    """
+    Mapeamentos confirmados pelo usuário na Etapa 3, persistidos em JSON
+
+    - Chave exata: (assinatura dos cabeçalhos, tabela de destino)
+    - Memória por coluna e tabela: reaproveita colunas já vistas quando o
+      arquivo ganha ou perde colunas (só as novas caem na heurística)
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or DEFAULT_MAPPING_STORE_PATH)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._signatures: Dict[str, Dict[str, Any]] = {}
+        self._columns: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _entry_key(self, signature: str, target_table: str) -> str:
+        return f"{target_table}:{signature}"
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            self._signatures = payload.get("signatures", {})
+            self._columns = payload.get("columns", {})
+            logger.info(f"📚 Memória de mapeamentos carregada: {len(self._signatures)} assinaturas")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Memória de mapeamentos ilegível ({self.path}): {e}")
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"signatures": self._signatures, "columns": self._columns},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def lookup(self, headers: List[str], target_table: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna os mapeamentos já confirmados para estes cabeçalhos
+
+        Returns:
+            Dicionário {csv_column: {db_column, data_type, enabled, source}} apenas
+            para as colunas conhecidas; vazio se nada foi aprendido
+        """
+        with self._lock:
+            self._ensure_loaded()
+
+            entry = self._signatures.get(self._entry_key(header_signature(headers), target_table))
+            if entry:
+                known = entry["mappings"]
+                source = "learned_signature"
+            else:
+                known = self._columns.get(target_table, {})
+                source = "learned_column"
+
+            learned = {}
+            for header in headers:
+                mapping = known.get(normalize_column_name(str(header)))
+                if mapping:
+                    learned[header] = {**mapping, "source": source}
+            return learned
+
+    def known_headers(self) -> List[Tuple[str, List[str]]]:
+        """Pares (tabela de destino, cabeçalhos) de todas as assinaturas confirmadas"""
+        with self._lock:
+            self._ensure_loaded()
+            return [(entry["target_table"], list(entry["headers"])) for entry in self._signatures.values()]
+
+    def record(self, headers: List[str], target_table: str, column_mapping: List[Dict[str, Any]]):
+        """Grava o mapeamento confirmado para a assinatura dos cabeçalhos"""
+        mappings = {}
+        for mapping in column_mapping:
+            csv_column = mapping.get('csv_column')
+            if not csv_column:
+                continue
+            mappings[normalize_column_name(str(csv_column))] = {
+                "db_column": mapping.get('db_column'),
+                "data_type": mapping.get('data_type', 'TEXT'),
+                "enabled": mapping.get('enabled', True)
+            }
+
+        if not mappings:
+            return
+
+        with self._lock:
+            self._ensure_loaded()
+            key = self._entry_key(header_signature(headers), target_table)
+            previous = self._signatures.get(key, {})
+            self._signatures[key] = {
+                "target_table": target_table,
+                "headers": [str(h) for h in headers],
+                "mappings": mappings,
+                "confirmed_at": datetime.now().isoformat(),
+                "uses": previous.get("uses", 0) + 1
+            }
+            self._columns.setdefault(target_table, {}).update(mappings)
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível gravar a memória de mapeamentos: {e}")
+
+        logger.info(f"🧠 Mapeamento confirmado memorizado para {target_table} ({len(mappings)} colunas)")
+
+
+# Instância global da memória de mapeamentos
+_mapping_store = None
+_mapping_store_lock = threading.Lock()
+
+
+def get_mapping_store() -> MappingStore:
+    """Retorna instância singleton da memória de mapeamentos"""
+    global _mapping_store
+    if _mapping_store is None:
+        with _mapping_store_lock:
+            if _mapping_store is None:
+                _mapping_store = MappingStore()
+    return _mapping_store
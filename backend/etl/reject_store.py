@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Armazenamento de linhas rejeitadas por execução (run), com recarga das corrigidas
+
+Cada execução da Etapa 3 grava em data/rejects/<run_id>/ as linhas que não
+chegaram ao banco (filtro de dimensão, falha de conversão de tipo ou insert
+rejeitado), com a linha de origem e o motivo. Depois de corrigidas, só essas
+linhas são recarregadas, sem reprocessar o arquivo inteiro.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+# Garante que o diretório backend esteja no path (config.*, etl.*) quando usado como CLI
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.lazy_imports import lazy_module
+from etl.loader import BatchLoader, create_load_backend, deduplicate_rows, natural_key_for, resolve_load_mode
+from etl.serializer import prepare_frame
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REJECT_DIR = Path(__file__).resolve().parents[2] / "data" / "rejects"
+
+# Etapas em que uma linha pode ser rejeitada
+STAGE_DIMENSION = "dimension_filter"
+STAGE_CONVERSION = "type_conversion"
+STAGE_LOAD = "load"
+
+# Colunas de controle gravadas junto com os dados da linha
+META_COLUMNS = ['_row', '_stage', '_reason', '_corrected']
+
+_RUN_ID = re.compile(r'^[\w\-]+$')
+
+
+def parquet_available() -> bool:
+    """Parquet requer pyarrow; sem ele os rejeitados vão para CSV gzip"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def new_run_id() -> str:
+    """Identificador da execução: data/hora + sufixo aleatório"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def resolve_reject_dir(configured_dir: str = None) -> Path:
+    """Diretório dos rejeitados: o configurado ou data/rejects do projeto"""
+    return Path(configured_dir) if configured_dir else DEFAULT_REJECT_DIR
+
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Valores como texto (nulos preservados), no formato aceito pelo PostgREST"""
+    if len(df) == 0:
+        return df.astype('string')
+    prepared = prepare_frame(df).astype(object)
+    prepared = prepared.where(prepared.notna(), None)
+    return prepared.apply(lambda column: column.map(lambda value: None if value is None else str(value))).astype('string')
+
+
+def reject_frame(rows: pd.DataFrame, row_numbers: Sequence[int], stage: str,
+                 reasons: Union[str, Sequence[str]]) -> pd.DataFrame:
+    """
+    Monta o bloco de rejeitados: colunas de controle + dados da linha em texto
+
+    Args:
+        rows: Linhas rejeitadas (colunas do banco)
+        row_numbers: Linha de origem de cada uma
+        stage: Etapa da rejeição (STAGE_*)
+        reasons: Motivo único ou um por linha
+    """
+    reasons = [reasons] * len(rows) if isinstance(reasons, str) else list(reasons)
+    frame = _as_text(rows.reset_index(drop=True)) if len(rows.columns) else pd.DataFrame(index=range(len(rows)))
+    frame.insert(0, '_row', [int(number) for number in row_numbers])
+    frame.insert(1, '_stage', stage)
+    frame.insert(2, '_reason', reasons)
+    frame.insert(3, '_corrected', False)
+    return frame
+
+
+def _data_columns(frame: pd.DataFrame) -> List[str]:
+    return [column for column in frame.columns if column not in META_COLUMNS]
+
+
+class RejectStore:
+    """
+    Rejeitados por execução, em formato colunar (Parquet ou CSV gzip)
+
+    - manifest.json: tabela, modo de carga, contagens por etapa e recargas
+    - rejects.parquet / rejects.csv.gz: uma linha por rejeitada
+    """
+
+    def __init__(self, base_dir: Path = None):
+        self.base_dir = Path(base_dir or DEFAULT_REJECT_DIR)
+        self._lock = threading.RLock()
+        self._run_locks: Dict[str, threading.Lock] = {}
+
+    def _run_dir(self, run_id: str) -> Path:
+        if not run_id or not _RUN_ID.match(run_id):
+            raise KeyError(f"Execução inválida: {run_id}")
+        return self.base_dir / run_id
+
+    def _run_lock(self, run_id: str) -> threading.Lock:
+        with self._lock:
+            return self._run_locks.setdefault(run_id, threading.Lock())
+
+    def _write_manifest(self, run_dir: Path, manifest: Dict[str, Any]):
+        temp_path = run_dir / "manifest.json.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, run_dir / "manifest.json")
+
+    def _write_frame(self, run_dir: Path, frame: pd.DataFrame) -> str:
+        if parquet_available():
+            file_name = "rejects.parquet"
+            temp_path = run_dir / (file_name + ".tmp")
+            frame.to_parquet(temp_path, index=False)
+        else:
+            file_name = "rejects.csv.gz"
+            temp_path = run_dir / (file_name + ".tmp")
+            frame.to_csv(temp_path, index=False, compression='gzip')
+        os.replace(temp_path, run_dir / file_name)
+        return file_name
+
+    def _counts(self, frame: pd.DataFrame) -> Dict[str, int]:
+        return {str(stage): int(count) for stage, count in frame['_stage'].value_counts().items()}
+
+    def save(self, run_id: str, target_table: str, frames: Iterable[pd.DataFrame],
+             source_file: str = None, load_mode: str = None,
+             resent_rows: Sequence[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Grava os rejeitados da execução (None se não houver nenhum)
+
+        Args:
+            run_id: Identificador da execução (new_run_id)
+            target_table: Tabela de destino da carga
+            frames: Blocos montados com reject_frame
+            source_file: Arquivo de origem
+            load_mode: Modo de carga usado (repetido na recarga)
+            resent_rows: Na retomada, linhas de origem enviadas de novo nesta tentativa;
+                as demais rejeitadas já gravadas (com correções e recargas) são mantidas
+        """
+        frames = [frame for frame in frames if len(frame)]
+        now = datetime.now().isoformat()
+        with self._lock:
+            run_dir = self._run_dir(run_id)
+            previous = None
+            if resent_rows is not None and (run_dir / "manifest.json").exists():
+                previous = self.manifest(run_id)
+                resent = [int(row) for row in resent_rows]
+                kept = self.read(run_id)
+                kept = kept[~kept['_row'].isin(resent)]
+                frames = [kept] + [frame[frame['_row'].isin(resent)] for frame in frames]
+                frames = [frame for frame in frames if len(frame)]
+            if not frames:
+                if previous is not None:
+                    shutil.rmtree(run_dir)
+                return None
+
+            frame = pd.concat(frames, ignore_index=True).sort_values('_row', kind='stable').reset_index(drop=True)
+            run_dir.mkdir(parents=True, exist_ok=True)
+            manifest = {
+                "run_id": run_id,
+                "target_table": target_table,
+                "source_file": Path(source_file).name if source_file else None,
+                "load_mode": load_mode,
+                "created_at": previous["created_at"] if previous else now,
+                "updated_at": now,
+                "file": self._write_frame(run_dir, frame),
+                "columns": _data_columns(frame),
+                "rejected": self._counts(frame),
+                "pending": len(frame),
+                "reloads": previous["reloads"] if previous else []
+            }
+            self._write_manifest(run_dir, manifest)
+
+        logger.info(f"🗃️ {len(frame)} linhas rejeitadas gravadas (execução {run_id}): {manifest['rejected']}")
+        return manifest
+
+    def manifest(self, run_id: str) -> Dict[str, Any]:
+        """Manifesto da execução (KeyError se não existir)"""
+        path = self._run_dir(run_id) / "manifest.json"
+        if not path.exists():
+            raise KeyError(f"Execução não encontrada: {run_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """Manifestos de todas as execuções, mais recentes primeiro"""
+        if not self.base_dir.exists():
+            return []
+        manifests = []
+        for run_dir in self.base_dir.iterdir():
+            try:
+                manifests.append(self.manifest(run_dir.name))
+            except (KeyError, OSError, ValueError):
+                continue
+        return sorted(manifests, key=lambda manifest: manifest["created_at"], reverse=True)
+
+    def read(self, run_id: str) -> pd.DataFrame:
+        """Linhas rejeitadas ainda pendentes da execução"""
+        manifest = self.manifest(run_id)
+        path = self._run_dir(run_id) / manifest["file"]
+        if path.suffix == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''], compression='gzip')
+            frame = frame.astype('string')
+        if len(frame) == 0:
+            return pd.DataFrame(columns=META_COLUMNS + manifest["columns"])
+        frame['_row'] = frame['_row'].astype(int)
+        frame['_corrected'] = frame['_corrected'].astype(str).str.lower() == 'true'
+        return frame
+
+    def _rewrite(self, run_id: str, frame: pd.DataFrame, manifest: Dict[str, Any]):
+        run_dir = self._run_dir(run_id)
+        manifest["file"] = self._write_frame(run_dir, frame)
+        manifest["pending"] = len(frame)
+        manifest["updated_at"] = datetime.now().isoformat()
+        self._write_manifest(run_dir, manifest)
+
+    def apply_corrections(self, run_id: str, corrections: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Aplica valores corrigidos às rejeitadas, casando pela coluna `_row`
+
+        Só colunas de dados da execução são atualizadas; as linhas tocadas
+        ficam marcadas como corrigidas (elegíveis para recarga).
+        """
+        if '_row' not in corrections.columns:
+            raise ValueError("Arquivo de correções sem a coluna _row")
+
+        with self._lock:
+            manifest = self.manifest(run_id)
+            frame = self.read(run_id)
+            columns = [column for column in _data_columns(corrections) if column in frame.columns]
+
+            corrections = corrections.drop_duplicates(subset='_row', keep='last').copy()
+            corrections['_row'] = corrections['_row'].astype(int)
+            corrections = corrections.set_index('_row')
+
+            positions = frame.reset_index().set_index('_row')['index']
+            known = corrections.index.intersection(positions.index)
+            unknown = [int(row) for row in corrections.index.difference(positions.index)]
+
+            if len(known) and columns:
+                updates = _as_text(corrections.loc[known, columns])
+                target = positions.loc[known].values
+                for column in columns:
+                    frame.loc[target, column] = updates[column].values
+            frame.loc[positions.loc[known].values, '_corrected'] = True
+
+            self._rewrite(run_id, frame, manifest)
+
+        logger.info(f"✏️ {len(known)} rejeitadas corrigidas na execução {run_id}")
+        return {"run_id": run_id, "corrected": len(known), "unknown_rows": unknown, "columns": columns}
+
+    def reload(self, run_id: str, rows: Sequence[int] = None, only_corrected: bool = True,
+               supabase_client=None, backend=None, workers: int = None) -> Dict[str, Any]:
+        """
+        Recarrega só as rejeitadas escolhidas na tabela da execução
+
+        Args:
+            run_id: Execução
+            rows: Linhas de origem a recarregar (None = todas as elegíveis)
+            only_corrected: Só linhas marcadas como corrigidas
+            supabase_client: Cliente Supabase para o backend REST
+            backend: Backend de carregamento já criado (padrão: create_load_backend)
+            workers: Batches em paralelo
+
+        Returns:
+            Resumo com linhas recarregadas, ainda rejeitadas e pendentes
+        """
+        # Recargas da mesma execução em fila; o lock geral só cobre leitura e gravação,
+        # não o envio ao banco (as outras execuções seguem disponíveis)
+        with self._run_lock(run_id):
+            with self._lock:
+                manifest = self.manifest(run_id)
+                frame = self.read(run_id)
+
+            selected = pd.Series(True, index=frame.index)
+            if rows is not None:
+                selected &= frame['_row'].isin([int(row) for row in rows])
+            if only_corrected:
+                selected &= frame['_corrected']
+            candidates = frame[selected]
+
+            if len(candidates) == 0:
+                return {"run_id": run_id, "attempted": 0, "reloaded": 0, "still_rejected": 0, "not_sent": 0,
+                        "pending": len(frame), "rejects": []}
+
+            table = manifest["target_table"]
+            load_mode = resolve_load_mode(manifest.get("load_mode"))
+            data = candidates[_data_columns(frame)].astype(object)
+            data = data.where(data.notna(), None)
+            row_numbers = candidates['_row'].tolist()
+
+            natural_key = natural_key_for(table) if load_mode == "upsert" else None
+            if natural_key:
+                data, _ = deduplicate_rows(data, natural_key)
+                row_numbers = candidates.loc[data.index, '_row'].tolist()
+
+            own_backend = backend is None
+            if own_backend:
+                backend = create_load_backend(table, supabase_client, load_mode=load_mode,
+                                              conflict_columns=natural_key)
+            try:
+                report = BatchLoader(backend, workers=workers).load(table, data, row_numbers=row_numbers)
+            finally:
+                if own_backend and hasattr(backend, 'close'):
+                    backend.close()
+
+            # Duplicatas na chave natural saem junto com a linha que as substituiu;
+            # não enviadas (erro passageiro) continuam pendentes como estavam
+            errors = {reject["row"]: reject["error"] for reject in report["rejects"]}
+            reloaded_rows = candidates.loc[~candidates['_row'].isin(list(errors) + report["unsent"]), '_row']
+
+            # Correções gravadas durante o envio são preservadas: relê antes de aplicar o resultado
+            with self._lock:
+                manifest = self.manifest(run_id)
+                frame = self.read(run_id)
+                frame = frame[~frame['_row'].isin(reloaded_rows)]
+                failed = frame['_row'].isin(list(errors))
+                frame.loc[failed, '_stage'] = STAGE_LOAD
+                frame.loc[failed, '_reason'] = frame.loc[failed, '_row'].map(errors)
+                frame.loc[failed, '_corrected'] = False
+                frame = frame.reset_index(drop=True)
+
+                manifest["reloads"].append({
+                    "at": datetime.now().isoformat(),
+                    "attempted": len(candidates),
+                    "reloaded": len(reloaded_rows),
+                    "still_rejected": len(errors),
+                    "not_sent": len(report["unsent"])
+                })
+                self._rewrite(run_id, frame, manifest)
+
+        logger.info(f"♻️ Execução {run_id}: {len(reloaded_rows)} rejeitadas recarregadas em {table}, "
+                    f"{len(errors)} ainda com erro, {len(frame)} pendentes")
+        return {
+            "run_id": run_id,
+            "target_table": table,
+            "attempted": len(candidates),
+            "reloaded": len(reloaded_rows),
+            "still_rejected": len(errors),
+            "not_sent": len(report["unsent"]),
+            "pending": len(frame),
+            "rejects": report["rejects"]
+        }
+
+    def delete(self, run_id: str) -> bool:
+        """Remove a execução e seus rejeitados"""
+        with self._lock:
+            run_dir = self._run_dir(run_id)
+            if not run_dir.exists():
+                return False
+            shutil.rmtree(run_dir)
+            return True
+
+
+# Instância global do armazenamento de rejeitados
+_reject_store = None
+_reject_store_lock = threading.Lock()
+
+
+def get_reject_store() -> RejectStore:
+    """Retorna instância singleton do armazenamento de rejeitados"""
+    global _reject_store
+    if _reject_store is None:
+        with _reject_store_lock:
+            if _reject_store is None:
+                from config.settings import get_settings
+                _reject_store = RejectStore(resolve_reject_dir(get_settings().reject_store_dir))
+    return _reject_store
+
+
+def read_corrections(source, file_name: str = None) -> pd.DataFrame:
+    """Lê o arquivo de correções (CSV ou Parquet, caminho ou arquivo aberto) como texto"""
+    name = str(file_name or source)
+    if name.endswith('.parquet'):
+        return pd.read_parquet(source)
+    return pd.read_csv(source, dtype=str, keep_default_na=False, na_values=[''])
+
+
+def main():
+    """CLI: listar, exportar, corrigir e recarregar rejeitadas"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rejeitadas do ConectaBoi ETL')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='Lista as execuções com rejeitadas')
+
+    show = commands.add_parser('show', help='Mostra as rejeitadas de uma execução')
+    show.add_argument('run_id')
+    show.add_argument('--limit', type=int, default=20)
+
+    export = commands.add_parser('export', help='Exporta as rejeitadas para CSV (para correção)')
+    export.add_argument('run_id')
+    export.add_argument('output', help='Arquivo CSV de saída')
+
+    correct = commands.add_parser('correct', help='Aplica correções de um CSV/Parquet com a coluna _row')
+    correct.add_argument('run_id')
+    correct.add_argument('file')
+
+    reload = commands.add_parser('reload', help='Recarrega as rejeitadas corrigidas')
+    reload.add_argument('run_id')
+    reload.add_argument('--rows', help='Linhas de origem separadas por vírgula (padrão: todas as corrigidas)')
+    reload.add_argument('--all', action='store_true', help='Inclui linhas não marcadas como corrigidas')
+    reload.add_argument('--workers', type=int)
+
+    args = parser.parse_args()
+    store = get_reject_store()
+
+    if args.command == 'list':
+        for manifest in store.runs():
+            print(f"{manifest['run_id']}  {manifest['target_table']}  pendentes={manifest['pending']}  "
+                  f"{manifest['rejected']}  ({manifest.get('source_file') or '-'})")
+    elif args.command == 'show':
+        frame = store.read(args.run_id)
+        print(frame.head(args.limit).to_string(index=False))
+        print(f"\n{len(frame)} linhas pendentes")
+    elif args.command == 'export':
+        store.read(args.run_id).to_csv(args.output, index=False)
+        print(f"💾 Rejeitadas exportadas para {args.output}")
+    elif args.command == 'correct':
+        result = store.apply_corrections(args.run_id, read_corrections(args.file))
+        print(f"✏️ {result['corrected']} linhas corrigidas; linhas desconhecidas: {result['unknown_rows']}")
+    elif args.command == 'reload':
+        rows = [int(row) for row in args.rows.split(',')] if args.rows else None
+        result = store.reload(args.run_id, rows=rows, only_corrected=not args.all, workers=args.workers)
+        print(f"♻️ {result['reloaded']}/{result['attempted']} recarregadas; "
+              f"{result['still_rejected']} ainda com erro; {result['pending']} pendentes")
+        for reject in result['rejects'][:20]:
+            print(f"  linha {reject['row']}: {reject['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Cache de resultados processados no servidor, referenciados por result_id
+
+O Quick ETL guarda o DataFrame transformado (colunar, em memória) e devolve só
+o identificador; o upload para o Supabase lê daqui em vez de receber as linhas
+de volta do navegador.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from etl.lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+
+class ResultExpiredError(KeyError):
+    """Resultado inexistente, expirado ou removido por falta de espaço"""
+
+
+class ResultCache:
+    """
+    DataFrames por result_id, com TTL e limite de memória (LRU)
+
+    Entradas mais antigas (pelo último acesso) são descartadas quando a soma
+    de bytes passa de `max_bytes`; um resultado maior que o limite não é guardado.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 3600,
+                 clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _drop(self, result_id: str):
+        entry = self._entries.pop(result_id)
+        self._bytes -= entry["nbytes"]
+
+    def _expire(self, now: float):
+        expired = [result_id for result_id, entry in self._entries.items()
+                   if now - entry["last_access"] > self.ttl_seconds]
+        for result_id in expired:
+            self._drop(result_id)
+            self._evictions += 1
+
+    def put(self, df: pd.DataFrame, **metadata) -> str:
+        """Guarda o DataFrame e retorna o result_id"""
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            raise MemoryError(f"Resultado com {nbytes} bytes excede o cache ({self.max_bytes} bytes)")
+
+        result_id = uuid.uuid4().hex
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            while self._entries and self._bytes + nbytes > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._drop(evicted)
+                self._evictions += 1
+                logger.info(f"🗑️ Resultado {evicted} removido do cache (limite de memória)")
+            self._entries[result_id] = {
+                "df": df,
+                "nbytes": nbytes,
+                "created_at": now,
+                "last_access": now,
+                "metadata": metadata
+            }
+            self._bytes += nbytes
+
+        logger.info(f"📦 Resultado {result_id} em cache: {len(df)} linhas, {nbytes / 1024:.0f} KB")
+        return result_id
+
+    def get(self, result_id: str) -> pd.DataFrame:
+        """DataFrame do resultado (ResultExpiredError se não estiver mais em cache)"""
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(result_id)
+            if entry is None:
+                self._misses += 1
+                raise ResultExpiredError(f"Resultado {result_id} não encontrado ou expirado")
+            entry["last_access"] = now
+            self._entries.move_to_end(result_id)
+            self._hits += 1
+            return entry["df"]
+
+    def describe(self, result_id: str) -> Dict[str, Any]:
+        """Linhas, colunas, tamanho e metadados do resultado"""
+        df = self.get(result_id)
+        with self._lock:
+            entry = self._entries[result_id]
+            return {
+                "result_id": result_id,
+                "rows": len(df),
+                "columns": [str(column) for column in df.columns],
+                "nbytes": entry["nbytes"],
+                "age_seconds": round(self._clock() - entry["created_at"], 1),
+                **entry["metadata"]
+            }
+
+    def discard(self, result_id: str) -> bool:
+        """Remove o resultado do cache"""
+        with self._lock:
+            if result_id not in self._entries:
+                return False
+            self._drop(result_id)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+
+def select_rows(df: pd.DataFrame, excluded_positions: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Linhas do resultado sem as posições excluídas pelo usuário
+
+    O índice do DataFrame retornado é a posição da linha no resultado (a mesma
+    da lista exibida no Quick ETL), usada para reportar rejeitadas.
+    """
+    positions = np.arange(len(df))
+    if excluded_positions:
+        positions = np.setdiff1d(positions, np.asarray(excluded_positions, dtype=np.int64))
+    return df.iloc[positions].set_axis(positions, axis=0)
+
+
+def encode_cursor(result_id: str, position: int) -> str:
+    """Cursor opaco da próxima página: posição da primeira linha ainda não enviada"""
+    return base64.urlsafe_b64encode(f"{result_id}:{position}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], result_id: str) -> int:
+    """Posição do cursor (0 sem cursor); ValueError se inválido ou de outro resultado"""
+    if not cursor:
+        return 0
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        cursor_result_id, position = decoded.rsplit(':', 1)
+        position = int(position)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Cursor inválido")
+    if cursor_result_id != result_id or position < 0:
+        raise ValueError("Cursor não pertence a este resultado")
+    return position
+
+
+def page_rows(df: pd.DataFrame, result_id: str, cursor: Optional[str],
+              limit: int) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Página de `limit` linhas a partir do cursor e o cursor da seguinte (None na última)"""
+    start = decode_cursor(cursor, result_id)
+    end = min(len(df), start + max(1, limit))
+    next_cursor = encode_cursor(result_id, end) if end < len(df) else None
+    return df.iloc[start:end], next_cursor
+
+
+# Instância global do cache de resultados
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Retorna instância singleton do cache de resultados"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                from config.settings import get_settings
+                settings = get_settings()
+                _result_cache = ResultCache(settings.result_cache_max_bytes, settings.result_cache_ttl_seconds)
+    return _result_cache
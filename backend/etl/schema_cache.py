@@ -0,0 +1,147 @@
+"""
+Cache de schemas de tabelas com TTL, invalidação manual e coalescência de requisições
+"""
+
+import copy
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """Carregamento em andamento compartilhado por chamadas concorrentes"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SchemaCache:
+    """
+    Cache de schemas por tabela, compartilhado pelo processo
+
+    - Entradas expiram após `ttl_seconds`
+    - `invalidate()` descarta uma tabela ou o cache inteiro
+    - Chamadas concorrentes para a mesma tabela ausente fazem uma única
+      consulta ao Supabase; as demais aguardam e recebem o mesmo resultado
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, _InFlight] = {}
+        self._generation: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key: str, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Retorna o schema em cache ou carrega via `loader`
+
+        Args:
+            key: Nome da tabela
+            loader: Função que consulta o schema quando não há entrada válida
+
+        Returns:
+            Cópia do schema (o chamador pode alterá-la livremente)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] > time.monotonic():
+                self._stats["hits"] += 1
+                return copy.deepcopy(entry["value"])
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self._stats["misses"] += 1
+                generation = self._generation.get(key, 0)
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            value = loader()
+            flight.result = value
+            with self._lock:
+                # Não grava resultado de uma carga invalidada durante a consulta
+                if self._generation.get(key, 0) == generation:
+                    self._entries[key] = {
+                        "value": value,
+                        "expires_at": time.monotonic() + self.ttl_seconds
+                    }
+            return copy.deepcopy(value)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Grava um schema já conhecido no cache"""
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            self._entries[key] = {
+                "value": copy.deepcopy(value),
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+
+    def invalidate(self, key: str = None) -> int:
+        """
+        Descarta entradas do cache
+
+        Args:
+            key: Tabela a invalidar; se None, invalida todas
+
+        Returns:
+            Quantidade de entradas removidas
+        """
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            removed = 0
+            for k in set(keys) | (set(self._inflight) if key is None else set()):
+                self._generation[k] = self._generation.get(k, 0) + 1
+                if self._entries.pop(k, None) is not None:
+                    removed += 1
+        logger.info(f"🗑️ Cache de schema invalidado: {removed} entradas removidas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do cache"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                **self._stats,
+                "ttl_seconds": self.ttl_seconds,
+                "cached_tables": sorted(k for k, e in self._entries.items() if e["expires_at"] > now)
+            }
+
+
+# Instância global do cache
+_schema_cache = None
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema_cache() -> SchemaCache:
+    """Retorna instância singleton do cache de schemas"""
+    global _schema_cache
+    if _schema_cache is None:
+        with _schema_cache_lock:
+            if _schema_cache is None:
+                from config.settings import get_settings
+                _schema_cache = SchemaCache(ttl_seconds=get_settings().schema_cache_ttl_seconds)
+    return _schema_cache
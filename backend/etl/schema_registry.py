@@ -0,0 +1,358 @@
+"""
+Registro de schemas das tabelas de staging e dimensão
+Carregado de uma só vez a partir do documento OpenAPI raiz do PostgREST
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prefixos das tabelas que interessam ao ETL
+REGISTRY_TABLE_PREFIXES = ('etl_staging_', 'dim_')
+
+# Versão do formato do snapshot em disco (incrementar ao mudar a estrutura)
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = Path(__file__).resolve().parents[2] / "data" / "cache" / "schema_snapshot.json"
+
+
+def compute_content_hash(tables: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Hash SHA-256 canônico do conteúdo do registro"""
+    canonical = json.dumps(tables, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def resolve_snapshot_path(configured_path: str = None) -> Path:
+    """Caminho do snapshot: o configurado ou data/cache/schema_snapshot.json do projeto"""
+    return Path(configured_path) if configured_path else DEFAULT_SNAPSHOT_PATH
+
+
+def parse_openapi_schemas(document: Dict[str, Any],
+                          prefixes: tuple = REGISTRY_TABLE_PREFIXES) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extrai colunas, tipos e nulabilidade do documento OpenAPI do PostgREST
+
+    O PostgREST publica cada tabela em `definitions` (Swagger 2.0): o tipo
+    PostgreSQL real fica em `format`, as colunas NOT NULL sem default em
+    `required` e a chave primária é marcada com `<pk/>` na descrição.
+
+    Args:
+        document: Documento OpenAPI retornado por GET /rest/v1/
+        prefixes: Prefixos de tabela a considerar
+
+    Returns:
+        Dicionário {tabela: [colunas no formato de information_schema]}
+    """
+    definitions = document.get('definitions') or document.get('components', {}).get('schemas', {})
+    tables = {}
+
+    for table_name, definition in definitions.items():
+        if not table_name.startswith(prefixes):
+            continue
+
+        required = set(definition.get('required', []))
+        columns = []
+
+        for position, (column_name, prop) in enumerate(definition.get('properties', {}).items(), start=1):
+            is_primary_key = '<pk/>' in (prop.get('description') or '')
+            column = {
+                'column_name': column_name,
+                'data_type': prop.get('format') or prop.get('type') or 'text',
+                'is_nullable': 'NO' if column_name in required or is_primary_key else 'YES',
+                'ordinal_position': position
+            }
+            if prop.get('default') is not None:
+                column['column_default'] = str(prop['default'])
+            if is_primary_key:
+                column['is_primary_key'] = True
+            columns.append(column)
+
+        tables[table_name] = columns
+
+    return tables
+
+
+class SchemaRegistry:
+    """Registro em memória {tabela: colunas} compartilhado pelo processo"""
+
+    def __init__(self):
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._source: Optional[str] = None
+        self._loaded_at: Optional[str] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._last_failure: Optional[float] = None
+        self._content_hash: Optional[str] = None
+        self._warm_started = False
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self._tables)
+
+    @property
+    def source(self) -> Optional[str]:
+        return self._source
+
+    @property
+    def loaded_at(self) -> Optional[str]:
+        return self._loaded_at
+
+    @property
+    def content_hash(self) -> Optional[str]:
+        return self._content_hash
+
+    def has(self, table_name: str) -> bool:
+        return table_name in self._tables
+
+    def get_columns(self, table_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Retorna cópia das colunas da tabela, ou None se não registrada"""
+        columns = self._tables.get(table_name)
+        return [dict(col) for col in columns] if columns is not None else None
+
+    def tables(self) -> List[str]:
+        return sorted(self._tables)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Cópia de todas as tabelas registradas"""
+        with self._lock:
+            return {name: [dict(col) for col in cols] for name, cols in self._tables.items()}
+
+    def replace_all(self, tables: Dict[str, List[Dict[str, Any]]], source: str,
+                    loaded_at: str = None):
+        """Substitui o conteúdo do registro atomicamente"""
+        with self._lock:
+            self._tables = {name: [dict(col) for col in cols] for name, cols in tables.items()}
+            self._source = source
+            self._loaded_at = loaded_at or datetime.now().isoformat()
+            self._content_hash = compute_content_hash(self._tables)
+
+    def load_openapi(self, supabase_url: str, api_key: str, timeout: float = 10.0) -> int:
+        """
+        Busca o documento OpenAPI do PostgREST (uma única requisição) e
+        preenche o registro com todas as tabelas etl_staging_* e dim_*
+
+        Returns:
+            Quantidade de tabelas registradas
+        """
+        tables = self.fetch_openapi_tables(supabase_url, api_key, timeout)
+        self.replace_all(tables, source="postgrest_openapi")
+        logger.info(f"✅ Registro de schemas carregado: {len(tables)} tabelas")
+        return len(tables)
+
+    def fetch_openapi_tables(self, supabase_url: str, api_key: str,
+                             timeout: float = 10.0) -> Dict[str, List[Dict[str, Any]]]:
+        """Consulta o OpenAPI do PostgREST e retorna as tabelas sem alterar o registro"""
+        from etl.supabase_client import get_http_client
+
+        url = f"{supabase_url.rstrip('/')}/rest/v1/"
+        headers = {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Accept": "application/openapi+json"
+        }
+
+        logger.info(f"📖 Carregando schemas via OpenAPI do PostgREST: {url}")
+        response = get_http_client().get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+
+        return parse_openapi_schemas(response.json())
+
+    def save_snapshot(self, path: Path = None) -> Path:
+        """
+        Grava o registro em um snapshot JSON versionado com hash de conteúdo
+        A escrita é atômica (arquivo temporário + rename)
+        """
+        path = Path(path or DEFAULT_SNAPSHOT_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            payload = {
+                "version": SNAPSHOT_VERSION,
+                "content_hash": self._content_hash,
+                "source": self._source,
+                "loaded_at": self._loaded_at,
+                "saved_at": datetime.now().isoformat(),
+                "tables": self._tables
+            }
+
+        temp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temp_path, path)
+
+        logger.info(f"💾 Snapshot de schemas salvo: {path} ({len(payload['tables'])} tabelas)")
+        return path
+
+    def load_snapshot(self, path: Path = None) -> bool:
+        """
+        Carrega o registro a partir do snapshot em disco (sem rede)
+        Snapshots de outra versão ou com hash divergente são ignorados
+
+        Returns:
+            True se o snapshot foi carregado
+        """
+        path = Path(path or DEFAULT_SNAPSHOT_PATH)
+        if not path.exists():
+            return False
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Snapshot de schemas ilegível ({path}): {e}")
+            return False
+
+        if payload.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"⚠️ Snapshot de schemas com versão {payload.get('version')} ignorado (esperado {SNAPSHOT_VERSION})")
+            return False
+
+        tables = payload.get("tables") or {}
+        if compute_content_hash(tables) != payload.get("content_hash"):
+            logger.warning(f"⚠️ Snapshot de schemas corrompido (hash divergente): {path}")
+            return False
+
+        self.replace_all(tables, source="snapshot", loaded_at=payload.get("loaded_at"))
+        logger.info(f"⚡ Registro de schemas carregado do snapshot: {len(tables)} tabelas")
+        return True
+
+    def warm_start(self, path: Path = None) -> bool:
+        """Carrega o snapshot uma única vez por processo, se o registro estiver vazio"""
+        with self._load_lock:
+            if self._warm_started or self.is_loaded:
+                return self.is_loaded
+            self._warm_started = True
+        return self.load_snapshot(path)
+
+    def refresh(self, supabase_url: str, api_key: str, path: Path = None,
+                on_change: Callable[[], None] = None) -> bool:
+        """
+        Consulta o OpenAPI e, se o conteúdo mudou, atualiza o registro e o snapshot
+
+        Returns:
+            True se o conteúdo mudou
+        """
+        tables = self.fetch_openapi_tables(supabase_url, api_key)
+        if compute_content_hash(tables) == self._content_hash:
+            # Conteúdo igual: só passa a considerar a origem como confirmada
+            with self._lock:
+                self._source = "postgrest_openapi"
+            if not Path(path or DEFAULT_SNAPSHOT_PATH).exists():
+                self.save_snapshot(path)
+            return False
+
+        self.replace_all(tables, source="postgrest_openapi")
+        self.save_snapshot(path)
+        if on_change:
+            on_change()
+        logger.info(f"🔄 Registro de schemas atualizado em segundo plano: {len(tables)} tabelas")
+        return True
+
+    def start_background_refresh(self, supabase_url: str, api_key: str, path: Path = None,
+                                 interval_seconds: float = 3600,
+                                 on_change: Callable[[], None] = None) -> bool:
+        """
+        Inicia (uma vez por processo) a thread que atualiza o registro e o snapshot:
+        imediatamente e depois a cada `interval_seconds` (0 = apenas uma vez)
+        """
+        if not (supabase_url and api_key):
+            return False
+
+        with self._load_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+
+            def run():
+                while True:
+                    try:
+                        self.refresh(supabase_url, api_key, path, on_change)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Atualização em segundo plano dos schemas falhou: {e}")
+                    if interval_seconds <= 0 or self._refresh_stop.wait(interval_seconds):
+                        return
+
+            self._refresh_stop.clear()
+            self._refresh_thread = threading.Thread(target=run, name="schema-registry-refresh", daemon=True)
+            self._refresh_thread.start()
+            return True
+
+    def stop_background_refresh(self):
+        """Sinaliza a thread de atualização para encerrar"""
+        self._refresh_stop.set()
+
+    def ensure_loaded(self, supabase_url: str, api_key: str, retry_interval: float = 60.0,
+                      snapshot_path: Path = None) -> bool:
+        """
+        Carrega o registro via OpenAPI se ainda estiver vazio (e grava o snapshot)
+        Falhas não são repetidas antes de `retry_interval` segundos
+
+        Returns:
+            True se o registro tem tabelas carregadas
+        """
+        if self.is_loaded or not (supabase_url and api_key):
+            return self.is_loaded
+
+        with self._load_lock:
+            if self.is_loaded:
+                return True
+            if self._last_failure is not None and time.monotonic() - self._last_failure < retry_interval:
+                return False
+            try:
+                self.load_openapi(supabase_url, api_key)
+                self._last_failure = None
+                if snapshot_path is not None:
+                    self.save_snapshot(snapshot_path)
+            except Exception as e:
+                self._last_failure = time.monotonic()
+                logger.warning(f"⚠️ Não foi possível carregar schemas via OpenAPI: {e}")
+
+        return self.is_loaded
+
+
+# Instância global do registro
+_schema_registry = None
+_schema_registry_lock = threading.Lock()
+
+
+def get_schema_registry() -> SchemaRegistry:
+    """Retorna instância singleton do registro de schemas"""
+    global _schema_registry
+    if _schema_registry is None:
+        with _schema_registry_lock:
+            if _schema_registry is None:
+                _schema_registry = SchemaRegistry()
+    return _schema_registry
+
+
+def bootstrap_schema_registry(background_refresh: bool = True) -> SchemaRegistry:
+    """
+    Partida a quente do registro: carrega o snapshot em disco (sem rede) e
+    agenda a atualização em segundo plano a partir do OpenAPI do PostgREST
+    """
+    from config.settings import get_settings
+    from etl.schema_cache import get_schema_cache
+
+    settings = get_settings()
+    registry = get_schema_registry()
+    snapshot_path = resolve_snapshot_path(settings.schema_snapshot_path)
+
+    registry.warm_start(snapshot_path)
+
+    if background_refresh:
+        registry.start_background_refresh(
+            settings.supabase_url,
+            settings.supabase_service_role_key,
+            path=snapshot_path,
+            interval_seconds=settings.schema_snapshot_refresh_seconds,
+            on_change=lambda: get_schema_cache().invalidate()
+        )
+
+    return registry
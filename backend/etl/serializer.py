@@ -0,0 +1,211 @@
+"""
+Serialização JSON colunar para payloads de inserção e respostas da API
+O JSON do batch é escrito direto das colunas (encoder C do pandas), sem um dict por linha
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Sequence, Union
+
+from etl.lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Colunas de texto viram dicionário + códigos quando os distintos são até esta fração das linhas
+DICTIONARY_MAX_RATIO = 0.5
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: cai para o json da stdlib
+    orjson = None
+
+
+def _iso_or_none(value):
+    return value.isoformat() if value is not None and not pd.isna(value) else None
+
+
+def prepare_column(series: pd.Series) -> pd.Series:
+    """
+    Normaliza uma coluna para o formato aceito pelo PostgREST
+
+    - datetime: "YYYY-MM-DD" quando não há horário, senão ISO 8601
+    - float com valores inteiros: Int64 (evita "1.0" em colunas INTEGER)
+    - Decimal: float; date/time/datetime em objetos: ISO 8601
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        present = series.dropna()
+        if len(present) and (present == present.dt.normalize()).all():
+            return series.dt.strftime('%Y-%m-%d')
+        return series.dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+    if pd.api.types.is_float_dtype(series):
+        present = series.dropna()
+        if len(present) and (present % 1 == 0).all() and present.abs().max() < 2 ** 53:
+            return series.astype('Int64')
+        return series
+
+    if series.dtype == object:
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind == 'decimal':
+            return series.astype(float)
+        if kind in ('date', 'time', 'datetime'):
+            return series.map(_iso_or_none)
+        if kind not in ('string', 'empty'):
+            # mixed, mixed-integer etc.: date/datetime soltos viram ISO (o to_json usaria epoch em ms)
+            return series.map(_to_json_scalar)
+
+    return series
+
+
+def _to_json_scalar(value):
+    """Conversão valor a valor (colunas de objetos que não são só texto)"""
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return _iso_or_none(value)
+    if type(value).__name__ == 'Decimal':
+        return float(value)
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplica prepare_column só nas colunas que precisam de ajuste"""
+    prepared = None
+    for column in df.columns:
+        original = df[column]
+        converted = prepare_column(original)
+        if converted is not original:
+            if prepared is None:
+                prepared = df.copy()
+            prepared[column] = converted
+    return df if prepared is None else prepared
+
+
+def encode_frame_json(df: pd.DataFrame) -> bytes:
+    """Array JSON de registros (bytes UTF-8), nulos como null"""
+    if len(df) == 0:
+        return b'[]'
+    return prepare_frame(df).to_json(
+        orient='records', force_ascii=False, double_precision=15
+    ).encode('utf-8')
+
+
+def _json_values(series: pd.Series) -> List[Any]:
+    """Valores da coluna como lista Python, nulos como None"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def frame_to_columnar(df: pd.DataFrame, dictionary_max_ratio: float = DICTIONARY_MAX_RATIO) -> Dict[str, Any]:
+    """
+    Formato colunar: nome de cada coluna uma vez e os valores em arrays
+
+    Colunas de texto com valores repetidos (distintos <= dictionary_max_ratio
+    das linhas) vão como dicionário + códigos; código -1 = nulo:
+    {"format": "columnar", "row_count": n, "columns": [
+        {"name": "curral", "dictionary": ["A1", "B2"], "codes": [0, 1, 0, -1]},
+        {"name": "kg", "values": [10.5, 7, null, 3]}]}
+    """
+    prepared = prepare_frame(df)
+    columns = []
+    for name in prepared.columns:
+        series = prepared[name]
+        column = {"name": str(name)}
+        if len(series) and (series.dtype == object or pd.api.types.is_string_dtype(series)):
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            if len(uniques) <= len(series) * dictionary_max_ratio:
+                column["dictionary"] = _json_values(pd.Series(uniques, dtype=object))
+                column["codes"] = codes.tolist()
+                columns.append(column)
+                continue
+        column["values"] = _json_values(series)
+        columns.append(column)
+    return {"format": "columnar", "row_count": len(prepared), "columns": columns}
+
+
+def encode_frame_ndjson(df: pd.DataFrame) -> bytes:
+    """Um objeto JSON por linha (NDJSON), cada linha terminada em \\n"""
+    if len(df) == 0:
+        return b''
+    data = prepare_frame(df).to_json(
+        orient='records', lines=True, force_ascii=False, double_precision=15
+    ).encode('utf-8')
+    return data if data.endswith(b'\n') else data + b'\n'
+
+
+def iter_frame_ndjson(df: pd.DataFrame, chunk_rows: int = 5000, start: int = 0) -> Iterator[bytes]:
+    """
+    NDJSON em blocos de `chunk_rows` linhas
+
+    Cada bloco é convertido e entregue antes do próximo: a memória extra fica
+    limitada a um bloco, e o cliente recebe as primeiras linhas logo.
+    """
+    chunk_rows = max(1, chunk_rows)
+    for position in range(start, len(df), chunk_rows):
+        yield encode_frame_ndjson(df.iloc[position:position + chunk_rows])
+
+
+def _plain(value: Any) -> Any:
+    """Mesma saída do orjson em tipos que o json da stdlib aceita: NaN/inf → null, numpy → Python"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {_plain_key(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if type(value) in (datetime, date, time):
+        return value.isoformat()
+    if type(value).__module__ == 'numpy':
+        # escalares e arrays do numpy (tolist devolve tipos Python)
+        return _plain(value.tolist())
+    return value
+
+
+def _plain_key(key: Any) -> Any:
+    if key is None or isinstance(key, (str, int, float, bool)):
+        return key
+    plain = _plain(key)
+    return plain if isinstance(plain, (str, int, float, bool)) else str(key)
+
+
+def dumps(value: Any) -> bytes:
+    """JSON de objetos Python com o encoder mais rápido disponível (orjson ou json, mesma saída)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_plain(value), default=str, ensure_ascii=False, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def encode_rows_json(rows: Union[pd.DataFrame, Sequence[Dict[str, Any]]]) -> bytes:
+    """Array JSON para DataFrame (colunar) ou lista de registros"""
+    if isinstance(rows, pd.DataFrame):
+        return encode_frame_json(rows)
+    return dumps(list(rows))
+
+
+def encode_envelope(envelope: Dict[str, Any], data_key: str, df: pd.DataFrame,
+                    columnar: bool = False) -> bytes:
+    """
+    Resposta JSON com `data_key` preenchido pelo encoder colunar
+
+    Os demais campos (pequenos) vão pelo encoder de objetos. Com columnar=True,
+    `data_key` recebe o formato de frame_to_columnar em vez da lista de registros.
+    """
+    head = dumps({key: value for key, value in envelope.items() if key != data_key})
+    data = dumps(frame_to_columnar(df)) if columnar else encode_frame_json(df)
+    if head == b'{}':
+        return b'{"' + data_key.encode('utf-8') + b'":' + data + b'}'
+    return head[:-1] + b',"' + data_key.encode('utf-8') + b'":' + data + b'}'
+
@@ -0,0 +1,139 @@
+"""
+Conexões compartilhadas com o Supabase (um pool HTTP por processo da API)
+
+Um único transporte httpx com keep-alive atende o cliente supabase (postgrest),
+o carregamento REST do BatchLoader e a atualização do registro de schemas;
+o pool comporta todos os batches em voo (loader_workers por job em execução).
+O cliente supabase é criado e testado uma vez; as requisições e os jobs o
+compartilham entre threads (httpx.Client é thread-safe).
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_transport = None
+_http_client = None
+_supabase_client = None
+_supabase_ready = False
+_client_lock = threading.RLock()
+
+
+def pool_size(settings=None) -> int:
+    """Conexões do pool: supabase_pool_size ou os batches em voo de todos os jobs, com folga"""
+    if settings is None:
+        from config.settings import get_settings
+        settings = get_settings()
+    if settings.supabase_pool_size:
+        return settings.supabase_pool_size
+    return max(1, settings.loader_workers) * max(1, settings.jobs_max_workers) + 2
+
+
+def get_http_transport():
+    """Transporte httpx compartilhado (pool de conexões com keep-alive)"""
+    global _transport
+    if _transport is None:
+        with _client_lock:
+            if _transport is None:
+                import httpx
+                from config.settings import get_settings
+                settings = get_settings()
+                size = pool_size(settings)
+                _transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=size,
+                    max_keepalive_connections=size,
+                    keepalive_expiry=settings.supabase_keepalive_seconds
+                ))
+                logger.info(f"🔌 Pool HTTP do Supabase: {size} conexões, keep-alive de "
+                            f"{settings.supabase_keepalive_seconds:.0f}s")
+    return _transport
+
+
+def get_http_client():
+    """Cliente httpx sobre o pool compartilhado (carregamento REST, OpenAPI)"""
+    global _http_client
+    if _http_client is None:
+        with _client_lock:
+            if _http_client is None:
+                import httpx
+                from config.settings import get_settings
+                _http_client = httpx.Client(transport=get_http_transport(),
+                                            timeout=get_settings().loader_request_timeout_seconds)
+    return _http_client
+
+
+def _use_shared_pool(client):
+    """Troca a sessão do postgrest por uma sobre o pool compartilhado (mesma URL e headers)"""
+    import httpx
+
+    postgrest = client.postgrest
+    session = postgrest.session
+    postgrest.session = httpx.Client(base_url=session.base_url, headers=session.headers,
+                                     timeout=session.timeout, transport=get_http_transport())
+    session.close()
+
+
+def get_supabase_client():
+    """
+    Cliente supabase compartilhado (None sem credenciais ou sem a biblioteca)
+
+    A conexão é configurada e testada só na primeira chamada (no lifespan da
+    API); as seguintes devolvem o mesmo cliente.
+    """
+    global _supabase_client, _supabase_ready
+    if _supabase_ready:
+        return _supabase_client
+    with _client_lock:
+        if _supabase_ready:
+            return _supabase_client
+
+        from config.settings import get_settings
+        settings = get_settings()
+        client = None
+        if not (settings.supabase_url and settings.supabase_service_role_key):
+            logger.warning("❌ Credenciais Supabase não configuradas - usando modo simulado")
+            logger.info("💡 Configure SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY no arquivo .env")
+        else:
+            try:
+                from supabase import create_client
+                client = create_client(settings.supabase_url, settings.supabase_service_role_key)
+                logger.info("✅ Conexão REAL com Supabase estabelecida")
+                logger.info(f"🔗 URL: {settings.supabase_url}")
+            except ImportError as import_error:
+                logger.error(f"❌ Erro de importação: {import_error}")
+                logger.info("💡 Execute: pip install supabase")
+            except Exception as e:
+                logger.error(f"❌ Erro ao conectar com Supabase: {e}")
+
+        if client is not None:
+            try:
+                _use_shared_pool(client)
+            except Exception as e:
+                logger.warning(f"⚠️ Cliente supabase mantém a sessão própria: {e}")
+
+            # Testa a conexão (uma vez por processo)
+            try:
+                client.table('information_schema.tables').select('table_name').limit(1).execute()
+                logger.info("✅ Teste de conexão com Supabase bem-sucedido")
+            except Exception as test_error:
+                logger.warning(f"⚠️ Conexão estabelecida mas teste falhou: {test_error}")
+
+        _supabase_client = client
+        _supabase_ready = True
+        return _supabase_client
+
+
+def close_supabase_clients():
+    """Fecha o pool e descarta os clientes (no encerramento da API)"""
+    global _transport, _http_client, _supabase_client, _supabase_ready
+    with _client_lock:
+        transport, client = _transport, _supabase_client
+        _transport, _http_client, _supabase_client, _supabase_ready = None, None, None, False
+    if client is not None:
+        try:
+            client.postgrest.session.close()
+        except Exception:
+            pass
+    if transport is not None:
+        transport.close()
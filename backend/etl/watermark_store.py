@@ -0,0 +1,206 @@
+"""
+Marcas d'água (high-water marks) por tabela de staging e origem do arquivo
+Permite carregamento incremental de exports que repetem semanas de histórico
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from etl.lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATERMARK_PATH = Path(__file__).resolve().parents[2] / "data" / "cache" / "watermarks.json"
+
+# Colunas (no banco) que definem o instante de cada linha: data ou data + hora;
+# settings.watermark_columns sobrescreve ou acrescenta tabelas
+DEFAULT_WATERMARK_COLUMNS: Dict[str, List[str]] = {
+    'etl_staging_01_historico_consumo': ['data'],
+    'etl_staging_02_desvio_carregamento': ['data', 'hora_carregamento'],
+    'etl_staging_03_desvio_distribuicao': ['data', 'hora']
+}
+
+_UPLOAD_PREFIX = re.compile(r'^\d{8}_\d{6}_')
+_DATE_TOKEN = re.compile(r'\d{4}[-_.]?\d{2}[-_.]?\d{2}|\d{2}[-_.]\d{2}[-_.]\d{4}')
+_SEPARATORS = re.compile(r'[\s_\-.]+')
+
+
+def watermark_columns_for(table: str) -> Optional[List[str]]:
+    """Colunas de data/hora da marca d'água da tabela (None se não configurada)"""
+    from config.settings import get_settings
+    configured = get_settings().watermark_columns.get(table)
+    columns = configured if configured else DEFAULT_WATERMARK_COLUMNS.get(table)
+    return list(columns) if columns else None
+
+
+def source_from_file_name(file_name: str) -> str:
+    """
+    Origem do arquivo a partir do nome: sem prefixo de upload, extensão e datas
+    Ex.: 20240501_080000_01_historico_consumo_2024-05-01.csv → 01_historico_consumo
+    """
+    stem = Path(str(file_name)).stem
+    stem = _UPLOAD_PREFIX.sub('', stem)
+    stem = _DATE_TOKEN.sub('', stem)
+    return _SEPARATORS.sub('_', stem).strip('_').lower() or "default"
+
+
+def event_timestamps(df: pd.DataFrame, date_column: str, time_column: str = None) -> pd.Series:
+    """
+    Instante de cada linha (data + hora opcional), vetorizado
+
+    Datas no formato brasileiro (dia primeiro) ou ISO; valores inválidos viram NaT.
+    """
+    dates = df[date_column]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        text = dates.astype(str).str.strip()
+        # ISO primeiro (dayfirst inverteria "2024-05-01" para 5 de janeiro); o restante, dia primeiro
+        dates = pd.to_datetime(text, format='ISO8601', errors='coerce')
+        failed = dates.isna()
+        if failed.any():
+            dates = dates.mask(failed, pd.to_datetime(text[failed], dayfirst=True, errors='coerce'))
+    timestamps = dates.dt.normalize()
+
+    if time_column and time_column in df.columns:
+        times = df[time_column].astype(str).str.strip()
+        # "06:30" → "06:30:00" para o parser de timedelta
+        times = times.where(times.str.count(':') != 1, times + ':00')
+        offsets = pd.to_timedelta(times, errors='coerce').fillna(pd.Timedelta(0))
+        timestamps = timestamps + offsets
+
+    return timestamps
+
+
+class WatermarkStore:
+    """
+    Maior instante já carregado por (tabela, origem), persistido em JSON
+
+    A marca só avança; reset permite recarregar um período.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or DEFAULT_WATERMARK_PATH)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._marks: Dict[str, Dict[str, Any]] = {}
+
+    def _key(self, table: str, source: str) -> str:
+        return f"{table}:{source}"
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._marks = json.load(f).get("watermarks", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Marcas d'água ilegíveis ({self.path}): {e}")
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"watermarks": self._marks}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, table: str, source: str) -> Optional[pd.Timestamp]:
+        """Maior instante já carregado (None se nunca houve carga)"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._marks.get(self._key(table, source))
+        return pd.Timestamp(entry["value"]) if entry else None
+
+    def advance(self, table: str, source: str, value, columns: List[str] = None) -> bool:
+        """Avança a marca se `value` for maior que a atual; retorna True se mudou"""
+        if value is None or pd.isna(value):
+            return False
+        value = pd.Timestamp(value)
+
+        with self._lock:
+            self._ensure_loaded()
+            key = self._key(table, source)
+            current = self._marks.get(key)
+            if current and pd.Timestamp(current["value"]) >= value:
+                return False
+
+            self._marks[key] = {
+                "table": table,
+                "source": source,
+                "value": value.isoformat(),
+                "columns": columns or [],
+                "updated_at": datetime.now().isoformat()
+            }
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível gravar as marcas d'água: {e}")
+
+        logger.info(f"🌊 Marca d'água de {table} ({source}) avançou para {value.isoformat()}")
+        return True
+
+    def reset(self, table: str, source: str = None) -> int:
+        """Remove a marca de uma origem (ou de todas as origens da tabela)"""
+        with self._lock:
+            self._ensure_loaded()
+            keys = [key for key, entry in self._marks.items()
+                    if entry["table"] == table and (source is None or entry["source"] == source)]
+            for key in keys:
+                del self._marks[key]
+            if keys:
+                try:
+                    self._save()
+                except OSError as e:
+                    logger.warning(f"⚠️ Não foi possível gravar as marcas d'água: {e}")
+            return len(keys)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Todas as marcas d'água registradas"""
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(entry) for entry in self._marks.values()]
+
+
+def filter_new_rows(df: pd.DataFrame, watermark: Optional[pd.Timestamp],
+                    date_column: str, time_column: str = None):
+    """
+    Máscara vetorizada: mantém só as linhas posteriores à marca d'água
+
+    Linhas sem data válida são mantidas (a validação decide o que fazer).
+
+    Returns:
+        Tupla (DataFrame filtrado, linhas descartadas)
+    """
+    if watermark is None or len(df) == 0:
+        return df, 0
+
+    timestamps = event_timestamps(df, date_column, time_column)
+    keep = timestamps.isna() | (timestamps > watermark)
+    filtered = df[keep.values]
+    return filtered, len(df) - len(filtered)
+
+
+# Instância global das marcas d'água
+_watermark_store = None
+_watermark_store_lock = threading.Lock()
+
+
+def get_watermark_store() -> WatermarkStore:
+    """Retorna instância singleton das marcas d'água"""
+    global _watermark_store
+    if _watermark_store is None:
+        with _watermark_store_lock:
+            if _watermark_store is None:
+                _watermark_store = WatermarkStore()
+    return _watermark_store
@@ -72,6 +72,7 @@ export function QuickETL({ savedConfig }: QuickETLProps) {
     []
   );
   const [excludedRows, setExcludedRows] = useState<Set<number>>(new Set());
+  const [resultId, setResultId] = useState<string | null>(null);
   const [sortConfig, setSortConfig] = useState<{
     column: string | "row-number" | null;
     direction: "asc" | "desc" | null;
@@ -159,6 +160,7 @@ export function QuickETL({ savedConfig }: QuickETLProps) {
       const etlResult = await etlResponse.json();
       setProgress(100);
       setProcessedData(etlResult.data || []);
+      setResultId(etlResult.result_id || null);
 
       setStatus("processed");
       setResultMessage(
@@ -185,10 +187,13 @@ export function QuickETL({ savedConfig }: QuickETLProps) {
     setProcessing(true);
 
     try {
-      // Usar apenas os dados visíveis (não excluídos)
+      // Com result_id o servidor já tem os dados: envia só as posições excluídas
       const finalData = processedData.filter(
         (_, index) => !excludedRows.has(index)
       );
+      const payload = resultId
+        ? { result_id: resultId, excluded_rows: Array.from(excludedRows) }
+        : { data: finalData };
 
       const supabaseResponse = await fetch(
         "http://localhost:8000/supabase/upload",
@@ -200,7 +205,7 @@ export function QuickETL({ savedConfig }: QuickETLProps) {
           body: JSON.stringify({
             file_id: selectedFile?.name || "quick_etl",
             table_name: "etl_staging_01_historico_consumo",
-            data: finalData,
+            ...payload,
           }),
         }
       );
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Testes do endpoint de upload de CSV (/upload-csv)
+"""
+
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from api import main
+from etl.conectaboi_etl_smart import ConectaBoiETL
+
+
+def test_upload_salva_em_blocos_e_classifica(tmp_path, monkeypatch):
+    """O upload grava o arquivo em data/temp, detecta a estrutura e classifica pelas primeiras linhas"""
+    # O endpoint grava em ../../data/temp relativo ao diretório da API
+    api_dir = tmp_path / "backend" / "api"
+    api_dir.mkdir(parents=True)
+    monkeypatch.chdir(api_dir)
+    monkeypatch.setattr(main, "etl_instance", ConectaBoiETL(connect=False))
+    monkeypatch.setattr(main, "UPLOAD_CHUNK_SIZE", 16)  # vários blocos mesmo com um arquivo pequeno
+
+    content = "Data;Curral;Kg\n01/05/2024;A1;10,5\n02/05/2024;B2;7\n".encode("utf-8")
+    response = TestClient(main.app).post("/upload-csv", files={"file": ("consumo maio.csv", content, "text/csv")})
+
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["success"] is True
+    assert payload["file_id"].endswith("_consumo_maio.csv")
+    assert "file_type" in payload["classification"]
+    assert (tmp_path / "data" / "temp" / payload["file_id"]).read_bytes() == content
+
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Testes do diário de checkpoints e da retomada de cargas
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from config.settings import get_settings
+from etl import conectaboi_etl_smart, reject_store
+from etl.checkpoint import LoadJournal, list_journals, position_spans, span_positions
+from etl.loader import BatchLoader, BatchLoadError
+
+
+class CrashingBackend:
+    """Grava em memória; simula a queda do processo depois de N batches"""
+
+    name = "fake"
+
+    def __init__(self, crash_after=None, bad_ids=()):
+        self.crash_after = crash_after
+        self.bad_ids = set(bad_ids)
+        self.ids = []
+        self.lock = threading.Lock()
+
+    def send(self, table, batch):
+        with self.lock:
+            if self.crash_after is not None and self.crash_after <= 0:
+                raise BatchLoadError("processo interrompido", status_code=400)
+            if self.bad_ids.intersection(batch["id"]):
+                raise BatchLoadError("invalid input syntax", status_code=400)
+            self.ids.extend(batch["id"].tolist())
+            if self.crash_after is not None:
+                self.crash_after -= 1
+        return len(batch)
+
+
+def _frame(rows):
+    return pd.DataFrame({"id": range(rows), "kg": [float(i) for i in range(rows)]})
+
+
+def _load(backend, journal, df, positions=None):
+    positions = range(len(df)) if positions is None else positions
+    loader = BatchLoader(backend, workers=1, max_retries=0, backoff_base=0, backoff_max=0,
+                         sleep=lambda _: None, max_rejects=0)
+    return loader.load("tabela", df, batch_size=100, checkpoint=journal.tracker(positions))
+
+
+def test_faixas_de_posicoes():
+    """Posições viram faixas [início, fim) e voltam iguais"""
+    positions = [0, 1, 2, 5, 6, 9]
+
+    assert position_spans(positions) == [[0, 3], [5, 7], [9, 10]]
+    assert span_positions(position_spans(positions)).tolist() == positions
+
+
+def test_retomada_nao_reenvia_linhas_gravadas(tmp_path):
+    """Depois da queda, só as posições não gravadas são enviadas"""
+    df = _frame(1000)
+    journal = LoadJournal("run_a", tmp_path)
+    journal.start({"target_table": "tabela"}, len(df))
+
+    _load(CrashingBackend(crash_after=4), journal, df)
+
+    loaded = journal.loaded_positions()
+    assert loaded.tolist() == list(range(400))
+    assert journal.verify(df) == []
+
+    # Retomada (novo processo): mesmo DataFrame, só o que falta
+    resumed = LoadJournal("run_a", tmp_path)
+    pending = [position for position in range(len(df)) if position not in set(loaded)]
+    resumed.resume(len(df), len(loaded), 0)
+    backend = CrashingBackend()
+    report = _load(backend, resumed, df.iloc[pending], pending)
+    resumed.finish(status="completed", rows_loaded=report["rows_loaded"], rows_failed=report["rows_failed"])
+
+    assert backend.ids == list(range(400, 1000))
+    assert resumed.loaded_positions().tolist() == list(range(1000))
+    summary = resumed.summary()
+    assert summary["status"] == "completed"
+    assert summary["rows_loaded"] == 1000
+    assert list_journals(tmp_path)[0]["run_id"] == "run_a"
+
+
+def test_batch_sem_commit_fica_em_duvida(tmp_path):
+    """begin sem commit (queda durante o envio) não conta como gravado"""
+    df = _frame(200)
+    journal = LoadJournal("run_b", tmp_path)
+    journal.start({}, len(df))
+    tracker = journal.tracker(range(len(df)))
+    tracker.batch_started(1, 0, 100, df.iloc[0:100])
+    tracker.batch_finished({"batch": 1, "loaded": 100, "rejects": [], "error": None})
+    tracker.batch_started(2, 100, 200, df.iloc[100:200])
+
+    # Linha truncada no fim do arquivo (queda no meio da escrita) é ignorada
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"event": "commit", "bat')
+
+    state = journal.state()
+    assert [batch["status"] for batch in state["batches"].values()] == ["committed", "in_doubt"]
+    assert journal.summary()["batches_in_doubt"] == 1
+    assert len(journal.loaded_positions(state)) == 100
+
+
+def test_rejeitadas_do_batch_parcial_sao_reenviadas(tmp_path):
+    """Posições rejeitadas de um batch parcial não contam como gravadas"""
+    df = _frame(100)
+    journal = LoadJournal("run_c", tmp_path)
+    journal.start({}, len(df))
+    tracker = journal.tracker(range(len(df)))
+    tracker.batch_started(1, 0, 100, df)
+    tracker.batch_finished({"batch": 1, "loaded": 98, "error": "x",
+                            "rejects": [{"row": 7, "error": "x"}, {"row": 42, "error": "x"}]})
+
+    loaded = journal.loaded_positions()
+    assert len(loaded) == 98
+    assert 7 not in loaded and 42 not in loaded
+
+
+def test_erro_passageiro_esgotado_fica_pendente(tmp_path):
+    """Batch que esgota os retries por erro passageiro não vira rejeitada: fica pendente para a retomada"""
+
+    class OutageBackend(CrashingBackend):
+        def send(self, table, batch):
+            if 150 in set(batch["id"]):
+                raise BatchLoadError("service unavailable", status_code=503)
+            return super().send(table, batch)
+
+    df = _frame(300)
+    journal = LoadJournal("run_f", tmp_path)
+    journal.start({"target_table": "tabela"}, len(df))
+
+    report = _load(OutageBackend(), journal, df)
+
+    assert report["rows_rejected"] == 0 and report["rejects"] == []
+    assert report["rows_failed"] == 100
+    assert report["rows_not_sent"] == 100
+    assert journal.loaded_positions().tolist() == list(range(100)) + list(range(200, 300))
+
+
+def test_dados_alterados_bloqueiam_retomada(tmp_path):
+    """Hash diferente nos batches gravados indica arquivo/mapeamento alterado"""
+    df = _frame(300)
+    journal = LoadJournal("run_d", tmp_path)
+    journal.start({}, len(df))
+    _load(CrashingBackend(crash_after=2), journal, df)
+
+    changed = df.copy()
+    changed.loc[150, "kg"] = -1.0
+
+    assert journal.verify(changed) == ["1:2"]
+    assert journal.verify(df.iloc[:50]) == ["1:1", "1:2"]
+
+
+def test_execucao_inexistente(tmp_path):
+    """Diário ausente ou run_id inválido gera KeyError"""
+    for run_id in ["nao_existe", "../x"]:
+        try:
+            LoadJournal(run_id, tmp_path).state()
+            assert False, "deveria falhar"
+        except KeyError:
+            pass
+
+
+class CurralBackend:
+    """Rejeita as linhas dos currais em `bad` (erro de dados)"""
+
+    name = "fake"
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+
+    def send(self, table, batch):
+        if self.bad.intersection(batch["curral"]):
+            raise BatchLoadError("invalid input syntax", status_code=400)
+        return len(batch)
+
+
+STEP3_MAPPING = [
+    {"csv_column": "curral", "db_column": "curral", "enabled": True, "data_type": "TEXT"},
+    {"csv_column": "kg", "db_column": "kg", "enabled": True, "data_type": "NUMERIC"}
+]
+
+
+def _step3_setup(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(get_settings(), "checkpoint_dir", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(get_settings(), "reject_store_dir", str(tmp_path / "rejects"))
+    monkeypatch.setattr(reject_store, "_reject_store", None)
+    monkeypatch.setattr(conectaboi_etl_smart, "create_load_backend", lambda *args, **kwargs: backend)
+    csv_path = tmp_path / "consumo.csv"
+    csv_path.write_text("Curral;Kg\nA1;10,5\nZ9;7\nB2;3\n", encoding="utf-8")
+    return conectaboi_etl_smart.ConectaBoiETL(connect=False), str(csv_path)
+
+
+def _step3(etl, csv_path, **kwargs):
+    return etl.process_step3_load_data(csv_path, STEP3_MAPPING, "tabela", auto_remove_outliers=False,
+                                       workers=1, **kwargs)
+
+
+def test_rejeitadas_com_o_run_id_do_checkpoint(tmp_path, monkeypatch):
+    """As rejeitadas da Etapa 3 ficam sob o run_id do diário; a retomada bem-sucedida as substitui"""
+    backend = CurralBackend(bad={"Z9"})
+    etl, csv_path = _step3_setup(tmp_path, monkeypatch, backend)
+
+    result = _step3(etl, csv_path, checkpoint=True)
+    run_id = result["checkpoint"]["run_id"]
+    assert result["reject_store"]["run_id"] == run_id
+    assert reject_store.get_reject_store().read(run_id)["curral"].tolist() == ["Z9"]
+
+    backend.bad.clear()
+    resumed = _step3(etl, csv_path, resume_run_id=run_id)
+    assert resumed["load_summary"]["rows_loaded"] == 1
+    assert resumed["reject_store"] is None
+    assert reject_store.get_reject_store().runs() == []
+
+
+def test_retomada_sem_pendentes_e_sucesso(tmp_path, monkeypatch):
+    """Retomar uma carga já completa não envia nada e não é falha"""
+    etl, csv_path = _step3_setup(tmp_path, monkeypatch, CurralBackend())
+
+    result = _step3(etl, csv_path, checkpoint=True)
+    resumed = _step3(etl, csv_path, resume_run_id=result["checkpoint"]["run_id"])
+
+    assert resumed["checkpoint"]["skipped_rows"] == 3
+    assert resumed["load_summary"]["total_rows_processed"] == 0
+    assert resumed["success"] is True
+
+
+def test_batch_em_duvida_so_reenviado_com_pedido_fora_do_upsert(tmp_path, monkeypatch):
+    """Em modo insert a retomada com batch em dúvida é recusada, a não ser com resend_in_doubt"""
+    backend = CurralBackend()
+    etl, csv_path = _step3_setup(tmp_path, monkeypatch, backend)
+    monkeypatch.setattr(get_settings(), "loader_load_mode", "insert")
+    run_id = _step3(etl, csv_path, checkpoint=True)["checkpoint"]["run_id"]
+
+    # Queda durante o envio: begin sem commit
+    journal = conectaboi_etl_smart.open_journal(run_id)
+    state = journal.state()
+    with open(journal.path, "r", encoding="utf-8") as f:
+        events = [line for line in f if '"event": "commit"' not in line and '"event": "finish"' not in line]
+    with open(journal.path, "w", encoding="utf-8") as f:
+        f.writelines(events)
+    assert journal.summary()["batches_in_doubt"] == len(state["batches"])
+
+    try:
+        etl.resume_step3_load(run_id, workers=1)
+        assert False, "deveria recusar a retomada"
+    except ValueError as e:
+        assert "resend_in_doubt" in str(e)
+
+    resumed = etl.resume_step3_load(run_id, workers=1, resend_in_doubt=True)
+    assert resumed["success"] is True
+    assert resumed["load_summary"]["rows_loaded"] == 3
+    assert resumed["checkpoint"]["in_doubt_resent_without_key"] is True
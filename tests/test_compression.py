@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Testes da compressão das respostas (negociação gzip/br e streaming)
+"""
+
+import gzip
+import json
+import sys
+import zlib
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from api.compression import CompressionMiddleware, negotiate_encoding
+
+PAYLOAD = json.dumps([{"curral": "CURRAL 001", "dieta": "TERMINACAO", "kg": i} for i in range(500)]).encode()
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/grande")
+    def grande():
+        return Response(content=PAYLOAD, media_type="application/json")
+
+    @app.get("/pequeno")
+    def pequeno():
+        return Response(content=b'{"ok":true}', media_type="application/json")
+
+    @app.get("/ndjson")
+    def ndjson():
+        return StreamingResponse((b'{"linha":%d}\n' % i for i in range(3)), media_type="application/x-ndjson")
+
+    @app.get("/com-vary")
+    def com_vary():
+        return Response(content=PAYLOAD, media_type="application/json", headers={"Vary": "Origin"})
+
+    @app.get("/eventos")
+    def eventos():
+        return StreamingResponse(iter([b"data: 1\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_negociacao_pelo_accept_encoding():
+    """Pesos q decidem; empate segue a preferência do servidor; q=0 recusa"""
+    supported = ["br", "gzip"]
+    assert negotiate_encoding("gzip, deflate, br", supported) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("br;q=0, gzip", supported) == "gzip"
+    assert negotiate_encoding("*", ["gzip"]) == "gzip"
+    assert negotiate_encoding("identity", supported) is None
+    assert negotiate_encoding("", supported) is None
+
+
+def test_resposta_grande_comprimida_com_gzip():
+    """JSON acima do mínimo vai em gzip, com Content-Length do corpo comprimido e Vary"""
+    response = make_client().get("/grande", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(PAYLOAD) / 5
+    assert response.content == PAYLOAD  # httpx descomprime
+
+
+def test_sem_compressao_quando_pequeno_ou_nao_aceito():
+    """Corpo pequeno, cliente sem gzip e Server-Sent Events passam sem alteração"""
+    client = make_client()
+    assert "content-encoding" not in client.get("/pequeno", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/grande", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/eventos", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_streaming_ndjson_comprimido_por_bloco():
+    """Cada bloco sai com flush: o cliente descomprime as linhas conforme chegam"""
+    with make_client().stream("GET", "/ndjson", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(raw) == b'{"linha":0}\n{"linha":1}\n{"linha":2}\n'
+    assert gzip.decompress(raw).count(b"\n") == 3
+
+
+def test_vary_em_toda_resposta_comprimivel():
+    """Comprimida ou não, resposta de tipo comprimível leva Vary: Accept-Encoding (somado ao Vary existente)"""
+    client = make_client()
+
+    assert client.get("/pequeno", headers={"Accept-Encoding": "gzip"}).headers["vary"] == "Accept-Encoding"
+    assert client.get("/grande", headers={"Accept-Encoding": "identity"}).headers["vary"] == "Accept-Encoding"
+    assert "vary" not in client.get("/eventos", headers={"Accept-Encoding": "gzip"}).headers
+
+    for accept in ["gzip", "identity"]:
+        response = client.get("/com-vary", headers={"Accept-Encoding": accept})
+        assert response.headers.get_list("vary") == ["Origin, Accept-Encoding"]
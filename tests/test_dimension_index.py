@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Testes do índice de trigramas para sugestões de valores de dimensão
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.dimension_index import TrigramIndex, build_suggested_transformations, extract_trigrams
+
+
+def test_trigrams_ignoram_acentos_e_caixa():
+    """Normalização deve tornar 'Curral' e 'cúrral' equivalentes"""
+    assert extract_trigrams("Curral") == extract_trigrams("cúrral")
+
+
+def test_sugere_chave_mais_parecida():
+    """Valor digitado errado deve sugerir a chave correta em primeiro lugar"""
+    index = TrigramIndex(["ENF 01", "ENF 02", "CONF 10", "PIQUETE A"])
+
+    suggestions = index.suggest("ENF01", top_k=2)
+
+    assert suggestions[0]["value"] == "ENF 01"
+    assert all(s["value"].startswith("ENF") for s in suggestions)
+
+
+def test_respeita_similaridade_minima():
+    """Valores sem semelhança não devem gerar sugestões"""
+    index = TrigramIndex(["CONF 10", "CONF 11"])
+
+    assert index.suggest("PIQUETE", min_similarity=0.3) == []
+
+
+def test_escala_para_dimensoes_grandes():
+    """Índice com dezenas de milhares de chaves continua encontrando o vizinho certo"""
+    index = TrigramIndex(f"CURRAL {i:05d}" for i in range(30000))
+
+    suggestions = index.suggest("CURRAL 12345", top_k=1)
+
+    assert len(index) == 30000
+    assert suggestions[0]["value"] == "CURRAL 12345"
+    assert suggestions[0]["similarity"] == 1.0
+
+
+def test_transformacoes_sugeridas_descartam_empates():
+    """Empate no topo não vira transformação automática"""
+    suggestions = {
+        "ENF1": [{"value": "ENF 01", "similarity": 0.6}, {"value": "ENF 10", "similarity": 0.6}],
+        "CONF10": [{"value": "CONF 10", "similarity": 0.8}],
+    }
+
+    assert build_suggested_transformations(suggestions) == {"CONF10": "CONF 10"}
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Testes dos executores fora do event loop (threads para I/O, processos para CPU)
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from api import executors
+from config.settings import get_settings
+from etl.conectaboi_etl_smart import parse_csv_file
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Pools novos por teste, com 2 threads e 1 processo"""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "io_executor_workers", 2)
+    monkeypatch.setattr(settings, "cpu_executor_workers", 1)
+    executors.shutdown_executors(wait=True)
+    yield settings
+    executors.shutdown_executors(wait=True)
+
+
+def test_event_loop_responde_durante_trabalho_bloqueante(pools):
+    """Enquanto uma chamada bloqueante roda no pool, o loop continua atendendo"""
+    async def scenario():
+        blocking = asyncio.ensure_future(executors.run_io(time.sleep, 0.5))
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        latency = time.perf_counter() - started
+        await blocking
+        return latency
+
+    assert asyncio.run(scenario()) < 0.2
+
+
+def test_parse_de_csv_no_pool_de_processos(pools, tmp_path):
+    """parse_csv_file roda em outro processo e devolve o DataFrame limpo"""
+    csv_path = tmp_path / "consumo.csv"
+    csv_path.write_text("Data;Curral;Kg\n01/05/2024;A1;10,5\n02/05/2024;B2;7\n", encoding="latin-1")
+
+    df = asyncio.run(executors.run_cpu(parse_csv_file, str(csv_path)))
+
+    assert len(df) == 2
+    assert isinstance(executors.get_cpu_executor(), executors.ProcessPoolExecutor)
+
+
+def test_sem_processos_usa_o_pool_de_io(pools, monkeypatch):
+    """cpu_executor_workers=0 desliga os processos"""
+    monkeypatch.setattr(pools, "cpu_executor_workers", 0)
+    executors.shutdown_executors(wait=True)
+
+    assert executors.get_cpu_executor() is executors.get_io_executor()
+    assert executors.call_cpu(sum, [1, 2, 3]) == 6
+
+
+def test_etapas_no_pool_iguais_as_inline(pools, tmp_path):
+    """run_transform_stages em processo aquecido devolve o mesmo que a execução inline"""
+    from etl.conectaboi_etl_smart import ConectaBoiETL, run_transform_stages
+
+    csv_path = tmp_path / "consumo.csv"
+    csv_path.write_text("Data;Curral;Kg\n01/05/2024;A1;10,5\n02/05/2024;B2;abc\n", encoding="utf-8")
+    mapping = [
+        {"csv_column": "data", "db_column": "data", "enabled": True, "data_type": "DATE"},
+        {"csv_column": "curral", "db_column": "curral", "enabled": True, "data_type": "TEXT"},
+        {"csv_column": "kg", "db_column": "kg", "enabled": True, "data_type": "NUMERIC"}
+    ]
+
+    assert executors.prewarm_cpu_executor() == 1
+    in_pool = executors.call_cpu(run_transform_stages, str(csv_path), mapping)
+    inline = ConectaBoiETL(connect=False)._run_transform_stages(str(csv_path), mapping)
+
+    assert in_pool["rows_parsed"] == inline["rows_parsed"] == 2
+    assert in_pool["original_columns"] == inline["original_columns"]
+    assert in_pool["df"].equals(inline["df"])
+    assert len(in_pool["conversion_rejects"]) == len(inline["conversion_rejects"])
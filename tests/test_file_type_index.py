@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes do índice de assinaturas de cabeçalho para classificação de arquivos
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.file_type_index import FILE_TYPE_DEFINITIONS, FileTypeIndex, header_fingerprint
+
+HEADERS_02 = ["Data", "Hora", "Vagão", "Nº Carregamento", "Ingrediente", "Previsto (kg)", "Realizado (kg)", "Desvio (kg)", "Pazeiro"]
+
+
+def _index_with_config(tmp_path, headers, file_type="02_desvio_carregamento"):
+    config = {"fileId": file_type, "tableName": FILE_TYPE_DEFINITIONS[file_type]["target_table"], "csvHeaders": headers}
+    (tmp_path / f"{file_type}_config.json").write_text(json.dumps(config), encoding="utf-8")
+    return FileTypeIndex(config_dir=tmp_path)
+
+
+def test_cobre_os_cinco_tipos():
+    """Todos os tipos do ConectaBoi têm tabela de staging"""
+    assert list(FILE_TYPE_DEFINITIONS) == [
+        "01_historico_consumo", "02_desvio_carregamento", "03_desvio_distribuicao",
+        "04_itens_trato", "05_trato_curral"
+    ]
+    for file_type, definition in FILE_TYPE_DEFINITIONS.items():
+        assert definition["target_table"] == f"etl_staging_{file_type}"
+
+
+def test_assinatura_exata_ignora_ordem_e_colunas_sem_nome():
+    """Cabeçalhos vazios e col_N não alteram a impressão digital"""
+    assert header_fingerprint(HEADERS_02) == header_fingerprint(list(reversed(HEADERS_02)) + ["", "col_10"])
+
+
+def test_classificacao_exata_traz_config_e_plano(tmp_path):
+    """Config salva é reconhecida pela assinatura e devolve tabela e plano"""
+    index = _index_with_config(tmp_path, HEADERS_02)
+
+    result = index.classify(HEADERS_02)
+
+    assert result["file_type"] == "02_desvio_carregamento"
+    assert result["method"] == "exact_signature"
+    assert result["target_table"] == "etl_staging_02_desvio_carregamento"
+    assert result["saved_config"]["csvHeaders"] == HEADERS_02
+    plan = {m["csvColumn"]: m["sqlColumn"] for m in result["mapping_plan"]}
+    assert plan["Nº Carregamento"] == "carregamento"
+    assert plan["Previsto (kg)"] == "previsto_kg"
+
+
+def test_classificacao_aproximada_tolera_coluna_nova(tmp_path):
+    """Arquivo com uma coluna a mais ainda casa com a assinatura conhecida"""
+    index = _index_with_config(tmp_path, HEADERS_02)
+
+    file_type, method, confidence = index.detect(HEADERS_02 + ["Observação"])
+
+    assert file_type == "02_desvio_carregamento"
+    assert method == "fuzzy_signature"
+    assert 0.6 <= confidence < 1.0
+
+
+def test_palavras_chave_e_nome_do_arquivo(tmp_path):
+    """Sem configs salvas valem o nome do arquivo e as palavras-chave"""
+    index = FileTypeIndex(config_dir=tmp_path)
+
+    assert index.detect(["Trato", "Curral", "Vagão Abastecido"])[0] == "05_trato_curral"
+    assert index.detect(["x", "y"], "20240101_03_desvio_distribuicao.csv")[:2] == ("03_desvio_distribuicao", "file_name")
+    assert index.detect(["x", "y"]) == (None, "unknown", 0.0)
+
+
+def test_linha_de_titulo_e_pulada(tmp_path):
+    """Quando o cabeçalho está na segunda linha, skip_first_line é sugerido"""
+    index = _index_with_config(tmp_path, HEADERS_02)
+    lines = ["Relatório de desvio de carregamento;;;", ",".join(HEADERS_02)]
+
+    result = index.classify_header_lines(lines, "relatorio.csv")
+
+    assert result["file_type"] == "02_desvio_carregamento"
+    assert result["skip_first_line"] is True
+    assert result["headers"] == HEADERS_02
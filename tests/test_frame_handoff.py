@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Testes da entrega de DataFrames dos processos via Arrow IPC
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from config.settings import get_settings
+from etl import frame_handoff
+from etl.frame_handoff import FrameHandle, open_outputs, publish_frame, publish_outputs, sweep_handoff_dir
+
+
+def _frame(rows=10):
+    return pd.DataFrame({"curral": [f"A{i}" for i in range(rows)], "kg": [i * 1.5 for i in range(rows)]})
+
+
+def test_frame_pequeno_ou_sem_arrow_volta_por_pickle(monkeypatch, tmp_path):
+    """Abaixo do mínimo de linhas, desligado ou sem pyarrow, o DataFrame volta como está"""
+    df = _frame()
+
+    assert publish_frame(df, min_rows=100, base_dir=tmp_path) is df
+
+    monkeypatch.setattr(get_settings(), "frame_handoff_enabled", False)
+    assert publish_frame(df, min_rows=0, base_dir=tmp_path) is df
+
+    monkeypatch.setattr(get_settings(), "frame_handoff_enabled", True)
+    monkeypatch.setattr(frame_handoff, "arrow_available", lambda: False)
+    assert publish_frame(df, min_rows=0, base_dir=tmp_path) is df
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_ida_e_volta_por_arrow(monkeypatch, tmp_path):
+    """O worker publica o frame do resultado; a API recebe o mesmo DataFrame e o arquivo some"""
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(get_settings(), "frame_handoff_min_rows", 0)
+    monkeypatch.setattr(get_settings(), "frame_handoff_dir", str(tmp_path))
+    df = _frame(1000).set_index(pd.RangeIndex(5, 1005))
+
+    published = publish_outputs({"df": df, "rows_parsed": 1000, "conversion_rejects": None})
+    assert isinstance(published["df"], FrameHandle)
+    assert published["df"].rows == 1000
+    assert len(list(tmp_path.glob("*.arrow"))) == 1
+
+    opened = open_outputs(published)
+
+    pd.testing.assert_frame_equal(opened["df"], df)
+    assert opened["rows_parsed"] == 1000 and opened["conversion_rejects"] is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disco_cheio_volta_por_pickle(monkeypatch, tmp_path):
+    """ENOSPC na gravação não derruba o worker: o arquivo parcial sai e o frame volta por pickle"""
+    import errno
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    def no_space(sink, schema):
+        sink.write(b"ARROW1")
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(pa.ipc, "new_file", no_space)
+    df = _frame()
+
+    assert publish_frame(df, min_rows=0, base_dir=tmp_path) is df
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_limpeza_de_frames_orfaos(tmp_path):
+    """Arquivos de workers interrompidos são removidos na partida"""
+    (tmp_path / "a.arrow").write_bytes(b"x")
+    (tmp_path / "b.tmp").write_bytes(b"x")
+
+    assert sweep_handoff_dir(tmp_path) == 2
+    assert sweep_handoff_dir(tmp_path / "inexistente") == 0
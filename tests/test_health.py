@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Testes da sonda de saúde do Supabase (estado em cache e percentis de latência)
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from api.health import (
+    PROBE_FAILED, PROBE_NOT_CONFIGURED, PROBE_OPERATIONAL, PROBE_UNKNOWN, HealthProber, ProbeNotConfigured,
+    percentile
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_percentis_das_latencias():
+    """Posto mais próximo sobre as latências ordenadas"""
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7.0
+
+
+def test_estado_e_latencias_das_sondas():
+    """Sucessos entram na janela de latência; falhas contam em sequência e não mexem nos percentis"""
+    clock = FakeClock()
+    latencies = iter([0.010, 0.020, 0.030, None, None, 0.040])
+
+    def probe():
+        latency = next(latencies)
+        if latency is None:
+            raise ConnectionError("timeout")
+        clock.now += latency
+
+    prober = HealthProber(probe, interval_seconds=10, window=3, clock=clock)
+    assert prober.snapshot()["status"] == PROBE_UNKNOWN
+
+    for _ in range(3):
+        prober.probe_once()
+    snapshot = prober.snapshot()
+    assert snapshot["status"] == PROBE_OPERATIONAL and snapshot["connected"]
+    assert snapshot["latency_ms"]["p50"] == 20.0
+    assert snapshot["latency_ms"]["max"] == 30.0
+
+    prober.probe_once()
+    failed = prober.probe_once()
+    assert failed["status"] == PROBE_FAILED and failed["error"] == "timeout"
+    assert failed["consecutive_failures"] == 2
+    assert failed["latency_ms"]["samples"] == 3
+
+    recovered = prober.probe_once()
+    assert recovered["consecutive_failures"] == 0
+    assert recovered["latency_ms"]["samples"] == 3  # janela de 3: a de 10 ms saiu
+    assert recovered["latency_ms"]["p50"] == 30.0
+
+    clock.now += 31
+    assert prober.snapshot()["stale"] is True
+
+
+def test_sem_credenciais_fica_nao_configurado():
+    """Sem cliente a sonda reporta modo simulado, sem contar como falha"""
+    def probe():
+        raise ProbeNotConfigured()
+
+    snapshot = HealthProber(probe).probe_once()
+    assert snapshot["status"] == PROBE_NOT_CONFIGURED
+    assert snapshot["consecutive_failures"] == 0
+
+
+def test_thread_sonda_na_partida_e_para():
+    """A primeira sonda roda assim que a thread sobe; stop encerra a thread"""
+    probed = threading.Event()
+
+    def probe():
+        probed.set()
+
+    prober = HealthProber(probe, interval_seconds=60)
+    prober.start()
+    assert probed.wait(5)
+    prober.stop(timeout=5)
+    assert not prober._thread.is_alive()
+    assert prober.snapshot()["probes"] == 1
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Testes dos jobs em segundo plano (fila limitada, progresso e cancelamento)
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from api.jobs import (
+    JOB_CANCELLED, JOB_FAILED, JOB_SUCCEEDED, JobManager, JobQueueFullError, load_progress_reporter
+)
+from etl.loader import BatchLoader
+
+
+def _wait(job, timeout=5):
+    if not job.future.cancelled():
+        job.future.result(timeout=timeout)
+    assert job.finished
+
+
+def test_resultado_e_eventos_de_progresso():
+    """Progresso atualiza os contadores e vira eventos numerados até o status final"""
+    manager = JobManager(max_workers=1)
+
+    def work(job):
+        job.report(stage="parse", rows_parsed=10)
+        job.report(stage="convert", rows_converted=9)
+        return {"ok": True}
+
+    job = manager.submit("teste", work)
+    _wait(job)
+
+    assert job.status == JOB_SUCCEEDED
+    assert job.result == {"ok": True}
+    assert job.snapshot()["progress"] == {"stage": "convert", "rows_parsed": 10, "rows_converted": 9}
+    events = job.events_after(0, timeout=0)
+    assert [event["seq"] for event in events] == list(range(1, len(events) + 1))
+    assert events[-1] == {"seq": len(events), "type": "status", "job_id": job.job_id,
+                          "status": JOB_SUCCEEDED, "error": None}
+    assert job.events_after(events[1]["seq"], timeout=0) == events[2:]
+    manager.shutdown()
+
+
+def test_falha_fica_registrada():
+    """Exceção do trabalho vira status failed com a mensagem"""
+    manager = JobManager(max_workers=1)
+
+    def work(job):
+        raise RuntimeError("arquivo corrompido")
+
+    job = manager.submit("teste", work)
+    _wait(job)
+
+    assert job.status == JOB_FAILED
+    assert job.error == "arquivo corrompido"
+    manager.shutdown()
+
+
+def test_limite_de_jobs_ativos_e_cancelamento():
+    """Acima de max_active a fila recusa; job na fila é cancelado na hora, o em execução coopera"""
+    manager = JobManager(max_workers=1, max_active=2)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking(job):
+        started.set()
+        while not release.wait(0.01):
+            job.check_cancelled()
+
+    running = manager.submit("teste", blocking)
+    queued = manager.submit("teste", blocking)
+    started.wait(5)
+
+    try:
+        manager.submit("teste", blocking)
+        assert False, "deveria recusar o terceiro job"
+    except JobQueueFullError:
+        pass
+
+    manager.cancel(queued.job_id)
+    assert queued.status == JOB_CANCELLED
+
+    manager.cancel(running.job_id)
+    _wait(running)
+    assert running.status == JOB_CANCELLED
+    assert manager.active_count() == 0
+    manager.shutdown()
+
+
+def test_carga_cancelada_para_de_enviar_batches():
+    """cancel_event interrompe a carga entre batches; o relatório diz quantas linhas ficaram"""
+    cancel = threading.Event()
+
+    class Backend:
+        name = "fake"
+
+        def send(self, table, batch):
+            return len(batch)
+
+    class CancelOnSecondBatch:
+        def batch_started(self, batch_number, start, end, batch):
+            if batch_number == 2:
+                cancel.set()
+
+        def batch_finished(self, result):
+            pass
+
+    report = BatchLoader(Backend(), workers=1).load(
+        "tabela", pd.DataFrame({"id": range(10)}), batch_size=2,
+        checkpoint=CancelOnSecondBatch(), cancel_event=cancel)
+
+    assert report["cancelled"] is True
+    assert report["rows_loaded"] == 4
+    assert report["rows_not_sent"] == 6
+
+
+def test_progresso_da_carga_acumula_rejeitadas():
+    """Rejeitadas da conversão somam com as rejeitadas de cada batch"""
+    manager = JobManager(max_workers=1)
+
+    def work(job):
+        report = load_progress_reporter(job)
+        report({"stage": "parse", "rows_parsed": 5})
+        report({"stage": "convert", "rows_converted": 4, "rows_rejected": 1})
+        report({"stage": "load", "batch": 1, "loaded": 3, "rows_loaded": 3, "total_rows": 4,
+                "rejects": [{"row": 2, "error": "x"}], "error": None})
+
+    job = manager.submit("teste", work)
+    _wait(job)
+
+    assert job.progress["rows_parsed"] == 5
+    assert job.progress["rows_loaded"] == 3
+    assert job.progress["rows_rejected"] == 2
+    manager.shutdown()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Testes do motor de carregamento paralelo com retry
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.loader import (
+    AdaptiveBatchSizer, BatchLoader, BatchLoadError, PostgresCopyBackend, SupabaseRestBackend,
+    create_load_backend, deduplicate_rows, error_status_code, frame_to_records, is_timeout_error,
+    is_transient_error, natural_key_for, resolve_backend_name
+)
+
+
+class FakeBackend:
+    """Backend em memória que registra os batches recebidos"""
+
+    name = "fake"
+
+    def __init__(self, failures=None, latency=0.0):
+        self.failures = dict(failures or {})
+        self.latency = latency
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def send(self, table, batch_df):
+        first_id = int(batch_df["id"].iloc[0]) if hasattr(batch_df, "iloc") else batch_df[0]["id"]
+        with self.lock:
+            self.calls.append(first_id)
+            pending = self.failures.get(first_id)
+            if pending:
+                self.failures[first_id] = pending[1:]
+        time.sleep(self.latency)
+        if pending:
+            raise pending[0]
+        return len(batch_df)
+
+
+def _frame(rows):
+    return pd.DataFrame({"id": range(rows), "valor": [float(i) for i in range(rows)]})
+
+
+def _loader(backend, **kwargs):
+    options = dict(workers=4, max_retries=3, backoff_base=0.01, backoff_max=0.05, sleep=lambda _: None)
+    options.update(kwargs)
+    return BatchLoader(backend, **options)
+
+
+def test_classificacao_de_erros_passageiros():
+    """429/5xx e timeouts são repetidos; erros de dados não"""
+    assert is_transient_error(BatchLoadError("limite", status_code=429))
+    assert is_transient_error(BatchLoadError("gateway", status_code=502))
+    assert is_transient_error(TimeoutError("read timed out"))
+    assert not is_transient_error(BatchLoadError("violates not-null constraint", status_code=400))
+    assert not is_transient_error(ValueError("invalid input syntax for type date"))
+
+
+class FakeAPIError(Exception):
+    """Como o APIError do postgrest: `code` é o SQLSTATE"""
+
+    def __init__(self, code):
+        super().__init__(f"erro {code}")
+        self.code = code
+
+
+def test_sqlstate_nao_e_status_http():
+    """SQLSTATE de conexão, rollback, recursos e desligamento são repetidos; violações de dados não"""
+    for code in ("40001", "40P01", "57014", "57P01", "08006", "53300"):
+        assert is_transient_error(FakeAPIError(code)), code
+    for code in ("23505", "23502", "22P02", "42703", "PGRST116"):
+        assert not is_transient_error(FakeAPIError(code)), code
+    assert error_status_code(FakeAPIError("40001")) is None
+    assert is_timeout_error(FakeAPIError("57014"))
+
+
+def test_registros_com_nulos():
+    """NaN vira None na conversão do batch"""
+    records = frame_to_records(pd.DataFrame({"a": [1.5, None], "b": ["x", None]}))
+
+    assert records == [{"a": 1.5, "b": "x"}, {"a": None, "b": None}]
+
+
+def test_retry_recupera_erro_passageiro():
+    """Batch com 503 é reenviado e a carga termina completa"""
+    backend = FakeBackend(failures={100: [BatchLoadError("indisponível", status_code=503)] * 2})
+
+    report = _loader(backend).load("tabela", _frame(250), batch_size=100)
+
+    assert report["rows_loaded"] == 250
+    assert report["rows_failed"] == 0
+    assert report["retries"] == 2
+    assert backend.calls.count(100) == 3
+
+
+def test_erro_permanente_falha_so_o_batch():
+    """Erro de dados não é repetido e os demais batches seguem (sem divisão: max_rejects=0)"""
+    backend = FakeBackend(failures={0: [BatchLoadError("duplicate key", status_code=409)]})
+
+    report = _loader(backend, max_rejects=0).load("tabela", _frame(250), batch_size=100)
+
+    assert report["rows_loaded"] == 150
+    assert report["rows_failed"] == 100
+    assert report["retries"] == 0
+    assert report["errors"] == ["Batch 1: duplicate key"]
+
+
+def test_progresso_em_ordem_e_envio_concorrente():
+    """Callbacks chegam na ordem dos batches e o tempo escala com os workers"""
+    backend = FakeBackend(latency=0.05)
+    progress = []
+
+    report = _loader(backend, workers=8).load("tabela", _frame(1600), batch_size=100,
+                                              progress_callback=lambda p: progress.append(p["batch"]))
+
+    assert progress == list(range(1, 17))
+    assert report["rows_loaded"] == 1600
+    assert report["elapsed_seconds"] < 16 * 0.05 / 2
+
+
+def test_backoff_exponencial_com_teto():
+    """Atraso máximo dobra a cada tentativa até o teto"""
+    loader = BatchLoader(FakeBackend(), workers=1, max_retries=5, backoff_base=0.5, backoff_max=3.0,
+                         jitter=lambda: 1.0)
+
+    assert [loader.backoff_delay(n) for n in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def _sizer(**kwargs):
+    options = dict(target_bytes=10_000, min_bytes=1_000, max_bytes=40_000, target_latency_seconds=1.0,
+                   increase_bytes=5_000, max_rows=10_000)
+    options.update(kwargs)
+    return AdaptiveBatchSizer(**options)
+
+
+def test_aimd_cresce_aditivo_e_encolhe_multiplicativo():
+    """Latência baixa soma, latência alta e 413 multiplicam para baixo"""
+    sizer = _sizer()
+    sizer.bytes_per_row = 100.0
+
+    assert sizer.next_rows() == 100
+    sizer.on_success(100, latency_seconds=0.2)
+    assert sizer.next_rows() == 150
+    sizer.on_success(150, latency_seconds=3.0)
+    assert sizer.next_rows() == 112
+    sizer.on_overload()
+    assert sizer.next_rows() == 56
+
+    for _ in range(20):
+        sizer.on_success(56, latency_seconds=0.1)
+    assert sizer.next_rows() == 400  # teto de max_bytes
+
+
+def test_payload_grande_divide_batch():
+    """413 divide o batch ao meio sem perder linhas e reduz o alvo"""
+
+    class LimitedBackend(FakeBackend):
+        def send(self, table, batch_df):
+            if len(batch_df) > 60:
+                raise BatchLoadError("Payload Too Large", status_code=413)
+            return super().send(table, batch_df)
+
+    sizer = _sizer(target_bytes=40_000)
+    report = _loader(LimitedBackend(), workers=1, sizer=sizer).load("tabela", _frame(500))
+
+    assert report["rows_loaded"] == 500
+    assert report["splits"] > 0
+    assert report["retries"] == 0
+    assert report["batch_sizing"]["overloads"] == report["splits"]
+
+
+def test_timeout_de_conexao_nao_divide_batch():
+    """Servidor inacessível (ConnectTimeout): só o retry normal, sem dividir até linhas isoladas"""
+
+    class UnreachableBackend(FakeBackend):
+        def send(self, table, batch_df):
+            with self.lock:
+                self.calls.append(len(batch_df))
+            raise httpx.ConnectTimeout("timed out")
+
+    backend = UnreachableBackend()
+    report = _loader(backend, workers=1, sizer=_sizer(target_bytes=40_000)).load("tabela", _frame(256))
+
+    assert report["splits"] == 0
+    assert report["rows_loaded"] == 0
+    assert len(backend.calls) == report["batches_processed"] * 4  # 1 envio + 3 retries por batch
+    assert is_timeout_error(httpx.ReadTimeout("timed out"))
+    assert is_timeout_error(httpx.WriteTimeout("timed out"))
+    assert not is_timeout_error(httpx.PoolTimeout("timed out"))
+    assert not is_timeout_error(httpx.ConnectError("connection refused"))
+
+
+class BadRowBackend(FakeBackend):
+    """Falha o batch inteiro (como uma transação) se contiver alguma linha com id ruim"""
+
+    def __init__(self, bad_ids):
+        super().__init__()
+        self.bad_ids = set(bad_ids)
+        self.sends = 0
+
+    def send(self, table, batch_df):
+        with self.lock:
+            self.sends += 1
+        bad = self.bad_ids.intersection(batch_df["id"])
+        if bad:
+            raise BatchLoadError(f"invalid input syntax for type integer: {min(bad)}", status_code=400)
+        return len(batch_df)
+
+
+def test_divisao_isola_linhas_rejeitadas():
+    """Batch com linhas ruins é dividido até isolá-las; as boas são carregadas"""
+    backend = BadRowBackend(bad_ids=[137, 422])
+    frame = _frame(1000)
+
+    report = _loader(backend, workers=2).load("tabela", frame, batch_size=500,
+                                              row_numbers=[i + 2 for i in frame.index])
+
+    assert report["rows_loaded"] == 998
+    assert report["rows_failed"] == 2
+    assert [(r["row"], r["position"]) for r in report["rejects"]] == [(139, 137), (424, 422)]
+    assert "137" in report["rejects"][0]["error"]
+    # 2 envios iniciais + 2 * log2(500) por linha ruim, não um envio por linha
+    assert backend.sends <= 2 + 2 * 2 * 9
+
+
+def test_divisao_respeita_limite_de_rejeitadas():
+    """Acima de max_rejects o batch falha inteiro, sem novas divisões"""
+    backend = BadRowBackend(bad_ids=range(100))
+
+    report = _loader(backend, workers=1, max_rejects=5).load("tabela", _frame(100), batch_size=100)
+
+    assert report["rows_loaded"] == 0
+    assert report["rows_rejected"] == 100
+    assert report["rejects"][0]["row"] == 1
+    assert backend.sends < 30
+
+
+def test_lista_de_registros():
+    """Lista de dicionários (upload direto) também é aceita"""
+    records = [{"id": i, "nome": f"curral {i}"} for i in range(30)]
+
+    report = _loader(FakeBackend()).load("tabela", records, batch_size=7)
+
+    assert report["rows_loaded"] == 30
+    assert report["batches_processed"] == 5
+
+
+class FakeCopy:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        self.sink.append(data)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement):
+        self.connection.executed.append(statement)
+
+    def copy(self, statement):
+        self.connection.statements.append(statement)
+        if self.connection.fail:
+            raise BatchLoadError("invalid input syntax for type integer")
+        return FakeCopy(self.connection.payloads)
+
+
+class FakeConnection:
+    """Conexão no formato do psycopg 3, guardando os COPY recebidos"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.statements = []
+        self.executed = []
+        self.payloads = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_copy_gera_csv_com_nulos_e_inteiros():
+    """COPY recebe CSV com \\N para nulos e inteiros sem casa decimal"""
+    connection = FakeConnection()
+    backend = PostgresCopyBackend(connection_factory=lambda: connection)
+    frame = pd.DataFrame({"id_curral": [1.0, None, 3.0], "nome": ["A, 1", None, 'B "x"'], "kg": [1.5, 2.0, None]})
+
+    assert backend.send("public.etl_staging_02_desvio_carregamento", frame) == 3
+    backend.close()
+
+    assert connection.statements == [
+        'COPY "public"."etl_staging_02_desvio_carregamento" ("id_curral", "nome", "kg") '
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    ]
+    assert connection.payloads[0].splitlines() == ['1,"A, 1",1.5', '\\N,\\N,2.0', '3,"B ""x""",\\N']
+    assert connection.commits == 1
+    assert connection.closed
+
+
+def test_copy_erro_faz_rollback():
+    """Falha no COPY desfaz a transação do batch"""
+    connection = FakeConnection(fail=True)
+    report = _loader(PostgresCopyBackend(connection_factory=lambda: connection), workers=1, max_rejects=0).load(
+        "tabela", _frame(10), batch_size=10)
+
+    assert report["rows_failed"] == 10
+    assert report["backend"] == "copy"
+    assert connection.rollbacks == 1
+
+
+def test_backend_por_tabela(monkeypatch):
+    """Configuração por tabela escolhe COPY e sem DATABASE_URL volta para REST"""
+    from config.settings import get_settings
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "loader_table_backends", {"etl_staging_01_historico_consumo": "copy"})
+    monkeypatch.setattr(settings, "database_url", "")
+
+    assert resolve_backend_name("etl_staging_01_historico_consumo") == "copy"
+    assert resolve_backend_name("etl_staging_02_desvio_carregamento") == "rest"
+    assert create_load_backend("etl_staging_01_historico_consumo", supabase_client=object()).name == "rest"
+
+
+def test_deduplicacao_pela_chave_natural():
+    """Última ocorrência de cada chave é mantida, em DataFrame e em lista"""
+    key = ["data", "carregamento"]
+    frame = pd.DataFrame({"data": ["2024-01-01", "2024-01-01", "2024-01-02"],
+                          "carregamento": ["1", "1", "1"], "kg": [10, 12, 5]})
+
+    deduplicated, removed = deduplicate_rows(frame, key)
+    assert removed == 1
+    assert deduplicated["kg"].tolist() == [12, 5]
+
+    records, removed = deduplicate_rows(frame.to_dict("records"), key)
+    assert removed == 1
+    assert [r["kg"] for r in records] == [12, 5]
+
+
+def test_upsert_rest_usa_on_conflict():
+    """Modo upsert chama upsert com a chave natural como on_conflict"""
+    calls = []
+
+    class Query:
+        def __init__(self, data):
+            self.data = data
+
+        def execute(self):
+            return self
+
+    class Table:
+        def upsert(self, records, on_conflict=""):
+            calls.append(on_conflict)
+            return Query(records)
+
+    class Client:
+        def table(self, name):
+            return Table()
+
+    backend = SupabaseRestBackend(Client(), load_mode="upsert", conflict_columns=["data", "hora_carregamento"])
+
+    assert backend.send("etl_staging_02_desvio_carregamento", _frame(3)) == 3
+    assert calls == ["data,hora_carregamento"]
+
+
+def test_upsert_copy_via_tabela_temporaria():
+    """COPY em modo upsert passa por tabela temporária e ON CONFLICT"""
+    connection = FakeConnection()
+    backend = PostgresCopyBackend(connection_factory=lambda: connection, load_mode="upsert", conflict_columns=["id"])
+
+    backend.send("tabela", _frame(2))
+
+    assert connection.executed[0].startswith('CREATE TEMP TABLE "_etl_upsert_')
+    assert connection.statements[0].startswith('COPY "_etl_upsert_')
+    assert connection.executed[1].endswith('ON CONFLICT ("id") DO UPDATE SET "valor" = EXCLUDED."valor"')
+
+
+def test_chave_natural_configurada():
+    """Tabelas conhecidas têm chave natural; upsert sem chave é recusado"""
+    assert natural_key_for("etl_staging_02_desvio_carregamento") == ["data", "hora_carregamento", "carregamento", "ingrediente"]
+    assert natural_key_for("tabela_sem_chave") is None
+
+    try:
+        create_load_backend("tabela_sem_chave", supabase_client=object(), load_mode="upsert")
+        assert False, "upsert sem chave natural deveria falhar"
+    except ValueError:
+        pass
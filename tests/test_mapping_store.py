@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Testes da memória de mapeamentos por assinatura de cabeçalhos
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.mapping_store import MappingStore, header_signature, normalize_column_name
+
+HEADERS = ["data", "hora", "nro_carregamento", "ingrediente", "previsto_kg"]
+CONFIRMED = [
+    {"csv_column": "data", "db_column": "data", "data_type": "DATE", "enabled": True},
+    {"csv_column": "hora", "db_column": "hora_carregamento", "data_type": "TEXT", "enabled": True},
+    {"csv_column": "nro_carregamento", "db_column": "carregamento", "data_type": "TEXT", "enabled": True},
+    {"csv_column": "ingrediente", "db_column": "ingrediente", "data_type": "TEXT", "enabled": True},
+    {"csv_column": "previsto_kg", "db_column": "previsto_kg", "data_type": "NUMERIC", "enabled": False},
+]
+TABLE = "etl_staging_02_desvio_carregamento"
+
+
+def test_normalizacao_equivale_a_limpeza_de_colunas():
+    """Normalização remove pontuação e espaços como _clean_column_name"""
+    assert normalize_column_name(" Previsto (kg) ") == "previsto_kg"
+    assert normalize_column_name("Nº  Carregamento") == "nº_carregamento"
+
+
+def test_assinatura_independe_da_ordem():
+    """Mesmos cabeçalhos em outra ordem geram a mesma assinatura"""
+    assert header_signature(HEADERS) == header_signature(list(reversed(HEADERS)))
+
+
+def test_mapeamento_confirmado_volta_inteiro(tmp_path):
+    """Mesma assinatura e tabela retornam o mapeamento confirmado"""
+    store = MappingStore(tmp_path / "mapping_store.json")
+    store.record(HEADERS, TABLE, CONFIRMED)
+
+    learned = MappingStore(tmp_path / "mapping_store.json").lookup(HEADERS, TABLE)
+
+    assert set(learned) == set(HEADERS)
+    assert learned["hora"]["db_column"] == "hora_carregamento"
+    assert learned["previsto_kg"]["enabled"] is False
+    assert learned["data"]["source"] == "learned_signature"
+
+
+def test_colunas_novas_ficam_de_fora(tmp_path):
+    """Arquivo com coluna nova reaproveita as conhecidas e deixa a nova para a heurística"""
+    store = MappingStore(tmp_path / "mapping_store.json")
+    store.record(HEADERS, TABLE, CONFIRMED)
+
+    learned = store.lookup(HEADERS + ["status"], TABLE)
+
+    assert "status" not in learned
+    assert learned["nro_carregamento"]["db_column"] == "carregamento"
+    assert learned["nro_carregamento"]["source"] == "learned_column"
+
+
+def test_outra_tabela_nao_reaproveita(tmp_path):
+    """Mapeamento é específico da tabela de destino"""
+    store = MappingStore(tmp_path / "mapping_store.json")
+    store.record(HEADERS, TABLE, CONFIRMED)
+
+    assert store.lookup(HEADERS, "etl_staging_03_desvio_distribuicao") == {}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento de rejeitadas e da recarga das corrigidas
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.loader import BatchLoadError
+from etl.reject_store import (
+    STAGE_CONVERSION, STAGE_DIMENSION, STAGE_LOAD, RejectStore, read_corrections, reject_frame
+)
+from etl.serializer import encode_envelope
+
+
+class RecordingBackend:
+    """Backend em memória: rejeita linhas com peso não numérico"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.loaded = []
+
+    def send(self, table, batch):
+        if any(not str(value).replace('.', '').isdigit() for value in batch["peso"]):
+            raise BatchLoadError("invalid input syntax for type numeric", status_code=400)
+        self.loaded.extend(batch["curral"].tolist())
+        return len(batch)
+
+
+def _store(tmp_path):
+    store = RejectStore(tmp_path / "rejects")
+    rows = pd.DataFrame({"curral": ["A1", "Z9", "B2"], "peso": [10.5, 7.0, None], "data": pd.to_datetime(["2024-05-01"] * 3)})
+    manifest = store.save("run_1", "etl_staging_01_historico_consumo", [
+        reject_frame(rows.iloc[[1]], [12], STAGE_DIMENSION, "curral: 'Z9' não existe em dim_curral"),
+        reject_frame(rows.iloc[[2]].assign(peso="abc"), [5], STAGE_CONVERSION, "peso: 'abc' não é NUMERIC"),
+        reject_frame(rows.iloc[[0]], [40], STAGE_LOAD, "duplicate key")
+    ], source_file="/tmp/01_historico_consumo.csv", load_mode="insert")
+    return store, manifest
+
+
+def test_grava_rejeitadas_com_linha_e_motivo(tmp_path):
+    """Manifesto conta por etapa; linhas ficam ordenadas pela linha de origem, em texto"""
+    store, manifest = _store(tmp_path)
+
+    assert manifest["pending"] == 3
+    assert manifest["rejected"] == {STAGE_DIMENSION: 1, STAGE_CONVERSION: 1, STAGE_LOAD: 1}
+    assert manifest["source_file"] == "01_historico_consumo.csv"
+
+    frame = store.read("run_1")
+    assert frame["_row"].tolist() == [5, 12, 40]
+    assert frame["peso"].tolist() == ["abc", "7", "10.5"]
+    assert frame["data"].tolist() == ["2024-05-01"] * 3
+    assert not frame["_corrected"].any()
+    assert store.runs()[0]["run_id"] == "run_1"
+
+
+def test_sem_rejeitadas_nao_grava(tmp_path):
+    """Execução sem rejeitadas não cria diretório"""
+    store = RejectStore(tmp_path / "rejects")
+
+    assert store.save("run_vazio", "tabela", [pd.DataFrame()]) is None
+    assert store.runs() == []
+
+
+def test_recarrega_so_as_corrigidas(tmp_path):
+    """Só linhas corrigidas são enviadas; as que falham de novo continuam pendentes"""
+    store, _ = _store(tmp_path)
+    corrections = read_corrections(
+        Path(_write(tmp_path / "corr.csv", "_row,peso\n5,8.25\n12,xx\n999,1\n")))
+
+    result = store.apply_corrections("run_1", corrections)
+    assert result["corrected"] == 2
+    assert result["unknown_rows"] == [999]
+
+    backend = RecordingBackend()
+    reload = store.reload("run_1", backend=backend, workers=1)
+
+    assert backend.loaded == ["B2"]
+    assert reload["attempted"] == 2
+    assert reload["reloaded"] == 1
+    assert reload["still_rejected"] == 1
+
+    frame = store.read("run_1")
+    assert frame["_row"].tolist() == [12, 40]
+    assert frame.loc[frame["_row"] == 12, "_stage"].item() == STAGE_LOAD
+    assert not frame["_corrected"].any()
+    assert store.manifest("run_1")["reloads"][0]["reloaded"] == 1
+
+
+def test_recarga_com_banco_fora_do_ar_nao_perde_linhas(tmp_path, monkeypatch):
+    """Erro passageiro sem mais tentativas: as linhas continuam pendentes e corrigidas"""
+    from config.settings import get_settings
+
+    class OutageBackend:
+        name = "fake"
+
+        def send(self, table, batch):
+            raise BatchLoadError("service unavailable", status_code=503)
+
+    monkeypatch.setattr(get_settings(), "max_retries", 0)
+    store, _ = _store(tmp_path)
+    store.apply_corrections("run_1", read_corrections(Path(_write(tmp_path / "corr.csv", "_row,peso\n5,8.25\n"))))
+
+    result = store.reload("run_1", backend=OutageBackend(), workers=1)
+
+    assert result["reloaded"] == 0
+    assert result["still_rejected"] == 0
+    assert result["not_sent"] == 1
+    frame = store.read("run_1")
+    assert frame["_row"].tolist() == [5, 12, 40]
+    assert frame.loc[frame["_row"] == 5, "_corrected"].item()
+
+
+def test_recarga_nao_bloqueia_o_store_durante_o_envio(tmp_path):
+    """Correções gravadas enquanto o lote está no banco não se perdem nem esperam o envio"""
+    import threading
+
+    store, _ = _store(tmp_path)
+    corrected = []
+
+    class CorrectingBackend(RecordingBackend):
+        def send(self, table, batch):
+            worker = threading.Thread(target=lambda: corrected.append(store.apply_corrections(
+                "run_1", pd.DataFrame({"_row": ["12"], "peso": ["9"]}))))
+            worker.start()
+            worker.join(timeout=5)
+            return super().send(table, batch)
+
+    result = store.reload("run_1", rows=[40], only_corrected=False, backend=CorrectingBackend())
+
+    assert result["reloaded"] == 1
+    assert corrected and corrected[0]["corrected"] == 1
+    frame = store.read("run_1")
+    assert frame["_row"].tolist() == [5, 12]
+    assert frame.loc[frame["_row"] == 12, "peso"].item() == "9"
+    assert frame.loc[frame["_row"] == 12, "_corrected"].item()
+
+
+def test_retomada_mantem_correcoes_das_linhas_nao_reenviadas(tmp_path):
+    """save na retomada troca só as linhas reenviadas; correções e recargas das demais ficam"""
+    store, _ = _store(tmp_path)
+    store.apply_corrections("run_1", pd.DataFrame({"_row": ["5"], "peso": ["8.25"]}))
+    store.reload("run_1", rows=[12], only_corrected=False, backend=RecordingBackend())
+
+    rows = pd.DataFrame({"curral": ["B2", "A1"], "peso": ["abc", 10.5]})
+    manifest = store.save("run_1", "etl_staging_01_historico_consumo", [
+        reject_frame(rows.iloc[[0]], [5], STAGE_CONVERSION, "peso: 'abc' não é NUMERIC"),
+        reject_frame(rows.iloc[[1]], [40], STAGE_LOAD, "duplicate key")
+    ], load_mode="insert", resent_rows=[40])
+
+    assert len(manifest["reloads"]) == 1
+    frame = store.read("run_1")
+    assert frame["_row"].tolist() == [5, 40]
+    assert frame.loc[frame["_row"] == 5, "peso"].item() == "8.25"
+    assert frame.loc[frame["_row"] == 5, "_corrected"].item()
+
+    # Reenviada e carregada: sai; sem rejeitadas restantes a execução é removida
+    assert store.save("run_1", "etl_staging_01_historico_consumo", [
+        reject_frame(rows.iloc[[0]], [5], STAGE_CONVERSION, "peso: 'abc' não é NUMERIC")
+    ], resent_rows=[5, 40])["pending"] == 1
+    assert store.save("run_1", "etl_staging_01_historico_consumo", [], resent_rows=[5]) is None
+    assert store.runs() == []
+
+
+def test_recarga_por_linhas_escolhidas(tmp_path):
+    """rows + only_corrected=False recarrega linhas específicas sem correção"""
+    store, _ = _store(tmp_path)
+    backend = RecordingBackend()
+
+    result = store.reload("run_1", rows=[40], only_corrected=False, backend=backend)
+
+    assert backend.loaded == ["A1"]
+    assert result["pending"] == 2
+
+
+def test_execucao_inexistente_ou_invalida(tmp_path):
+    """run_id desconhecido ou com caminho gera KeyError"""
+    store = RejectStore(tmp_path / "rejects")
+
+    for run_id in ["nao_existe", "../fora"]:
+        try:
+            store.manifest(run_id)
+            assert False, "deveria falhar"
+        except KeyError:
+            pass
+
+
+def test_pagina_serializada_em_json(tmp_path):
+    """Linhas em texto (com nulos) passam pelo encoder colunar"""
+    store, _ = _store(tmp_path)
+    frame = store.read("run_1")
+    frame.loc[0, "curral"] = None
+
+    payload = json.loads(encode_envelope({"status": "success"}, "rows", frame))
+
+    assert payload["rows"][0]["curral"] is None
+    assert payload["rows"][0]["_row"] == 5
+
+
+def _write(path, content):
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+def test_endpoints_das_rejeitadas(tmp_path, monkeypatch):
+    """Listar, paginar, baixar e remover passam pelo pool de I/O e respondem como antes"""
+    from fastapi.testclient import TestClient
+
+    from api import main
+
+    store, _ = _store(tmp_path)
+    monkeypatch.setattr(main, "get_reject_store", lambda: store)
+    client = TestClient(main.app)
+
+    assert [run["run_id"] for run in client.get("/etl/rejects").json()["runs"]] == ["run_1"]
+    page = client.get("/etl/rejects/run_1", params={"offset": 1, "limit": 1}).json()
+    assert page["total"] == 3
+    assert [row["_row"] for row in page["rows"]] == [12]
+    assert client.get("/etl/rejects/run_1/download").text.splitlines()[0].startswith("_row,_stage")
+    assert client.get("/etl/rejects/nao_existe").status_code == 404
+    assert client.delete("/etl/rejects/run_1").json()["removed"] is True
+    assert client.get("/etl/rejects").json()["runs"] == []
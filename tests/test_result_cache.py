@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de resultados do Quick ETL (result_id)
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.loader import BatchLoader
+from etl.result_cache import ResultCache, ResultExpiredError, decode_cursor, page_rows, select_rows
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingBackend:
+    """Backend em memória que registra os currais recebidos"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.loaded = []
+
+    def send(self, table, batch):
+        self.loaded.extend(batch["curral"].tolist())
+        return len(batch)
+
+
+def _frame(rows=3):
+    return pd.DataFrame({"curral": [f"C{i}" for i in range(rows)], "kg": [float(i) for i in range(rows)]})
+
+
+def test_guarda_e_recupera_pelo_result_id():
+    """O mesmo DataFrame volta pelo id, com metadados na descrição"""
+    cache = ResultCache()
+    df = _frame()
+
+    result_id = cache.put(df, file_id="consumo.csv")
+
+    assert cache.get(result_id) is df
+    info = cache.describe(result_id)
+    assert info["rows"] == 3
+    assert info["columns"] == ["curral", "kg"]
+    assert info["file_id"] == "consumo.csv"
+
+
+def test_expira_pelo_ttl():
+    """Resultado sem acesso além do TTL deixa de existir"""
+    clock = FakeClock()
+    cache = ResultCache(ttl_seconds=60, clock=clock)
+    result_id = cache.put(_frame())
+
+    clock.now = 61
+    try:
+        cache.get(result_id)
+        assert False, "deveria ter expirado"
+    except ResultExpiredError:
+        pass
+    assert cache.stats()["entries"] == 0
+
+
+def test_descarta_o_menos_usado_quando_passa_do_limite():
+    """LRU: o acesso recente protege o resultado da remoção"""
+    size = int(_frame().memory_usage(index=True, deep=True).sum())
+    cache = ResultCache(max_bytes=size * 2)
+    first, second = cache.put(_frame()), cache.put(_frame())
+
+    cache.get(first)
+    third = cache.put(_frame())
+
+    assert cache.discard(second) is False
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_resultado_maior_que_o_cache_nao_e_guardado():
+    """MemoryError em vez de esvaziar o cache inteiro"""
+    cache = ResultCache(max_bytes=10)
+
+    try:
+        cache.put(_frame())
+        assert False, "deveria exceder o limite"
+    except MemoryError:
+        pass
+
+
+def test_upload_pelo_resultado_sem_as_excluidas():
+    """Posições excluídas não são enviadas; rejeitadas usam a posição no resultado"""
+    df = _frame(5)
+    selected = select_rows(df, [1, 3, 99])
+
+    assert selected.index.tolist() == [0, 2, 4]
+
+    backend = RecordingBackend()
+    report = BatchLoader(backend, workers=1).load("tabela", selected, row_numbers=(selected.index + 1).tolist())
+
+    assert backend.loaded == ["C0", "C2", "C4"]
+    assert report["rows_loaded"] == 3
+    assert select_rows(df).index.tolist() == list(range(5))
+
+
+def test_paginacao_por_cursor_percorre_tudo_uma_vez():
+    """Seguindo next_cursor, cada linha aparece uma vez e a última página não tem cursor"""
+    df = pd.DataFrame({"id": range(25)})
+    seen, cursor = [], None
+    while True:
+        page, cursor = page_rows(df, "r1", cursor, 10)
+        seen.extend(page["id"].tolist())
+        if cursor is None:
+            break
+
+    assert seen == list(range(25))
+
+
+def test_cursor_de_outro_resultado_e_recusado():
+    """Cursor adulterado ou de outro result_id é ValueError"""
+    _, cursor = page_rows(pd.DataFrame({"id": range(5)}), "r1", None, 2)
+
+    assert decode_cursor(cursor, "r1") == 2
+    for bad in (cursor, "###", "bm9wZQ"):
+        try:
+            decode_cursor(bad, "r2")
+            assert False, f"deveria recusar {bad}"
+        except ValueError:
+            pass
+
+
+def test_pagina_sem_cache_devolve_tudo(tmp_path, monkeypatch):
+    """Resultado que não coube no cache: response_mode=page devolve todas as linhas (não há como paginar)"""
+    from api import main
+    from etl.conectaboi_etl_smart import ConectaBoiETL
+
+    api_dir = tmp_path / "backend" / "api"
+    api_dir.mkdir(parents=True)
+    (tmp_path / "data" / "temp").mkdir(parents=True)
+    (tmp_path / "data" / "temp" / "consumo.csv").write_text(
+        "Curral;Kg\n" + "".join(f"C{i};{i}\n" for i in range(5)), encoding="utf-8")
+    monkeypatch.chdir(api_dir)
+    monkeypatch.setattr(main, "etl_instance", ConectaBoiETL(connect=False))
+    monkeypatch.setattr(main.get_settings(), "result_page_rows", 2)
+
+    cache = ResultCache(max_bytes=1)
+    monkeypatch.setattr(main, "get_result_cache", lambda: cache)
+
+    request = main.ETLProcessRequest(file_id="consumo.csv", transformations={}, excluded_columns=[],
+                                     skip_first_line=False, response_mode="page")
+    payload = json.loads(main._run_process_quick(request))
+
+    assert payload["result_id"] is None
+    assert payload["data_complete"] is True
+    assert payload["next_cursor"] is None
+    assert len(payload["data"]) == 5
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de schemas com TTL e coalescência de requisições
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.schema_cache import SchemaCache
+
+
+def test_segunda_chamada_nao_consulta_loader():
+    """Schema já conhecido deve vir do cache"""
+    cache = SchemaCache(ttl_seconds=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"table_name": "dim_curral", "columns": []}
+
+    cache.get("dim_curral", loader)
+    schema = cache.get("dim_curral", loader)
+
+    assert len(calls) == 1
+    assert schema["table_name"] == "dim_curral"
+
+
+def test_entrada_expira_apos_ttl():
+    """Após o TTL o schema deve ser consultado novamente"""
+    cache = SchemaCache(ttl_seconds=0.01)
+    calls = []
+
+    cache.get("t", lambda: calls.append(1) or {})
+    time.sleep(0.02)
+    cache.get("t", lambda: calls.append(1) or {})
+
+    assert len(calls) == 2
+
+
+def test_invalidacao_manual():
+    """invalidate() força nova consulta"""
+    cache = SchemaCache(ttl_seconds=60)
+    calls = []
+
+    cache.get("t", lambda: calls.append(1) or {})
+    assert cache.invalidate("t") == 1
+    cache.get("t", lambda: calls.append(1) or {})
+
+    assert len(calls) == 2
+
+
+def test_chamadas_concorrentes_sao_coalescidas():
+    """Várias threads pedindo a mesma tabela fazem uma única consulta"""
+    cache = SchemaCache(ttl_seconds=60)
+    calls = []
+    release = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(timeout=2)
+        return {"columns": [{"column_name": "id"}]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("t", slow_loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_erro_nao_fica_em_cache():
+    """Falha na consulta é propagada e a próxima chamada tenta de novo"""
+    cache = SchemaCache(ttl_seconds=60)
+
+    def failing():
+        raise RuntimeError("PostgREST indisponível")
+
+    try:
+        cache.get("t", failing)
+        assert False, "deveria propagar o erro"
+    except RuntimeError:
+        pass
+
+    assert cache.get("t", lambda: {"ok": True}) == {"ok": True}
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Testes do registro de schemas carregado do OpenAPI do PostgREST
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.schema_registry import SchemaRegistry, parse_openapi_schemas
+
+# Trecho no formato publicado pelo PostgREST em GET /rest/v1/
+OPENAPI_DOCUMENT = {
+    "swagger": "2.0",
+    "definitions": {
+        "etl_staging_02_desvio_carregamento": {
+            "required": ["id", "data"],
+            "properties": {
+                "id": {"description": "Note:\nThis is a Primary Key.<pk/>", "format": "bigint", "type": "integer"},
+                "data": {"format": "date", "type": "string"},
+                "hora_carregamento": {"format": "time without time zone", "type": "string"},
+                "previsto_kg": {"format": "numeric", "type": "number"},
+                "processed": {"default": False, "format": "boolean", "type": "boolean"}
+            },
+            "type": "object"
+        },
+        "dim_curral": {
+            "required": ["id"],
+            "properties": {
+                "id": {"format": "bigint", "type": "integer"},
+                "nome": {"format": "text", "type": "string"}
+            },
+            "type": "object"
+        },
+        "profiles": {
+            "properties": {"id": {"format": "uuid", "type": "string"}},
+            "type": "object"
+        }
+    }
+}
+
+
+def test_filtra_apenas_staging_e_dimensoes():
+    """Somente tabelas etl_staging_* e dim_* entram no registro"""
+    tables = parse_openapi_schemas(OPENAPI_DOCUMENT)
+
+    assert set(tables) == {"etl_staging_02_desvio_carregamento", "dim_curral"}
+
+
+def test_tipos_e_nulabilidade_reais():
+    """Tipos vêm de `format` e NOT NULL de `required`"""
+    columns = {c["column_name"]: c for c in parse_openapi_schemas(OPENAPI_DOCUMENT)["etl_staging_02_desvio_carregamento"]}
+
+    assert columns["data"]["data_type"] == "date"
+    assert columns["data"]["is_nullable"] == "NO"
+    assert columns["hora_carregamento"]["data_type"] == "time without time zone"
+    assert columns["previsto_kg"]["is_nullable"] == "YES"
+    assert columns["id"]["is_primary_key"] is True
+    assert columns["processed"]["column_default"] == "False"
+    assert [c["ordinal_position"] for c in columns.values()] == [1, 2, 3, 4, 5]
+
+
+def test_registro_substitui_conteudo():
+    """replace_all publica as tabelas e devolve cópias"""
+    registry = SchemaRegistry()
+    registry.replace_all(parse_openapi_schemas(OPENAPI_DOCUMENT), source="postgrest_openapi")
+
+    columns = registry.get_columns("dim_curral")
+    columns[0]["column_name"] = "alterado"
+
+    assert registry.is_loaded
+    assert registry.tables() == ["dim_curral", "etl_staging_02_desvio_carregamento"]
+    assert registry.get_columns("dim_curral")[0]["column_name"] == "id"
+    assert registry.get_columns("inexistente") is None
+
+
+def test_snapshot_permite_partida_sem_rede(tmp_path):
+    """Snapshot salvo é recarregado com o mesmo conteúdo e hash"""
+    original = SchemaRegistry()
+    original.replace_all(parse_openapi_schemas(OPENAPI_DOCUMENT), source="postgrest_openapi")
+    snapshot_path = original.save_snapshot(tmp_path / "schema_snapshot.json")
+
+    restored = SchemaRegistry()
+
+    assert restored.warm_start(snapshot_path)
+    assert restored.source == "snapshot"
+    assert restored.content_hash == original.content_hash
+    assert restored.snapshot() == original.snapshot()
+
+
+def test_snapshot_corrompido_e_ignorado(tmp_path):
+    """Hash divergente ou versão diferente não carregam o snapshot"""
+    registry = SchemaRegistry()
+    registry.replace_all(parse_openapi_schemas(OPENAPI_DOCUMENT), source="postgrest_openapi")
+    snapshot_path = registry.save_snapshot(tmp_path / "schema_snapshot.json")
+
+    payload = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    payload["tables"]["dim_curral"][1]["data_type"] = "integer"
+    snapshot_path.write_text(json.dumps(payload), encoding="utf-8")
+    assert not SchemaRegistry().load_snapshot(snapshot_path)
+
+    payload = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    payload["version"] = 999
+    snapshot_path.write_text(json.dumps(payload), encoding="utf-8")
+    assert not SchemaRegistry().load_snapshot(snapshot_path)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Testes do serializador JSON colunar
+"""
+
+import gzip
+import json
+import sys
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.loader import BatchLoadError, SupabaseRestBackend, frame_to_records
+from etl import serializer
+from etl.serializer import (
+    dumps, encode_envelope, encode_frame_json, encode_rows_json, frame_to_columnar, iter_frame_ndjson
+)
+
+
+def test_nulos_viram_null():
+    """NaN, None e NaT são serializados como null"""
+    df = pd.DataFrame({
+        "texto": ["a", None],
+        "peso": [1.5, np.nan],
+        "data": pd.to_datetime(["2024-05-01", None])
+    })
+
+    rows = json.loads(encode_frame_json(df))
+
+    assert rows == [
+        {"texto": "a", "peso": 1.5, "data": "2024-05-01"},
+        {"texto": None, "peso": None, "data": None}
+    ]
+
+
+def test_inteiros_com_vazios_nao_viram_float():
+    """Coluna float com valores inteiros sai como inteiro (PostgREST rejeita 1.0 em INTEGER)"""
+    df = pd.DataFrame({"id_curral": [1.0, None, 3.0], "kg": pd.array([10, None, 7], dtype="Int64")})
+
+    encoded = encode_frame_json(df)
+
+    assert b"1.0" not in encoded
+    assert json.loads(encoded) == [
+        {"id_curral": 1, "kg": 10}, {"id_curral": None, "kg": None}, {"id_curral": 3, "kg": 7}
+    ]
+
+
+def test_datas_com_horario_e_objetos():
+    """Datetime com horário vai em ISO; Decimal, date e time em objetos são convertidos"""
+    df = pd.DataFrame({
+        "instante": pd.to_datetime(["2024-05-01 06:30:00", "2024-05-02 00:00:00"]),
+        "valor": [Decimal("1.25"), Decimal("2")],
+        "dia": [date(2024, 5, 1), None],
+        "hora": [time(6, 30), time(18, 0)],
+        "misto": [Decimal("3.5"), "x"]
+    })
+
+    rows = json.loads(encode_frame_json(df))
+
+    assert rows[0]["instante"] == "2024-05-01T06:30:00.000000"
+    assert rows[1]["instante"] == "2024-05-02T00:00:00.000000"
+    assert [row["valor"] for row in rows] == [1.25, 2.0]
+    assert [row["dia"] for row in rows] == ["2024-05-01", None]
+    assert [row["hora"] for row in rows] == ["06:30:00", "18:00:00"]
+    assert [row["misto"] for row in rows] == [3.5, "x"]
+
+
+def test_datas_em_coluna_mista_com_inteiros():
+    """date numa coluna mixed-integer vai em ISO, igual no JSON de registros e no colunar"""
+    df = pd.DataFrame({"valor": pd.Series([1, date(2024, 1, 1), None], dtype=object)})
+
+    records = json.loads(encode_frame_json(df))
+    columnar = frame_to_columnar(df)["columns"][0]
+
+    assert [record["valor"] for record in records] == [1, "2024-01-01", None]
+    assert columnar["values"] == [1, "2024-01-01", None]
+
+
+def test_mesmo_conteudo_que_registros():
+    """O JSON colunar equivale ao caminho antigo (registro a registro)"""
+    df = pd.DataFrame({"curral": ["A1", "B2", "Ção"], "kg": [1.5, 2.25, None], "trato": [1, 2, 3]})
+
+    assert json.loads(encode_frame_json(df)) == json.loads(encode_rows_json(frame_to_records(df)))
+    assert "Ção".encode("utf-8") in encode_frame_json(df)
+    assert encode_frame_json(df.iloc[0:0]) == b"[]"
+
+
+def test_envelope_com_dados_colunares():
+    """Campos do envelope são preservados e `data` vem do DataFrame"""
+    df = pd.DataFrame({"id": [1, 2]})
+
+    payload = json.loads(encode_envelope({"status": "success", "summary": {"total_records": 2}}, "data", df))
+
+    assert payload == {"status": "success", "summary": {"total_records": 2}, "data": [{"id": 1}, {"id": 2}]}
+    assert json.loads(encode_envelope({}, "data", df)) == {"data": [{"id": 1}, {"id": 2}]}
+
+
+def test_backend_rest_envia_bytes_por_http():
+    """Com URL e chave, o batch vai direto por HTTP (upsert com on_conflict)"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(201)
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    backend = SupabaseRestBackend(load_mode="upsert", conflict_columns=["data", "hora"],
+                                  rest_url="https://exemplo.supabase.co/", api_key="chave", http_client=client)
+    df = pd.DataFrame({"data": ["2024-05-01", "2024-05-01"], "hora": ["06:00", "07:00"], "kg": [1.0, 2.0]})
+
+    assert backend.send("etl_staging_03_desvio_distribuicao", df) == 2
+
+    request = requests[0]
+    assert request.url.path == "/rest/v1/etl_staging_03_desvio_distribuicao"
+    assert request.url.params["on_conflict"] == "data,hora"
+    assert request.headers["apikey"] == "chave"
+    assert "resolution=merge-duplicates" in request.headers["prefer"]
+    assert json.loads(request.content)[1] == {"data": "2024-05-01", "hora": "07:00", "kg": 2}
+
+
+def test_backend_rest_erro_http_leva_status():
+    """Resposta de erro vira BatchLoadError com o status (decide retry/divisão)"""
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(413, text="too large")))
+    backend = SupabaseRestBackend(rest_url="https://exemplo.supabase.co", api_key="chave", http_client=client)
+
+    try:
+        backend.send("tabela", [{"id": 1}])
+        assert False, "413 deveria falhar"
+    except BatchLoadError as e:
+        assert e.status_code == 413
+
+
+def test_ndjson_em_blocos():
+    """Blocos de chunk_rows linhas, um registro JSON por linha, a partir de start"""
+    df = pd.DataFrame({"curral": ["A1", None, "C3", "D4", "E5"], "kg": [1.5, 2.0, None, 4.0, 5.5]})
+
+    chunks = list(iter_frame_ndjson(df, chunk_rows=2, start=1))
+    records = [json.loads(line) for chunk in chunks for line in chunk.decode('utf-8').splitlines()]
+
+    assert len(chunks) == 2
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert records == [{"curral": None, "kg": 2}, {"curral": "C3", "kg": None},
+                       {"curral": "D4", "kg": 4}, {"curral": "E5", "kg": 5.5}]
+
+
+def columnar_to_records(payload):
+    """Decodifica o formato colunar de volta em registros (como o frontend faria)"""
+    columns = []
+    for column in payload["columns"]:
+        if "dictionary" in column:
+            values = [None if code < 0 else column["dictionary"][code] for code in column["codes"]]
+        else:
+            values = column["values"]
+        columns.append((column["name"], values))
+    return [{name: values[i] for name, values in columns} for i in range(payload["row_count"])]
+
+
+def test_colunar_equivale_aos_registros():
+    """Texto repetido vira dicionário (nulo = -1); o conteúdo decodificado é o mesmo dos registros"""
+    df = pd.DataFrame({
+        "curral": ["A1", "A1", None, "B2"],
+        "id": ["x1", "x2", "x3", "x4"],
+        "kg": [1.5, None, 3.0, 4.0],
+        "trato": pd.array([1, None, 3, 4], dtype="Int64"),
+        "data": pd.to_datetime(["2024-05-01", None, "2024-05-02", "2024-05-03"])
+    })
+
+    payload = json.loads(json.dumps(frame_to_columnar(df)))
+    columns = {column["name"]: column for column in payload["columns"]}
+
+    assert payload["format"] == "columnar" and payload["row_count"] == 4
+    assert columns["curral"]["dictionary"] == ["A1", "B2"]
+    assert columns["curral"]["codes"] == [0, 0, -1, 1]
+    assert "values" in columns["id"]  # todos distintos: sem dicionário
+    assert columnar_to_records(payload) == json.loads(encode_frame_json(df))
+
+    enveloped = json.loads(encode_envelope({"status": "success"}, "data", df, columnar=True))
+    assert enveloped["data"] == payload
+    assert frame_to_columnar(df.iloc[0:0])["row_count"] == 0
+
+
+def test_colunar_com_gzip_reduz_desvio():
+    """Arquivo de desvio com 15 colunas: colunar + gzip fica várias vezes menor que os registros"""
+    rows = 5000
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "data": pd.date_range("2024-01-01", periods=30).strftime("%Y-%m-%d")[np.arange(rows) % 30],
+        "hora": [f"{h:02d}:{m:02d}" for h, m in zip(rng.integers(5, 18, rows), rng.integers(0, 60, rows))],
+        "vagao": rng.choice(["VAGAO 01", "VAGAO 02", "VAGAO 03"], rows),
+        "operador": rng.choice(["JOAO SILVA", "MARIA SOUZA", "PEDRO LIMA", "ANA COSTA"], rows),
+        "trato": rng.integers(1, 5, rows),
+        "curral": rng.choice([f"CURRAL {i:03d}" for i in range(80)], rows),
+        "dieta": rng.choice(["ADAPTACAO", "CRESCIMENTO", "TERMINACAO"], rows),
+        "ingrediente": rng.choice(["MILHO MOIDO", "SILAGEM", "NUCLEO", "FARELO SOJA", "CAROCO ALGODAO"], rows),
+        "kg_previsto": rng.integers(200, 2000, rows).astype(float),
+        "kg_carregado": rng.normal(1000, 300, rows).round(1),
+        "desvio_kg": rng.normal(0, 20, rows).round(1),
+        "desvio_pc": rng.normal(0, 2, rows).round(2),
+        "status": rng.choice(["VERDE", "AMARELO", "VERMELHO"], rows),
+        "merge": rng.choice(["SIM", "NAO"], rows),
+        "pazeiro": rng.choice(["CARLOS", "JOSE", "ANTONIO"], rows)
+    })
+
+    records = encode_frame_json(df)
+    columnar = encode_envelope({}, "data", df, columnar=True)
+    print(f"\n📦 registros: {len(records)} B, colunar: {len(columnar)} B, "
+          f"colunar+gzip: {len(gzip.compress(columnar))} B")
+
+    assert len(columnar) * 2 < len(records)
+    assert len(gzip.compress(columnar)) * 5 < len(records)
+
+
+def test_dumps_sem_orjson_igual_ao_orjson(monkeypatch):
+    """Sem orjson, NaN vira null e escalares numpy viram números, como no orjson"""
+    value = {
+        "kg": float("nan"), "inf": float("inf"), "n": np.int64(5), "x": np.float64(1.5), "ok": np.bool_(True),
+        "array": np.array([1.0, np.nan]), "quando": datetime(2024, 1, 1, 6, 30), "dia": date(2024, 1, 1),
+        1: "chave int", "lista": (np.int32(2), None)
+    }
+    expected = (b'{"kg":null,"inf":null,"n":5,"x":1.5,"ok":true,"array":[1.0,null],'
+                b'"quando":"2024-01-01T06:30:00","dia":"2024-01-01","1":"chave int","lista":[2,null]}')
+
+    if serializer.orjson is not None:
+        assert dumps(value) == expected
+    monkeypatch.setattr(serializer, "orjson", None)
+    assert dumps(value) == expected
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark de partida: import do ETL, construção da classe e validação a seco
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+# Orçamento da partida a frio em um processo novo (import + construção + validação a seco)
+STARTUP_BUDGET_SECONDS = 1.0
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from etl import conectaboi_etl_smart
+from etl.conectaboi_etl_smart import ConectaBoiETL
+imported = time.perf_counter()
+etl = ConectaBoiETL()
+constructed = time.perf_counter()
+result = etl.validate_file_structure(sys.argv[1])
+validated = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "construct": constructed - imported,
+    "dry_run": validated - constructed,
+    "total": validated - started,
+    "success": result["success"],
+    "heavy_modules": sorted(name for name in ("pandas", "numpy", "supabase") if name in sys.modules),
+    "connected": etl._supabase is not conectaboi_etl_smart._NOT_CONNECTED
+}))
+"""
+
+
+def test_partida_dentro_do_orcamento(tmp_path):
+    """Construir o ETL e validar a seco não importa pandas, não conecta e cabe no orçamento"""
+    csv_path = tmp_path / "consumo.csv"
+    csv_path.write_text("Data;Curral;Kg\n01/05/2024;A1;10,5\n02/05/2024;B2;7\n", encoding="utf-8")
+    env = {**os.environ, "SUPABASE_URL": "", "SUPABASE_SERVICE_ROLE_KEY": "", "PYTHONPATH": str(BACKEND_DIR)}
+
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, str(csv_path)], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    print(f"\n⏱️ Partida: {timings}")
+
+    assert timings["success"]
+    assert timings["heavy_modules"] == []
+    assert timings["connected"] is False
+    assert timings["total"] < STARTUP_BUDGET_SECONDS
+
+
+def test_cliente_criado_no_primeiro_uso(monkeypatch):
+    """ConectaBoiETL() não conecta; o primeiro acesso a .supabase cria o cliente uma vez"""
+    from etl import conectaboi_etl_smart
+
+    calls = []
+    monkeypatch.setattr(conectaboi_etl_smart, "get_supabase_client", lambda: calls.append(1) or "cliente")
+
+    etl = conectaboi_etl_smart.ConectaBoiETL()
+    assert calls == []
+    assert etl.supabase == "cliente"
+    assert etl.supabase == "cliente"
+    assert calls == [1]
+    assert conectaboi_etl_smart.ConectaBoiETL(connect=False).supabase is None
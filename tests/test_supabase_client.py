@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Testes das conexões compartilhadas com o Supabase (pool HTTP único)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from config.settings import get_settings
+from etl import supabase_client
+from etl.loader import create_load_backend
+
+
+@pytest.fixture
+def clients():
+    supabase_client.close_supabase_clients()
+    yield get_settings()
+    supabase_client.close_supabase_clients()
+
+
+def test_pool_dimensionado_pela_concorrencia_da_carga(clients, monkeypatch):
+    """Sem tamanho configurado, cabem os batches em voo de todos os jobs"""
+    monkeypatch.setattr(clients, "supabase_pool_size", None)
+    monkeypatch.setattr(clients, "loader_workers", 4)
+    monkeypatch.setattr(clients, "jobs_max_workers", 3)
+    assert supabase_client.pool_size() == 14
+
+    monkeypatch.setattr(clients, "supabase_pool_size", 5)
+    assert supabase_client.pool_size() == 5
+
+
+def test_cliente_configurado_uma_vez(clients, monkeypatch, caplog):
+    """Sem credenciais o modo simulado é decidido uma vez; chamadas seguintes não reconfiguram"""
+    monkeypatch.setattr(clients, "supabase_url", "")
+
+    with caplog.at_level("WARNING", logger=supabase_client.logger.name):
+        assert supabase_client.get_supabase_client() is None
+        assert supabase_client.get_supabase_client() is None
+
+    assert sum("Credenciais Supabase" in record.message for record in caplog.records) == 1
+
+
+def test_carga_rest_usa_o_pool_compartilhado(clients, monkeypatch):
+    """Cada carga REST reaproveita o mesmo cliente HTTP e não o fecha ao terminar"""
+    monkeypatch.setattr(clients, "supabase_url", "https://exemplo.supabase.co")
+    monkeypatch.setattr(clients, "supabase_service_role_key", "chave")
+
+    first = create_load_backend("etl_staging_01_historico_consumo", backend="rest")
+    second = create_load_backend("etl_staging_01_historico_consumo", backend="rest")
+    first.close()
+
+    shared = supabase_client.get_http_client()
+    assert first._http_client() is second._http_client() is shared
+    assert not shared.is_closed
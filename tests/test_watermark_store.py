@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Testes da carga incremental por marca d'água
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar o diretório backend ao path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from etl.watermark_store import WatermarkStore, event_timestamps, filter_new_rows, source_from_file_name
+
+TABLE = "etl_staging_02_desvio_carregamento"
+
+
+def test_origem_ignora_prefixo_de_upload_e_datas():
+    """Arquivos diários da mesma origem compartilham a marca d'água"""
+    assert source_from_file_name("20240501_080000_01_historico_consumo_2024-05-01.csv") == "01_historico_consumo"
+    assert source_from_file_name("01_historico_consumo_02.05.2024.csv") == "01_historico_consumo"
+    assert source_from_file_name("Fazenda Boa Vista - consumo.csv") == "fazenda_boa_vista_consumo"
+
+
+def test_instantes_com_data_brasileira_e_hora():
+    """Data dia/mês/ano com hora HH:MM vira timestamp único"""
+    df = pd.DataFrame({"data": ["01/05/2024", "02/05/2024", "inválida"], "hora": ["06:30", "17:05:10", "08:00"]})
+
+    timestamps = event_timestamps(df, "data", "hora")
+
+    assert timestamps[0] == pd.Timestamp("2024-05-01 06:30")
+    assert timestamps[1] == pd.Timestamp("2024-05-02 17:05:10")
+    assert pd.isna(timestamps[2])
+
+
+def test_instantes_com_data_iso():
+    """Datas ISO não são lidas com dia primeiro; formatos misturados na mesma coluna também valem"""
+    df = pd.DataFrame({"data": ["2024-05-01", "2024-05-13", "2024-05-02 06:30:00", "13/05/2024"]})
+
+    timestamps = event_timestamps(df, "data")
+
+    assert timestamps.tolist() == [pd.Timestamp("2024-05-01"), pd.Timestamp("2024-05-13"),
+                                   pd.Timestamp("2024-05-02"), pd.Timestamp("2024-05-13")]
+
+
+def test_mascara_descarta_periodo_ja_carregado():
+    """Só linhas depois da marca seguem; datas inválidas ficam para a validação"""
+    df = pd.DataFrame({"Data": ["29/04/2024", "30/04/2024", "01/05/2024", ""], "kg": [1, 2, 3, 4]})
+
+    filtered, skipped = filter_new_rows(df, pd.Timestamp("2024-04-30"), "Data")
+
+    assert skipped == 2
+    assert filtered["kg"].tolist() == [3, 4]
+
+
+def test_marca_so_avanca_e_persiste(tmp_path):
+    """Valor menor não retrocede a marca; reset remove por origem"""
+    store = WatermarkStore(tmp_path / "watermarks.json")
+
+    assert store.advance(TABLE, "fazenda_a", pd.Timestamp("2024-05-02 10:00"), ["data", "hora_carregamento"])
+    assert not store.advance(TABLE, "fazenda_a", pd.Timestamp("2024-05-01"))
+    store.advance(TABLE, "fazenda_b", pd.Timestamp("2024-04-01"))
+
+    reloaded = WatermarkStore(tmp_path / "watermarks.json")
+    assert reloaded.get(TABLE, "fazenda_a") == pd.Timestamp("2024-05-02 10:00")
+    assert reloaded.get(TABLE, "fazenda_c") is None
+
+    assert reloaded.reset(TABLE, "fazenda_b") == 1
+    assert [entry["source"] for entry in reloaded.entries()] == ["fazenda_a"]